@@ -0,0 +1,478 @@
+# RunBenchmarks.py
+# Purpose: Times the Dall's sheep SQL script generators on synthetic data off an ArcGIS workstation, so changes to the
+# generators can be measured and compared.  Runs each Generate*SQLScript function of NPSdotGDBtoSQLServer.py,
+# WaypointsToSQL.py, TracklogToSQL.py and OneOffScripts/BuffersToSqlServer.py, with their default settings and with
+# the optional settings that change how fast they run (insert batch size, bulk copy files, compression, WKB, columnar
+# reads, sharding, parallel export, staged merge scripts, coordinate rounding and simplification, GPS thinning and
+# the survey filter), loading NPS.gdb straight into a database, importing the GPS points with
+# OneOffScripts/ImportGPSPoints.py one row at a time and in batches, and reading the shapefiles with
+# ShapefileReader.py instead of arcpy, and reports the rows per second, bytes of SQL written per second and peak
+# memory of each run.  TracklogToSQL.py is also timed on tracklogs of 1000 vertices up to --vertices, each ten times
+# longer than the last, to check its time grows in step with the length of the track.  Its peak memory grows only by
+# the pages of the shapefile ShapefileReader.py has memory mapped and read, about 880 bytes a vertex, which the system
+# can drop again, the script itself writes each point out as it reads it.  Before any case is timed the GPS thinning is
+# checked on tracks that turn back on themselves, see CheckAlongTrackThinning.
+
+# Each run is made in a fresh Python process with the stand-in arcpy module in the arcpy directory beside this script,
+# which serves the synthetic layers written by SyntheticGDB.py, and the stand-in pyodbc module in the pyodbc
+# directory, which loads the direct load's and ImportGPSPoints.py's database, ARCN_Sheep.sqlite in the benchmark
+# directory, with SQLite.  The time is measured from after the synthetic data has been loaded to when the generator
+# finishes, so it is the time the generator spends reading the layer and writing the scripts.  Peak memory is the
+# process's peak resident set size, which includes the synthetic data; the memory used by the data alone is reported
+# too so the generator's own share can be worked out.  Peak memory isn't available on Windows.  The cases that write
+# gzip or Zstandard compressed scripts are listed again after the others with the megabytes of SQL before and after
+# compression, how many times smaller it got, and the megabytes of each written per second.
+
+# Usage, from the command line:
+# python RunBenchmarks.py [--rows 100000] [--directory C:/Benchmark] [--repeat 3] [--cases GPSPointsLog] [--source DIR]
+# [--vertices 1000000]
+# --rows, the number of GPS points, the other layers are scaled to match, see SyntheticGDB.LayerSizes
+# --vertices, the most vertices of the tracklogs TracklogToSQL.py is timed on, 100000 if not given, see
+# SyntheticGDB.VertexCounts
+# --directory, where the synthetic data and the generated scripts are written, a temporary directory if not given
+# --repeat, run each case this many times and report the quickest
+# --cases, only run the cases whose names contain this text
+# --source, directory of the generator scripts to time, this repository if not given.  Check another revision out
+# with e.g. git worktree add ../Sheep-before HEAD~1 and benchmark it with --source ../Sheep-before to compare.
+
+import argparse
+import gzip
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource # not available on Windows
+except ImportError:
+    resource = None
+
+import SyntheticGDB
+
+# directory of this script, the stand-in arcpy module is in the arcpy directory here
+BenchmarkDirectory = os.path.dirname(os.path.abspath(__file__))
+
+# the repository, where the generator scripts are unless --source is given
+RepositoryDirectory = os.path.dirname(BenchmarkDirectory)
+
+SurveyID = "1AC66891-5D1E-4749-B962-40AB1BCA577F"
+
+# the generator of each NPS.gdb layer, in the order NPSdotGDBtoSQLServer.py exports them
+LayerGenerators = [
+    ("TrnOrig", "GenerateTrnOrigSQLScript"),
+    ("Animals", "GenerateAnimalsSQLScript"),
+    ("Buffer_Final", "GenerateBuffersSQLScript"),
+    ("FlatAreas", "GenerateFlatAreasSQLScript"),
+    ("Tracklog", "GenerateTrackLogSQLScript"),
+    ("TrnPoints", "GenerateTrnPointsSQLScript"),
+    ("GPSPointsLog", "GenerateGPSPointsLogSQLScript"),
+    ]
+
+
+# function GDBParameters
+# accepts: gdb, String, path of the synthetic NPS.gdb. options, the NPSdotGDBtoSQLServer.py toolbox parameters to set, by name
+# returns: list of the toolbox parameters of NPSdotGDBtoSQLServer.py
+def GDBParameters(gdb, **options):
+    names = ["InsertBatchSize", "GPSPointsLogFormat", "ExportInParallel", "MaxShardMegabytes", "MaxShardRows",
+        "ScriptCompression", "GeometryEncoding", "ColumnarReads", "IncrementalExport", "DatabaseServer",
+        "StagingMerge", "CoordinatePrecision", "SimplifyTolerance", "GPSThinInterval", "GPSThinDistance", "GPSThinTolerance",
+        "SurveyBuffers", "SurveyExtent", "SurveyDates", "PreflightValidation"]
+    return [gdb, SurveyID] + [options.get(name, "") for name in names]
+
+
+# function BenchmarkCases
+# accepts: directory, String, the benchmark directory. source, String, directory of the generator scripts. vertices,
+# list of the SyntheticGDB.VertexCounts of the vertex tracklogs written
+# returns: list of (name, command, parameters, layers) tuples, command is the arguments that run the case in a new
+# process, parameters the toolbox parameters and layers the paths of the layers whose records are counted as its rows
+def BenchmarkCases(directory, source, vertices = []):
+    gdb = directory + SyntheticGDB.GeodatabaseName
+    cases = []
+
+    # each layer of NPS.gdb on its own, with its default settings and with 1000 row inserts
+    for layer, generator in LayerGenerators:
+        command = ["--generators", generator]
+        cases.append((layer, command, GDBParameters(gdb), [gdb + "/" + layer]))
+        cases.append((layer + " batch 1000", command, GDBParameters(gdb, InsertBatchSize = 1000), [gdb + "/" + layer]))
+
+    # the optional settings, on the layers they make the most difference to
+    for layer, generator, setting, options in [
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "BULK", {"GPSPointsLogFormat": "BULK"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "BULK columnar", {"GPSPointsLogFormat": "BULK", "ColumnarReads": "true"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "GZIP", {"InsertBatchSize": 1000, "ScriptCompression": "GZIP"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "ZSTD", {"InsertBatchSize": 1000, "ScriptCompression": "ZSTD"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "WKB", {"InsertBatchSize": 1000, "GeometryEncoding": "WKB"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "columnar", {"InsertBatchSize": 1000, "ColumnarReads": "true"}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "sharded 10MB", {"InsertBatchSize": 1000, "MaxShardMegabytes": 10}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "thinned", {"InsertBatchSize": 1000, "GPSThinInterval": 10,
+                "GPSThinDistance": 50, "GPSThinTolerance": 20}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "BULK thinned", {"GPSPointsLogFormat": "BULK", "GPSThinInterval": 10,
+                "GPSThinDistance": 50, "GPSThinTolerance": 20}),
+            ("GPSPointsLog", "GenerateGPSPointsLogSQLScript", "survey buffers", {"InsertBatchSize": 1000,
+                "SurveyBuffers": gdb + "/Buffer_Final"}),
+            ("Animals", "GenerateAnimalsSQLScript", "columnar", {"InsertBatchSize": 1000, "ColumnarReads": "true"}),
+            ("Animals", "GenerateAnimalsSQLScript", "survey dates", {"InsertBatchSize": 1000, "SurveyDates": "6/1/2014 6/15/2014"}),
+            ("TrnPoints", "GenerateTrnPointsSQLScript", "columnar", {"InsertBatchSize": 1000, "ColumnarReads": "true"}),
+            ("Buffer_Final", "GenerateBuffersSQLScript", "WKB", {"InsertBatchSize": 1000, "GeometryEncoding": "WKB"}),
+            ("Tracklog", "GenerateTrackLogSQLScript", "WKB", {"InsertBatchSize": 1000, "GeometryEncoding": "WKB"}),
+            ("Buffer_Final", "GenerateBuffersSQLScript", "precision 6", {"InsertBatchSize": 1000, "CoordinatePrecision": 6}),
+            ("Buffer_Final", "GenerateBuffersSQLScript", "simplified 5m", {"InsertBatchSize": 1000, "CoordinatePrecision": 6,
+                "SimplifyTolerance": 5}),
+            ("Tracklog", "GenerateTrackLogSQLScript", "survey buffers", {"InsertBatchSize": 1000,
+                "SurveyBuffers": gdb + "/Buffer_Final", "SurveyExtent": "-156 67 -143 68.8"}),
+            ("Tracklog", "GenerateTrackLogSQLScript", "simplified 5m", {"InsertBatchSize": 1000, "CoordinatePrecision": 6,
+                "SimplifyTolerance": 5}),
+            ]:
+        if options.get("ScriptCompression") == "ZSTD" and not ZstandardInstalled():
+            continue
+        command = ["--generators", generator]
+        if "SurveyBuffers" in options or "SurveyExtent" in options or "SurveyDates" in options:
+            command.append("--filtered") # checks the survey filter kept some of the layer and dropped some
+        cases.append((layer + " " + setting, command, GDBParameters(gdb, **options), [gdb + "/" + layer]))
+
+    # the whole of NPS.gdb as the toolbox exports it, one layer at a time and in parallel
+    generators = [generator for layer, generator in LayerGenerators if layer != "GPSPointsLog"]
+    layers = [gdb + "/" + layer for layer, generator in LayerGenerators if layer != "GPSPointsLog"]
+    cases.append(("NPS.gdb", ["--generators", ",".join(generators)], GDBParameters(gdb, InsertBatchSize = 1000), layers))
+    cases.append(("NPS.gdb parallel", ["--generators", ",".join(generators), "--parallel"],
+        GDBParameters(gdb, InsertBatchSize = 1000, ExportInParallel = "true"), layers))
+    cases.append(("NPS.gdb validation", ["--generators", ",".join(generators)],
+        GDBParameters(gdb, InsertBatchSize = 1000, PreflightValidation = "true"), layers))
+    cases.append(("NPS.gdb staged merge", ["--generators", ",".join(generators)], GDBParameters(gdb, StagingMerge = "true"), layers))
+    loaders = ["LoadTrnOrig", "LoadTrnPoints", "LoadAnimals", "LoadTrackLog", "LoadBuffers", "LoadFlatAreas"]
+    cases.append(("NPS.gdb direct", ["--generators", ",".join(loaders), "--direct"],
+        GDBParameters(gdb, InsertBatchSize = 1000, DatabaseServer = "localhost"), layers))
+
+    # the shapefile tools
+    waypoints = directory + SyntheticGDB.WaypointsName
+    tracklog = directory + SyntheticGDB.TracklogName
+    buffers = directory + SyntheticGDB.BuffersName
+    for name, script, parameters, layer in [
+            ("WaypointsToSQL", "WaypointsToSQL.py", [waypoints, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1"], waypoints),
+            ("WaypointsToSQL WKB", "WaypointsToSQL.py", [waypoints, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1", "", "WKB"], waypoints),
+            ("WaypointsToSQL GZIP", "WaypointsToSQL.py", [waypoints, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1", "GZIP"], waypoints),
+            ("TracklogToSQL", "TracklogToSQL.py", [tracklog, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1"], tracklog),
+            ("TracklogToSQL GZIP", "TracklogToSQL.py", [tracklog, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1", "GZIP"], tracklog),
+            ("BuffersToSqlServer", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1"], buffers),
+            ("BuffersToSqlServer GZIP", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1", "GZIP"], buffers),
+            ("BuffersToSqlServer ZSTD", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1", "ZSTD"], buffers),
+            ("BuffersToSqlServer WKB", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1", "", "WKB"], buffers),
+            ("BuffersToSqlServer simplified 5m", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1", "", "", "6", "5"],
+                buffers),
+            ]:
+        if "ZSTD" in parameters and not ZstandardInstalled():
+            continue
+        cases.append((name, ["--script", os.path.join(source, script)], parameters, [layer]))
+
+    # the shapefile tools reading the shapefiles written beside the data file with ShapefileReader.py instead of arcpy
+    for name, script, parameters, layer in [
+            ("WaypointsToSQL native reader", "WaypointsToSQL.py", [waypoints, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1"], waypoints),
+            ("TracklogToSQL native reader", "TracklogToSQL.py", [tracklog, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1"], tracklog),
+            ("BuffersToSqlServer native reader", "OneOffScripts/BuffersToSqlServer.py", [buffers, SurveyID, "1", "1"], buffers),
+            ]:
+        cases.append((name, ["--script", os.path.join(source, script), "--native"], parameters, [layer]))
+
+    # TracklogToSQL.py on ever longer tracklogs, each written as one LINESTRING streamed to the script as it's read
+    for count in vertices:
+        tracklog = directory + SyntheticGDB.VertexTracklogName(count)
+        cases.append(("TracklogToSQL " + str(count) + " vertices", ["--script", os.path.join(source, "TracklogToSQL.py"),
+            "--native"], [tracklog, SurveyID, "Miller", "N67AK", "Pilot GPS", "1", "1"], [tracklog]))
+
+    # importing the GPS points into the database, a commit per row and 1000 rows per commit.  The glitched GPS point
+    # fails to insert, which in batches has BulkInsertRows split its batch down to the bad row, and the run report
+    # has to count it as the one failed query
+    for name, parameters in [
+            ("ImportGPSPoints", [gdb, "localhost", SurveyID]),
+            ("ImportGPSPoints rows per commit 1000", [gdb, "localhost", SurveyID, "1000"]),
+            ]:
+        cases.append((name, ["--script", os.path.join(source, "OneOffScripts/ImportGPSPoints.py"), "--report",
+            directory + "ImportGPSPoints.report.json", "--failures", "1"], parameters, [gdb + "/GPSPointsLog"]))
+    return cases
+
+
+# function ZstandardInstalled
+# returns: Boolean, whether the zstandard package needed for ZSTD compressed scripts is installed
+def ZstandardInstalled():
+    try:
+        import zstandard
+    except ImportError:
+        return False
+    return True
+
+
+# function PeakMegabytes
+# accepts: children, Boolean, True for the peak of this process's finished child processes, e.g. the parallel export's
+# workers, False for this process
+# returns: Float, peak resident set size in megabytes, None on Windows
+def PeakMegabytes(children):
+    if resource is None:
+        return None
+    if children:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1024.0 / 1024.0 # bytes on macOS
+    return peak / 1024.0 # kilobytes on Linux
+
+
+# function RunCase
+# accepts: arguments, the command line arguments of the process running the case, see BenchmarkCases
+# purpose: Runs one case inside the new process and writes its timings as JSON to the --timings file
+def RunCase(arguments):
+    sys.path.insert(0, BenchmarkDirectory) # the stand-in arcpy and pyodbc
+    import arcpy # loads the synthetic data
+    loadedMegabytes = PeakMegabytes(False)
+    sys.argv = [arguments.script or "NPSdotGDBtoSQLServer.py"]
+    if arguments.native:
+        os.environ["SHEEP_SHAPEFILE_READER"] = "native"
+        sys.argv = sys.argv + arcpy.Parameters # the reader takes the toolbox parameters from the command line
+        if not arcpy.Verbose:
+            sys.stdout = open(os.devnull, "w") # and prints the messages
+    if arguments.script:
+        import runpy
+        sys.path.insert(0, os.path.dirname(arguments.script))
+        started = time.time()
+        runpy.run_path(arguments.script, run_name = "__main__")
+    else:
+        sys.path.insert(0, arguments.source)
+        import NPSdotGDBtoSQLServer
+        generators = arguments.generators.split(",")
+        started = time.time()
+        if NPSdotGDBtoSQLServer.PreflightValidation:
+            # the layers are checked before they are exported, as the toolbox does.  The synthetic data's glitched
+            # records are there to be found, so the export goes ahead rather than stopping as the toolbox would
+            NPSdotGDBtoSQLServer.ValidateLayers(generators)
+        if arguments.direct:
+            NPSdotGDBtoSQLServer.LoadLayersIntoDatabase(generators, SurveyID)
+        elif arguments.parallel:
+            if NPSdotGDBtoSQLServer.ExportLayersInParallel(generators, SurveyID):
+                sys.exit("ERROR: layers failed to export")
+        else:
+            for generator in generators:
+                getattr(NPSdotGDBtoSQLServer, generator)(SurveyID)
+    seconds = time.time() - started
+    if arguments.filtered:
+        # check the survey filter kept some of each layer's features and dropped the rest, a filter that keeps
+        # nothing, or everything, isn't timing the filtering
+        for telemetry in NPSdotGDBtoSQLServer.Telemetry.layers:
+            counts = telemetry.surveyFilter
+            if counts is None:
+                sys.exit("ERROR: " + telemetry.name + " wasn't filtered")
+            if counts["kept"] == 0 or counts["kept"] == counts["read"]:
+                sys.exit("ERROR: the survey filter kept " + str(counts["kept"]) + " of the " + str(counts["read"]) + " " + \
+                    telemetry.name + " features, expected some but not all of them")
+    if arguments.report:
+        # check the run report counted the failed queries the case expects
+        reportfile = open(arguments.report)
+        failedQueries = json.load(reportfile)["totals"]["failedQueries"]
+        reportfile.close()
+        if failedQueries != arguments.failures:
+            sys.exit("ERROR: " + str(failedQueries) + " queries failed, expected " + str(arguments.failures))
+    peakMegabytes = PeakMegabytes(False)
+    childMegabytes = PeakMegabytes(True)
+    if childMegabytes is not None and childMegabytes > 0:
+        peakMegabytes = max(peakMegabytes, childMegabytes)
+    timings = open(arguments.timings, "w")
+    json.dump({"seconds": seconds, "loadedMegabytes": loadedMegabytes, "peakMegabytes": peakMegabytes}, timings)
+    timings.close()
+
+
+# function UncompressedBytes
+# accepts: path, String, path of a script or database written by a case
+# returns: Integer, the size in bytes of the file, of the script inside it if it is a .gz or .zst compressed script
+def UncompressedBytes(path):
+    if path.endswith(".gz"):
+        source = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        import zstandard
+        source = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames = True)
+    else:
+        return os.path.getsize(path)
+    size = 0
+    while True:
+        block = source.read(1024 * 1024)
+        if not block:
+            break
+        size = size + len(block)
+    source.close()
+    return size
+
+
+# function ClearOutput
+# accepts: directory, String, the benchmark directory
+# returns: tuple of the total size in bytes of the scripts, or database, the last case wrote and their size
+# uncompressed, which are deleted along with its run report
+def ClearOutput(directory):
+    kept = [SyntheticGDB.DataFileName] # the synthetic data and shapefiles
+    for shapefile in [SyntheticGDB.WaypointsName, SyntheticGDB.TracklogName, SyntheticGDB.BuffersName] + \
+            [SyntheticGDB.VertexTracklogName(count) for count in SyntheticGDB.VertexCounts]:
+        kept.extend(SyntheticGDB.ShapefileFiles(shapefile))
+    size = 0
+    uncompressed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name in kept or not os.path.isfile(path):
+            continue
+        if not name.endswith(".report.json"):
+            size = size + os.path.getsize(path)
+            uncompressed = uncompressed + UncompressedBytes(path)
+        os.remove(path)
+    return (size, uncompressed)
+
+
+# function TimeCase
+# accepts: case, tuple from BenchmarkCases. directory, String, the benchmark directory. source, String, directory of
+# the generator scripts. repeat, Integer, the number of runs
+# returns: dictionary of the quickest run's timings and the size of the scripts it wrote, or None if the case failed
+def TimeCase(case, directory, source, repeat):
+    name, command, parameters, layers = case
+    environment = dict(os.environ)
+    environment["SHEEP_BENCHMARK_DATA"] = directory + SyntheticGDB.DataFileName
+    environment["SHEEP_BENCHMARK_PARAMETERS"] = json.dumps(parameters)
+    environment["SHEEP_BENCHMARK_DATABASE"] = directory + "ARCN_Sheep.sqlite"
+    timingsfilename = os.path.join(tempfile.gettempdir(), "SheepBenchmarkTimings" + str(os.getpid()) + ".json")
+    best = None
+    for run in range(repeat):
+        returncode = subprocess.call([sys.executable, os.path.abspath(__file__), "--source", source,
+            "--timings", timingsfilename] + command, env = environment)
+        outputBytes, uncompressedBytes = ClearOutput(directory)
+        if returncode != 0 or not os.path.exists(timingsfilename):
+            return None
+        timingsfile = open(timingsfilename)
+        timings = json.load(timingsfile)
+        timingsfile.close()
+        os.remove(timingsfilename)
+        timings["bytes"] = outputBytes
+        timings["uncompressedBytes"] = uncompressedBytes
+        if best is None or timings["seconds"] < best["seconds"]:
+            best = timings
+    return best
+
+
+# function CheckAlongTrackThinning
+# accepts: source, String, directory of the generator scripts. tolerance, Float, the along track tolerance in meters
+# purpose: Stops with an error if the along track thinning of GPSThinning.py drops a point of the
+# SyntheticGDB.TurningTracks more than the tolerance from the line between the points kept either side of it.  The
+# sleeve is measured from the point kept, so a point can be a little past the end of the line, hence the quarter
+# tolerance of slack.
+def CheckAlongTrackThinning(source, tolerance = 50.0):
+    sys.path.insert(0, source)
+    import GPSThinning
+    sys.path.remove(source)
+    for name, points in SyntheticGDB.TurningTracks():
+        thinner = GPSThinning.PointThinner(0, 0, tolerance)
+        kept = list(thinner.thin(range(len(points)), lambda index: (points[index][0], points[index][1], "")))
+        for start, end in zip(kept, kept[1:]):
+            lineEast, lineNorth = GPSThinning.Offset(points[start], points[end])
+            lineLength = lineEast * lineEast + lineNorth * lineNorth
+            for index in range(start + 1, end):
+                east, north = GPSThinning.Offset(points[start], points[index])
+                along = 0.0
+                if lineLength > 0:
+                    along = max(0.0, min(1.0, (east * lineEast + north * lineNorth) / lineLength))
+                distance = math.hypot(east - along * lineEast, north - along * lineNorth)
+                if distance > tolerance * 1.25:
+                    sys.exit("ERROR: the along track thinning of the " + name + " track dropped point " + str(index) + \
+                        ", " + str(int(distance)) + "m from the line between points " + str(start) + " and " + str(end))
+
+
+# function FormatMegabytes
+# accepts: megabytes, Float or None
+# returns: String, the megabytes to one decimal place, or n/a if they aren't known
+def FormatMegabytes(megabytes):
+    if megabytes is None:
+        return "n/a"
+    return "%.1f" % megabytes
+
+
+# function RunBenchmarks
+# accepts: arguments, the parsed command line arguments
+# purpose: Writes the synthetic data, times each case and prints the report
+def RunBenchmarks(arguments):
+    directory = arguments.directory or tempfile.mkdtemp(prefix = "SheepBenchmark")
+    directory = os.path.abspath(directory).replace("\\", "/").rstrip("/") + "/"
+    source = os.path.abspath(arguments.source)
+    sizes = SyntheticGDB.LayerSizes(arguments.rows)
+    print("Writing synthetic data for " + str(arguments.rows) + " GPS points to " + directory)
+    layers = SyntheticGDB.GenerateSyntheticData(directory, sizes)
+    counts = {} # the number of records in each layer, the records themselves aren't needed here
+    for path in layers:
+        counts[path] = len(layers[path]["rows"])
+    layers = None
+    vertices = [count for count in SyntheticGDB.VertexCounts if count <= arguments.vertices]
+    if arguments.cases: # only the vertex tracklogs of the cases run
+        vertices = [count for count in vertices if arguments.cases.lower() in ("TracklogToSQL " + str(count) + " vertices").lower()]
+    if len(vertices) > 0:
+        print("Writing tracklogs of " + ", ".join([str(count) for count in vertices]) + " vertices")
+        # written by a process of their own, on Linux a process passes its peak memory on to the processes it starts
+        # and the longest tracklog would raise the peak of every case after it
+        writer = multiprocessing.Process(target = SyntheticGDB.WriteVertexTracklogs, args = (directory, vertices))
+        writer.start()
+        writer.join()
+    for count in vertices:
+        counts[directory + SyntheticGDB.VertexTracklogName(count)] = count
+    ClearOutput(directory)
+    print("Checking the GPS thinning keeps the turns of tracks that turn back on themselves")
+    CheckAlongTrackThinning(source)
+
+    print("Timing the generators in " + source)
+    print("%-36s %9s %9s %11s %10s %9s %10s %10s" % ("case", "rows", "seconds", "rows/s", "MB written", "MB/s",
+        "data MB", "peak MB"))
+    compressed = [] # the cases that wrote compressed scripts, reported after the others
+    for case in BenchmarkCases(directory, source, vertices):
+        name, command, parameters, caselayers = case
+        if arguments.cases and arguments.cases.lower() not in name.lower():
+            continue
+        rows = sum([counts[layer] for layer in caselayers])
+        timings = TimeCase(case, directory, source, arguments.repeat)
+        if timings is None:
+            print("%-36s %9d %s" % (name, rows, "FAILED"))
+            continue
+        seconds = max(timings["seconds"], 1e-6)
+        megabytes = timings["bytes"] / 1024.0 / 1024.0
+        print("%-36s %9d %9.3f %11.0f %10.2f %9.2f %10s %10s" % (name, rows, seconds, rows / seconds, megabytes,
+            megabytes / seconds, FormatMegabytes(timings["loadedMegabytes"]), FormatMegabytes(timings["peakMegabytes"])))
+        if timings["uncompressedBytes"] != timings["bytes"]:
+            compressed.append((name, seconds, timings["uncompressedBytes"] / 1024.0 / 1024.0, megabytes))
+    if len(compressed) > 0:
+        # the SQL written before it was compressed, how many times smaller compressing it made it, and how fast each
+        # was written
+        print("")
+        print("%-36s %10s %13s %9s %9s %15s" % ("compressed script", "SQL MB", "compressed MB", "ratio", "SQL MB/s",
+            "compressed MB/s"))
+        for name, seconds, sqlMegabytes, megabytes in compressed:
+            print("%-36s %10.2f %13.2f %9.2f %9.2f %15.2f" % (name, sqlMegabytes, megabytes,
+                sqlMegabytes / max(megabytes, 1e-9), sqlMegabytes / seconds, megabytes / seconds))
+    if not arguments.directory:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Times the sheep SQL script generators on synthetic data")
+    parser.add_argument("--rows", type = int, default = 100000, help = "number of GPS points, the other layers are scaled to match")
+    parser.add_argument("--directory", help = "where the synthetic data and scripts are written, a temporary directory if not given")
+    parser.add_argument("--repeat", type = int, default = 1, help = "run each case this many times and report the quickest")
+    parser.add_argument("--cases", help = "only run the cases whose names contain this text")
+    parser.add_argument("--source", default = RepositoryDirectory, help = "directory of the generator scripts to time")
+    parser.add_argument("--vertices", type = int, default = 100000, help = "the most vertices of the tracklogs TracklogToSQL.py is timed on")
+    # used by the processes running each case
+    parser.add_argument("--timings", help = argparse.SUPPRESS)
+    parser.add_argument("--generators", help = argparse.SUPPRESS)
+    parser.add_argument("--script", help = argparse.SUPPRESS)
+    parser.add_argument("--parallel", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--direct", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--native", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--report", help = argparse.SUPPRESS)
+    parser.add_argument("--failures", type = int, default = 0, help = argparse.SUPPRESS)
+    parser.add_argument("--filtered", action = "store_true", help = argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.timings:
+        RunCase(arguments)
+    else:
+        RunBenchmarks(arguments)
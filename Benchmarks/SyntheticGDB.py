@@ -0,0 +1,513 @@
+# SyntheticGDB.py
+# Purpose: Generates synthetic aerial sheep survey data for benchmarking the Dall's sheep SQL script generators off an
+# ArcGIS workstation.  Writes one data file holding an NPS.gdb (TrnOrig, TrnPoints, Animals, FlatAreas, Tracklog,
+# Buffer_Final and GPSPointsLog layers) plus a waypoints, a tracklog and a buffers shapefile, which the stand-in arcpy
+# module in the arcpy directory beside this script serves to the generators in place of the real data.  The three
+# shapefiles are written out as real shapefiles too, for ShapefileReader.py to read.
+
+# The layers have the columns the generators read, in the positions the field geodatabase and the Garmin shapefiles
+# have them, padded out with the other columns that a real layer carries.  The values are random but realistic:
+# coordinates in the Brooks Range, dates and times of a June survey, altitudes in feet, observer names with
+# apostrophes, a sprinkling of nulls, the odd tab or quote in the comments and one GPS point glitched past the pole,
+# which a database load has to report and carry on past.  Each transect has a centre, where its TrnOrig line and
+# OnTransect Tracklog segments start and its Buffer_Final is drawn around, and the GPS points are flown from centre to
+# centre, so a survey filter on Buffer_Final keeps some of the Tracklog and GPSPointsLog and drops the rest.  The same seed always
+# gives the same data.
+
+# The data file is a pickled dictionary of layer path: layer, where each layer is a dictionary with:
+# fields, list of (name, arcpy field type, length) tuples
+# shapeType, String, "Point", "Polyline" or "Polygon"
+# hasZ, Boolean
+# rows, list of records, each a list of values in field order.  The geometry column holds a list of (x, y, z) tuples,
+# or None for a null geometry.
+
+# Run from the command line to write a data file on its own, e.g.
+# python SyntheticGDB.py C:/Benchmark 100000
+# writes C:/Benchmark/SyntheticData.pickle sized for 100000 GPS points, see LayerSizes for the other layers.
+
+import math
+import os
+import pickle
+import random
+import struct
+import sys
+
+# name of the data file written into the benchmark directory
+DataFileName = "SyntheticData.pickle"
+
+# names of the synthetic geodatabase and shapefiles, relative to the benchmark directory
+GeodatabaseName = "NPS.gdb"
+WaypointsName = "Waypoints.shp"
+TracklogName = "Tracklog.shp"
+BuffersName = "Buffers.shp"
+
+# the number of vertices of the tracklog shapefiles TracklogToSQL.py is timed on to see how it scales with the length
+# of a track, see WriteVertexTracklogs
+VertexCounts = [1000, 10000, 100000, 1000000]
+
+ObserverNames = ["Miller", "O'Brien", "Lawler", "D'Angelo", "Schmidt", "Whitman", "Brooks", "Sousanes"]
+Aircraft = ["N1234A", "N67AK", "N9910P", "N4459S"]
+Activities = ["Bedded", "Feeding", "Standing", "Walking", "Running", "Bedded/Feeding"]
+Comments = ["", "Lamb with ewe's group", "Group split", "Mixed group, counted twice", "Poor light\tmay have missed some",
+    "ewes and lambs", "Rams on ridge 'above' group"]
+
+
+# GPS points logged on each transect
+TransectPoints = 200
+
+
+# function LayerSizes
+# accepts: rows, Integer, the number of GPS points, the biggest layer
+# returns: dictionary of layer name: number of records, scaled from the rows of a typical survey
+def LayerSizes(rows):
+    transects = max(1, rows // TransectPoints)
+    return {
+        "TrnOrig": transects,
+        "TrnPoints": transects * 2,
+        "Animals": max(1, rows // 20),
+        "FlatAreas": max(1, transects // 10),
+        "Tracklog": transects * 3,
+        "Buffer_Final": transects,
+        "GPSPointsLog": rows,
+        "Waypoints": max(1, rows // 50),
+        "TracklogShapefile": rows,
+        "Buffers": transects,
+        }
+
+
+# function Fields
+# accepts: columns, dictionary of position: (name, type, length) of the columns the generators use. count, Integer, the
+# number of columns in the layer
+# returns: list of (name, type, length) tuples, the unused positions filled with text columns
+def Fields(columns, count):
+    fields = []
+    for position in range(count):
+        if position in columns:
+            fields.append(columns[position])
+        else:
+            fields.append(("FIELD" + str(position), "String", 50))
+    return fields
+
+
+# function Record
+# accepts: fields, list of (name, type, length) tuples. values, dictionary of column name: value
+# returns: list of the record's values in field order, the unused columns filled with short text
+def Record(fields, values):
+    return [values.get(name, "x" + str(position)) for position, (name, fieldType, length) in enumerate(fields)]
+
+
+# function Maybe
+# accepts: value, any value. chance, Float, the chance of the value being null
+# returns: the value or None
+def Maybe(value, chance = 0.05):
+    if random.random() < chance:
+        return None
+    return value
+
+
+# function Track
+# accepts: x, y, Float, start of the track. count, Integer, number of vertices
+# returns: list of (x, y, z) tuples wandering away from the start like a flight line
+def Track(x, y, count):
+    heading = random.uniform(0, 2 * math.pi)
+    vertices = []
+    for vertex in range(count):
+        heading = heading + random.uniform(-0.2, 0.2)
+        x = x + 0.002 * math.cos(heading)
+        y = y + 0.001 * math.sin(heading)
+        vertices.append((x, y, None))
+    return vertices
+
+
+# function Ring
+# accepts: x, y, Float, centre. radius, Float, degrees of latitude. count, Integer, number of vertices
+# returns: list of (x, y, z) tuples of a closed, slightly irregular ring
+def Ring(x, y, radius, count):
+    vertices = []
+    for vertex in range(count):
+        angle = 2 * math.pi * vertex / count
+        scale = radius * random.uniform(0.8, 1.2)
+        vertices.append((x + 2 * scale * math.cos(angle), y + scale * math.sin(angle), None))
+    vertices.append(vertices[0])
+    return vertices
+
+
+# function RandomLocation
+# returns: tuple of longitude and latitude somewhere in the Brooks Range
+def RandomLocation():
+    return (random.uniform(-156.0, -143.0), random.uniform(67.0, 68.8))
+
+
+# function Layer
+# accepts: fields, list of (name, type, length) tuples. shapeType, String. hasZ, Boolean. rows, list of records
+# returns: dictionary of the layer as it is stored in the data file
+def Layer(fields, shapeType, hasZ, rows):
+    return {"fields": fields, "shapeType": shapeType, "hasZ": hasZ, "rows": rows}
+
+
+# the functions below each build one synthetic layer of count records, see Layer.  centres, list of the (x, y) of each
+# transect's centre, see GenerateSyntheticData
+def TrnOrigLayer(count, centres):
+    fields = Fields({0: ("OBJECTID_1", "OID", 4), 1: ("Shape", "Geometry", 0), 3: ("PT_ID", "Integer", 4),
+        8: ("PROJECTION", "String", 50), 11: ("DD_LAT1", "Double", 8), 12: ("DD_LONG1", "Double", 8),
+        22: ("ELEV_M", "Double", 8), 24: ("CNTR_NOTE", "String", 254), 27: ("SurveyID", "String", 50),
+        29: ("Flown", "String", 1), 30: ("TransectID", "Integer", 4), 31: ("Aircraft", "String", 20),
+        32: ("OBSLNAM1", "String", 50), 33: ("OBSLNAM2", "String", 50), 34: ("FLOWNDATE", "String", 30),
+        35: ("PILOTLNAM", "String", 50), 37: ("PRECIP", "String", 20), 38: ("TURBINT", "String", 20),
+        39: ("TURBDUR", "String", 20), 40: ("TEMPRTURE", "Double", 8), 41: ("TARGETLEN", "Double", 8)}, 49)
+    rows = []
+    for transect in range(count):
+        x, y = centres[transect % len(centres)]
+        line = Track(x, y, random.randint(2, 20))
+        rows.append(Record(fields, {"OBJECTID_1": transect + 1, "Shape": line, "PT_ID": transect, "PROJECTION": "WGS84",
+            "DD_LAT1": y, "DD_LONG1": x, "ELEV_M": Maybe(random.uniform(300, 2500)),
+            "CNTR_NOTE": Maybe(random.choice(Comments), 0.3), "SurveyID": "SYNTHETIC", "Flown": random.choice(["Y", "N"]),
+            "TransectID": transect + 1, "Aircraft": random.choice(Aircraft), "OBSLNAM1": random.choice(ObserverNames),
+            "OBSLNAM2": Maybe(random.choice(ObserverNames), 0.2), "FLOWNDATE": "6/%d/2014" % random.randint(1, 30),
+            "PILOTLNAM": random.choice(ObserverNames), "PRECIP": Maybe(random.choice(["None", "Light rain", "Snow"])),
+            "TURBINT": Maybe(random.choice(["Light", "Moderate"])), "TURBDUR": Maybe(random.choice(["Occasional", "Constant"])),
+            "TEMPRTURE": Maybe(random.uniform(-5, 20)), "TARGETLEN": Maybe(random.uniform(1000, 9000))}))
+    return Layer(fields, "Polyline", False, rows)
+
+
+def TrnPointsLayer(count):
+    fields = Fields({0: ("OBJECTID_1", "OID", 4), 1: ("Shape", "Geometry", 0), 2: ("OBJECTID", "Integer", 4),
+        4: ("ELEV_M", "Double", 8), 12: ("GeneratedSurveyID", "String", 50), 14: ("HASTRANS", "String", 1)}, 15)
+    rows = []
+    for point in range(count):
+        x, y = RandomLocation()
+        rows.append(Record(fields, {"OBJECTID_1": point + 1, "Shape": [(x, y, random.uniform(300, 2500))],
+            "OBJECTID": point + 1, "ELEV_M": Maybe(random.uniform(300, 2500)), "GeneratedSurveyID": Maybe("SYN-" + str(point)),
+            "HASTRANS": random.choice(["Y", "N"])}))
+    return Layer(fields, "Point", True, rows)
+
+
+def AnimalsLayer(count, transects):
+    counts = ["LT_FCRAMS", "GTE_FCRAMS", "UNCLSSRAMS", "UNCLSSHEEP", "LAMBS", "EWELIKE", "CURL_1_2", "CURL_3_4",
+        "CURL_7_8", "LT_1_2CURL", "YEARLING", "EWES"]
+    columns = {0: ("OBJECTID_1", "OID", 4), 1: ("Shape", "Geometry", 0), 2: ("OBJECTID", "Integer", 4),
+        5: ("ACTIVITY", "String", 50), 8: ("DATE_", "String", 30), 9: ("ALTITUDE", "Double", 8), 14: ("PDOP", "Double", 8),
+        15: ("PLANESPD", "SmallInteger", 2), 18: ("TransectID", "Integer", 4), 20: ("DIST2TRANS", "Double", 8),
+        44: ("Comments", "String", 254), 51: ("FORMNAME", "String", 10)}
+    for position, name in zip([33, 34, 35, 36, 37, 38, 45, 46, 47, 48, 49, 50], counts):
+        columns[position] = (name, "SmallInteger", 2)
+    fields = Fields(columns, 52)
+    rows = []
+    for animal in range(count):
+        x, y = RandomLocation()
+        values = {"OBJECTID_1": animal + 1, "Shape": [(x, y, random.uniform(300, 2500))], "OBJECTID": animal + 1,
+            "ACTIVITY": Maybe(random.choice(Activities)), "DATE_": "6/%d/2014" % random.randint(1, 30),
+            "ALTITUDE": Maybe(random.uniform(1000, 9000)), "PDOP": Maybe(random.uniform(0.8, 5)),
+            "PLANESPD": Maybe(random.randint(60, 120)), "TransectID": Maybe(random.randint(1, transects), 0.02),
+            "DIST2TRANS": Maybe(random.uniform(0, 800)), "Comments": Maybe(random.choice(Comments), 0.5),
+            "FORMNAME": random.choice(["Long", "Short"])}
+        for name in counts:
+            values[name] = Maybe(random.choice([0, 0, 0, 1, 2, 3, 5, 12]), 0.2)
+        rows.append(Record(fields, values))
+    return Layer(fields, "Point", True, rows)
+
+
+def FlatAreasLayer(count):
+    fields = Fields({0: ("OBJECTID", "OID", 4), 1: ("Shape", "Geometry", 0), 6: ("GeneratedSurveyID", "String", 50)}, 8)
+    rows = []
+    for area in range(count):
+        x, y = RandomLocation()
+        rows.append(Record(fields, {"OBJECTID": area + 1, "Shape": Ring(x, y, 0.01, random.randint(8, 40)),
+            "GeneratedSurveyID": "SYN-" + str(area)}))
+    return Layer(fields, "Polygon", False, rows)
+
+
+def TracklogLayer(count, centres):
+    fields = Fields({0: ("OBJECTID", "OID", 4), 1: ("SHAPE", "Geometry", 0), 2: ("GeneratedSurveyID", "String", 50),
+        4: ("TransectID", "Integer", 4), 5: ("SegType", "String", 20), 6: ("SegmentID", "Integer", 4),
+        9: ("Obs1Dir", "String", 1), 13: ("Comments", "String", 254)}, 14)
+    rows = []
+    for segment in range(count):
+        transect = random.randint(1, len(centres))
+        SegType = random.choice(["OnTransect", "OffTransect"])
+        x, y = centres[transect - 1] if SegType == "OnTransect" else RandomLocation()
+        rows.append(Record(fields, {"OBJECTID": segment + 1, "SHAPE": Track(x, y, random.randint(50, 400)),
+            "GeneratedSurveyID": "SYN", "TransectID": transect, "SegType": SegType, "SegmentID": segment + 1,
+            "Obs1Dir": random.choice(["L", "R"]), "Comments": Maybe(random.choice(Comments), 0.5)}))
+    return Layer(fields, "Polyline", False, rows)
+
+
+def BufferFinalLayer(count, centres):
+    fields = Fields({0: ("OBJECTID", "OID", 4), 1: ("SHAPE", "Geometry", 0), 2: ("TransectID", "Integer", 4)}, 3)
+    rows = []
+    for transect in range(count):
+        x, y = centres[transect % len(centres)]
+        rows.append([transect + 1, Ring(x, y, 0.02, random.randint(60, 200)), transect + 1])
+    return Layer(fields, "Polygon", False, rows)
+
+
+def GPSPointsLogLayer(count, centres):
+    fields = Fields({0: ("OBJECTID", "OID", 4), 1: ("SHAPE", "Geometry", 0), 2: ("DATE_", "String", 30),
+        3: ("ALTITUDE", "Double", 8), 10: ("TIME_", "String", 30), 12: ("PILOTLNAM", "String", 50),
+        13: ("AIRCRAFT", "String", 20)}, 14)
+    rows = []
+    pilot = random.choice(ObserverNames)
+    aircraft = random.choice(Aircraft)
+    for point in range(count):
+        if point % TransectPoints == 0:
+            x, y = centres[point // TransectPoints % len(centres)] # on to the next transect
+        x, y, z = Track(x, y, 1)[0]
+        seconds = point * 2
+        shape = Maybe([(x, y, None)], 0.002)
+        if point == count // 2:
+            shape = [(x, 95.0, None)] # a GPS glitch past the pole, which Sql Server refuses to make a geography of
+        rows.append(Record(fields, {"OBJECTID": point + 1, "SHAPE": shape, "DATE_": "6/%d/2014" % (1 + seconds // 86400 % 30),
+            "ALTITUDE": Maybe(random.uniform(1000, 9000)),
+            "TIME_": "%02d:%02d:%02d" % (seconds // 3600 % 24, seconds // 60 % 60, seconds % 60),
+            "PILOTLNAM": Maybe(pilot, 0.01), "AIRCRAFT": Maybe(aircraft, 0.01)}))
+    return Layer(fields, "Point", False, rows)
+
+
+# the columns of the Garmin waypoint and track shapefiles, WaypointsToSQL.py and TracklogToSQL.py read them by position
+GarminWaypointColumns = ["FID", "Shape", "TYPE", "IDENT", "LAT", "LONG", "Y_PROJ", "X_PROJ", "COMMENT", "DISPLAY",
+    "SYMBOL", "UNUSED1", "DIST", "PROX_INDEX", "COLOR", "ALTITUDE", "DEPTH", "TEMP", "TIME", "WPT_CLASS", "SUB_CLASS",
+    "ATTRIB", "LINK", "STATE", "COUNTRY", "CITY", "ADDRESS", "FACILITY", "CROSSROAD", "UNUSED2", "ETE", "DTYPE", "MODEL",
+    "FILENAME", "LTIME"]
+GarminTrackColumns = ["FID", "Shape", "TYPE", "IDENT", "TRK_IDENT", "LAT", "LONG", "Y_PROJ", "X_PROJ", "COMMENT",
+    "NEW_SEG", "DISPLAY", "COLOR", "DIST", "ALTITUDE", "DEPTH", "TEMP", "TIME", "MODEL", "FILENAME", "LTIME"]
+
+
+# function GarminFields
+# accepts: columns, list of column names
+# returns: list of (name, type, length) tuples of a Garmin shapefile
+def GarminFields(columns):
+    types = {"FID": ("OID", 4), "Shape": ("Geometry", 0), "LAT": ("Double", 8), "LONG": ("Double", 8),
+        "ALTITUDE": ("Double", 8)}
+    return [(name,) + types.get(name, ("String", 50)) for name in columns]
+
+
+def WaypointsShapefile(count):
+    fields = GarminFields(GarminWaypointColumns)
+    rows = []
+    for waypoint in range(count):
+        x, y = RandomLocation()
+        z = random.uniform(300, 2500)
+        rows.append(Record(fields, {"FID": waypoint, "Shape": [(x, y, z)], "TYPE": "WAYPOINT", "IDENT": "%03d" % (waypoint % 1000),
+            "LAT": y, "LONG": x, "COMMENT": "%02d-JUN-14 10:%02d" % (waypoint % 30 + 1, waypoint % 60),
+            "ALTITUDE": z / 0.3048, "MODEL": "GPSMAP 76CSx", "LTIME": "2014/06/%02d 10:%02d:00" % (waypoint % 30 + 1, waypoint % 60)}))
+    return Layer(fields, "Point", True, rows)
+
+
+def TracklogShapefile(count):
+    fields = GarminFields(GarminTrackColumns)
+    rows = []
+    x, y = RandomLocation()
+    for point in range(count):
+        x, y, z = Track(x, y, 1)[0]
+        seconds = point * 5
+        rows.append(Record(fields, {"FID": point, "Shape": [(x, y, None)], "TYPE": "TRACKPOINT", "IDENT": "ACTIVE LOG",
+            "LAT": y, "LONG": x, "COMMENT": "", "ALTITUDE": random.uniform(1000, 9000), "MODEL": "GPSMAP 76CSx",
+            "LTIME": "2014/06/01 %02d:%02d:%02d" % (seconds // 3600 % 24, seconds // 60 % 60, seconds % 60)}))
+    return Layer(fields, "Point", False, rows)
+
+
+def BuffersShapefile(count):
+    fields = [("FID", "OID", 4), ("Shape", "Geometry", 0), ("TransectID", "Integer", 4), ("PilotLNam", "String", 50),
+        ("SurveyName", "String", 50), ("F_AREA", "Double", 8)]
+    rows = []
+    for transect in range(count):
+        x, y = RandomLocation()
+        rows.append([transect, Ring(x, y, 0.02, random.randint(60, 200)), transect + 1, random.choice(ObserverNames),
+            "Synthetic 2014", random.uniform(1e6, 5e6)])
+    return Layer(fields, "Polygon", False, rows)
+
+
+# Shapefiles ------------------------------------------------------------------------------------------------------------
+# The waypoints, tracklog and buffers layers are also written out as real shapefiles beside the data file, so the
+# shapefile tools can be timed reading them with ShapefileReader.py instead of the stand-in arcpy.  Numbers are written
+# to the .dbf with 11 decimal places and nulls as blanks, so the scripts written from them differ slightly from the
+# stand-in's.
+
+# the .prj of the shapefiles
+WGS84Projection = 'GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",SPHEROID["WGS_1984",6378137.0,298.257223563]],' + \
+    'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]'
+
+
+# function ShapefileFiles
+# accepts: name, String, name of a shapefile's .shp
+# returns: list of the names of the files written for the shapefile
+def ShapefileFiles(name):
+    base = os.path.splitext(name)[0]
+    return [base + extension for extension in [".shp", ".shx", ".dbf", ".prj", ".cpg"]]
+
+
+# function ShapeRecord
+# accepts: layer, a layer whose geometries are points or single ring polygons. vertices, list of (x, y, z) tuples, or
+# None for a null geometry
+# returns: bytes, the content of the geometry's .shp record
+def ShapeRecord(layer, vertices):
+    if vertices is None:
+        return struct.pack("<i", 0)
+    if layer["shapeType"] == "Point":
+        x, y, z = vertices[0]
+        if layer["hasZ"]:
+            return struct.pack("<idddd", 11, x, y, z or 0.0, 0.0)
+        return struct.pack("<idd", 1, x, y)
+    ring = [(x, y) for x, y, z in vertices]
+    if sum([x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])]) > 0:
+        ring.reverse() # a shapefile's outer rings run clockwise
+    xs = [x for x, y in ring]
+    ys = [y for x, y in ring]
+    coordinates = [coordinate for point in ring for coordinate in point]
+    return struct.pack("<i4dii", 5, min(xs), min(ys), max(xs), max(ys), 1, len(ring)) + struct.pack("<i", 0) + \
+        struct.pack("<%dd" % len(coordinates), *coordinates)
+
+
+# function DBFValue
+# accepts: value, a record's value. fieldType, String, the arcpy field type. length, Integer, the .dbf field's length
+# returns: bytes, the value as it is written to the .dbf, padded to the field's length
+def DBFValue(value, fieldType, length):
+    if value is None:
+        return b" " * length
+    if fieldType == "Integer":
+        return str(value).rjust(length)[:length].encode("ascii")
+    if fieldType == "Double":
+        return ("%.11f" % value).rjust(length)[:length].encode("ascii")
+    text = value if not isinstance(value, bytes) else value.decode("utf-8")
+    return text.encode("utf-8")[:length].ljust(length, b" ")
+
+
+# function WriteShapefile
+# accepts: path, String, path of the .shp to write. layer, a synthetic point or polygon layer, see Layer
+# purpose: Writes the layer as a shapefile, its .shp, .shx, .dbf, .prj and .cpg
+def WriteShapefile(path, layer):
+    base = os.path.splitext(path)[0]
+    fields = [(name, fieldType, {"Integer": 9, "Double": 19}.get(fieldType, min(length, 254)))
+        for name, fieldType, length in layer["fields"] if fieldType not in ["OID", "Geometry"]]
+    shapeindex = [fieldType for name, fieldType, length in layer["fields"]].index("Geometry")
+    columns = [position for position, (name, fieldType, length) in enumerate(layer["fields"]) if fieldType not in ["OID", "Geometry"]]
+    records = [ShapeRecord(layer, row[shapeindex]) for row in layer["rows"]]
+
+    # the .shp and its .shx index, both start with the same header
+    shapeType = {"Point": 11 if layer["hasZ"] else 1, "Polygon": 5}[layer["shapeType"]]
+    xs = [x for row in layer["rows"] if row[shapeindex] is not None for x, y, z in row[shapeindex]]
+    ys = [y for row in layer["rows"] if row[shapeindex] is not None for x, y, z in row[shapeindex]]
+    def header(length):
+        return struct.pack(">7i", 9994, 0, 0, 0, 0, 0, length // 2) + struct.pack("<2i8d", 1000, shapeType, min(xs), min(ys),
+            max(xs), max(ys), 0, 0, 0, 0)
+    shp = open(base + ".shp", "wb")
+    shx = open(base + ".shx", "wb")
+    shp.write(header(100 + sum([8 + len(record) for record in records])))
+    shx.write(header(100 + 8 * len(records)))
+    offset = 100
+    for number, record in enumerate(records):
+        shp.write(struct.pack(">2i", number + 1, len(record) // 2) + record)
+        shx.write(struct.pack(">2i", offset // 2, len(record) // 2))
+        offset = offset + 8 + len(record)
+    shp.close()
+    shx.close()
+
+    # the .dbf, a header, the field descriptors and then the records, each starting with a blank deleted flag
+    dbf = open(base + ".dbf", "wb")
+    dbf.write(struct.pack("<4BIHH20x", 3, 114, 6, 1, len(layer["rows"]), 32 + 32 * len(fields) + 1,
+        1 + sum([length for name, fieldType, length in fields])))
+    for name, fieldType, length in fields:
+        dbftype = {"Integer": b"N", "Double": b"N"}.get(fieldType, b"C")
+        decimals = 11 if fieldType == "Double" else 0
+        dbf.write(name.encode("ascii")[:10].ljust(11, b"\x00") + dbftype + b"\x00" * 4 + struct.pack("<BB", length, decimals) +
+            b"\x00" * 14)
+    dbf.write(b"\r")
+    for row in layer["rows"]:
+        dbf.write(b" " + b"".join([DBFValue(row[position], fieldType, length)
+            for position, (name, fieldType, length) in zip(columns, fields)]))
+    dbf.write(b"\x1a")
+    dbf.close()
+
+    for extension, text in [(".prj", WGS84Projection), (".cpg", "UTF-8")]:
+        textfile = open(base + extension, "w")
+        textfile.write(text)
+        textfile.close()
+
+
+# function TurningTracks
+# returns: list of (name, points) tuples of GPS tracks that turn back on themselves, each point an (x, y) tuple, for
+# checking the along track thinning keeps their turns, see RunBenchmarks.CheckAlongTrackThinning.  A point 450m east
+# and straight back, 2km out and back along the same line, a 1km wide loop flown back over its start, and a wandering
+# track that now and then doubles back.
+def TurningTracks(seed = 2014):
+    random.seed(seed)
+    north = 1.0 / 111320.0 # degrees of latitude a meter
+    east = north / math.cos(math.radians(66.0)) # degrees of longitude a meter at 66 north
+    out = [(-150.0 + point * 100 * east, 66.0) for point in range(21)]
+    loop = [(-150.0 + 500 * math.sin(angle * math.pi / 36) * east, 66.0 + 500 * (1 - math.cos(angle * math.pi / 36)) * north)
+        for angle in range(80)]
+    wandering = []
+    x, y, heading = -150.0, 66.0, 0.0
+    for point in range(3000):
+        if random.random() < 0.2:
+            heading = heading + random.gauss(0, 0.3)
+        if random.random() < 0.01:
+            heading = heading + math.pi
+        x = x + 50 * math.cos(heading) * east
+        y = y + 50 * math.sin(heading) * north
+        wandering.append((x + random.gauss(0, 1) * east, y + random.gauss(0, 1) * north))
+    return [
+        ("back to its start", [(-150.0, 66.0), (-149.99, 66.0), (-150.0, 66.0001), (-150.0, 66.0002)]),
+        ("out and back", out + out[-2::-1]),
+        ("loop", loop),
+        ("wandering", wandering),
+        ]
+
+
+# function VertexTracklogName
+# accepts: count, Integer, one of VertexCounts
+# returns: String, the name of the tracklog shapefile with that many vertices, relative to the benchmark directory
+def VertexTracklogName(count):
+    return "Tracklog" + str(count) + "Vertices.shp"
+
+
+# function WriteVertexTracklogs
+# accepts: directory, String, the benchmark directory. counts, list of the VertexCounts to write. seed, Integer,
+# seed of the random values
+# purpose: Writes a tracklog shapefile of each number of vertices.  They are only written as shapefiles, not into
+# the data file, so only the native reader reads them and a run's memory is the script's own.  A million vertices
+# takes a .dbf of about 850MB.
+def WriteVertexTracklogs(directory, counts, seed = 2014):
+    directory = directory.replace("\\", "/").rstrip("/") + "/"
+    for count in counts:
+        random.seed(seed + count)
+        WriteShapefile(directory + VertexTracklogName(count), TracklogShapefile(count))
+
+
+# function GenerateSyntheticData
+# accepts: directory, String, the benchmark directory. sizes, dictionary of layer name: number of records, see
+# LayerSizes. seed, Integer, seed of the random values
+# returns: dictionary of the layers written to the data file, SyntheticData.pickle in the directory
+def GenerateSyntheticData(directory, sizes, seed = 2014):
+    random.seed(seed)
+    directory = directory.replace("\\", "/").rstrip("/") + "/"
+    gdb = directory + GeodatabaseName + "/"
+    transects = max(1, sizes["TrnOrig"])
+    centres = [RandomLocation() for transect in range(transects)]
+    layers = {
+        gdb + "TrnOrig": TrnOrigLayer(sizes["TrnOrig"], centres),
+        gdb + "TrnPoints": TrnPointsLayer(sizes["TrnPoints"]),
+        gdb + "Animals": AnimalsLayer(sizes["Animals"], transects),
+        gdb + "FlatAreas": FlatAreasLayer(sizes["FlatAreas"]),
+        gdb + "Tracklog": TracklogLayer(sizes["Tracklog"], centres),
+        gdb + "Buffer_Final": BufferFinalLayer(sizes["Buffer_Final"], centres),
+        gdb + "GPSPointsLog": GPSPointsLogLayer(sizes["GPSPointsLog"], centres),
+        directory + WaypointsName: WaypointsShapefile(sizes["Waypoints"]),
+        directory + TracklogName: TracklogShapefile(sizes["TracklogShapefile"]),
+        directory + BuffersName: BuffersShapefile(sizes["Buffers"]),
+        }
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    datafilename = directory + DataFileName
+    datafile = open(datafilename, "wb")
+    pickle.dump(layers, datafile, 2) # protocol 2 can be read by both Python 2 and 3
+    datafile.close()
+    for name in [WaypointsName, TracklogName, BuffersName]:
+        WriteShapefile(directory + name, layers[directory + name])
+    return layers
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python SyntheticGDB.py <benchmark directory> <number of GPS points>")
+    GenerateSyntheticData(sys.argv[1], LayerSizes(int(sys.argv[2])))
@@ -0,0 +1,280 @@
+# arcpy/__init__.py
+# Purpose: A stand-in for the parts of ESRI's arcpy library used by the Dall's sheep SQL script generators, so the
+# generators can be run and timed by RunBenchmarks.py on a machine without ArcGIS.  The layers are read from the
+# synthetic data file written by SyntheticGDB.py and the toolbox parameters are taken from an environment variable.
+# This is NOT arcpy; only put this directory on the Python path for benchmark runs.
+
+# The stand-in is written in Python so reading a layer costs differently than it does with ArcGIS, in particular
+# FeatureClassToNumPyArray is built on the stand-in SearchCursor instead of being done in native code.  The benchmarks
+# compare the work the generators do themselves, building and writing the SQL, more faithfully than the reading.
+
+# Environment variables read when the module is imported:
+# SHEEP_BENCHMARK_DATA, path of the synthetic data file written by SyntheticGDB.py
+# SHEEP_BENCHMARK_PARAMETERS, JSON list of the toolbox parameters, returned by GetParameterAsText
+# SHEEP_BENCHMARK_VERBOSE, set to anything to print the AddMessage messages to standard error
+
+import json
+import os
+import pickle
+import struct
+import sys
+
+# the synthetic layers, keyed by path, see SyntheticGDB.py for the layout
+Layers = {}
+if os.environ.get("SHEEP_BENCHMARK_DATA", "") != "":
+    datafile = open(os.environ["SHEEP_BENCHMARK_DATA"], "rb")
+    Layers = pickle.load(datafile)
+    datafile.close()
+
+Parameters = json.loads(os.environ.get("SHEEP_BENCHMARK_PARAMETERS", "[]"))
+Verbose = os.environ.get("SHEEP_BENCHMARK_VERBOSE", "") != ""
+
+
+# toolbox parameters and messages ------------------------------------------------------------------------------------------
+def GetParameterAsText(index):
+    if index < len(Parameters):
+        return str(Parameters[index])
+    return ""
+
+
+def GetArgumentCount():
+    return len(Parameters)
+
+
+def AddMessage(message):
+    if Verbose:
+        sys.stderr.write(str(message) + "\n")
+
+
+def AddWarning(message):
+    AddMessage(message)
+
+
+def AddError(message):
+    AddMessage(message)
+
+
+# geometry ------------------------------------------------------------------------------------------------------------
+class SpatialReference:
+    def __init__(self, factoryCode):
+        self.factoryCode = factoryCode
+        self.name = "GCS_WGS_1984"
+
+
+class Point:
+    def __init__(self, X, Y, Z = None):
+        self.X = X
+        self.Y = Y
+        self.Z = Z
+
+
+# class Geometry
+# accepts: shapeType, String, "point", "polyline" or "polygon". coordinates, list of (x, y, z) tuples, the ring of a
+# polygon is closed
+# purpose: The few properties and methods of an arcpy geometry the generators use.  Like the real cursor, a new geometry object is
+# built for every record read through the SHAPE@ token; the WKT and WKB are built when they are asked for.
+class Geometry(object):
+    def __init__(self, shapeType, coordinates):
+        self.type = shapeType
+        self.coordinates = coordinates
+        self.pointCount = len(coordinates)
+        self.firstPoint = Point(*coordinates[0])
+        self.lastPoint = Point(*coordinates[-1])
+
+    @property
+    def WKT(self):
+        if self.type == "point":
+            return "POINT (" + repr(self.firstPoint.X) + " " + repr(self.firstPoint.Y) + ")"
+        points = ", ".join([repr(x) + " " + repr(y) for x, y, z in self.coordinates])
+        if self.type == "polyline":
+            return "MULTILINESTRING ((" + points + "))"
+        return "MULTIPOLYGON (((" + points + ")))"
+
+    @property
+    def WKB(self):
+        points = b"".join([struct.pack("<dd", x, y) for x, y, z in self.coordinates])
+        if self.type == "point":
+            return bytearray(struct.pack("<bI", 1, 1) + points)
+        if self.type == "polyline":
+            return bytearray(struct.pack("<bII", 1, 2, self.pointCount) + points)
+        return bytearray(struct.pack("<bIII", 1, 3, 1, self.pointCount) + points)
+
+    # the geometry's parts, each a list of its points, as iterating over an arcpy geometry returns them
+    def __iter__(self):
+        return iter([[Point(*coordinate) for coordinate in self.coordinates]])
+
+    # Douglas-Peucker simplification, keeping every vertex further than max_offset from the simplified shape
+    def generalize(self, max_offset):
+        if self.type == "point":
+            return self
+        kept = [False] * self.pointCount
+        kept[0] = kept[-1] = True
+        spans = [(0, self.pointCount - 1)]
+        while spans:
+            first, last = spans.pop()
+            (x1, y1, z1), (x2, y2, z2) = self.coordinates[first], self.coordinates[last]
+            length = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+            furthest, distance = None, max_offset
+            for index in range(first + 1, last):
+                x, y, z = self.coordinates[index]
+                if length == 0:
+                    offset = ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+                else:
+                    offset = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+                if offset > distance:
+                    furthest, distance = index, offset
+            if furthest is not None:
+                kept[furthest] = True
+                spans.extend([(first, furthest), (furthest, last)])
+        coordinates = [point for point, keep in zip(self.coordinates, kept) if keep]
+        if self.type == "polygon" and len(coordinates) < 4:
+            return self # too few vertices left for a ring
+        return Geometry(self.type, coordinates)
+
+
+# describing layers ------------------------------------------------------------------------------------------------------------
+class Field:
+    def __init__(self, name, fieldType, length):
+        self.name = name
+        self.type = fieldType
+        self.length = length
+        self.aliasName = name
+
+
+class Description:
+    def __init__(self, layer):
+        self.shapeType = layer["shapeType"]
+        self.hasZ = layer["hasZ"]
+        self.fields = [Field(name, fieldType, length) for name, fieldType, length in layer["fields"]]
+        self.spatialReference = SpatialReference(4326)
+
+
+def Exists(path):
+    return path in Layers
+
+
+def Describe(path):
+    return Description(LayerOf(path))
+
+
+def ListFields(path):
+    return Describe(path).fields
+
+
+def AddFieldDelimiters(path, field):
+    return field
+
+
+def LayerOf(path):
+    if path not in Layers:
+        raise IOError("ERROR 000732: Dataset " + str(path) + " does not exist or is not supported")
+    return Layers[path]
+
+
+# function ColumnReader
+# accepts: layer, dictionary of the synthetic layer. field, String, a column name or a SHAPE@ token
+# returns: function taking a record of the layer and returning the value the real cursor gives for the column
+def ColumnReader(layer, field):
+    names = [name.upper() for name, fieldType, length in layer["fields"]]
+    shapeindex = [fieldType for name, fieldType, length in layer["fields"]].index("Geometry")
+    shapeType = layer["shapeType"].lower()
+    token = field.upper()
+    if token == "SHAPE@" or token == names[shapeindex]:
+        return lambda row: None if row[shapeindex] is None else Geometry(shapeType, row[shapeindex])
+    if token == "SHAPE@XY":
+        return lambda row: (None, None) if row[shapeindex] is None else row[shapeindex][0][:2]
+    if token in ["SHAPE@X", "SHAPE@Y", "SHAPE@Z"]:
+        axis = ["SHAPE@X", "SHAPE@Y", "SHAPE@Z"].index(token)
+        if axis == 2 and not layer["hasZ"]:
+            return lambda row: None
+        return lambda row: None if row[shapeindex] is None else row[shapeindex][0][axis]
+    if token == "OID@":
+        return lambda row: row[0]
+    if token not in names:
+        raise RuntimeError("Cannot find field '" + field + "'")
+    index = names.index(token)
+    return lambda row: row[index]
+
+
+# reading layers ------------------------------------------------------------------------------------------------------------
+# class SearchCursor
+# purpose: arcpy.da.SearchCursor over a synthetic layer.  Only the requested columns are returned, as tuples, in the
+# requested order.  The where clause and spatial reference are ignored, the synthetic data is already in WGS84.
+class SearchCursor:
+    def __init__(self, in_table, field_names, where_clause = None, spatial_reference = None, explode_to_points = False,
+            sql_clause = (None, None)):
+        layer = LayerOf(in_table)
+        if field_names == "*":
+            field_names = [name for name, fieldType, length in layer["fields"]]
+        elif isinstance(field_names, str):
+            field_names = [field_names]
+        self.fields = tuple(field_names)
+        self.readers = [ColumnReader(layer, field) for field in field_names]
+        self.rows = layer["rows"]
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= len(self.rows):
+            raise StopIteration
+        row = self.rows[self.position]
+        self.position = self.position + 1
+        return tuple([reader(row) for reader in self.readers])
+
+    next = __next__ # Python 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        return False
+
+
+# function FeatureClassToNumPyArray
+# purpose: arcpy.da.FeatureClassToNumPyArray over a synthetic layer.  Like the real function it can't return nulls,
+# a null is replaced by the column's value in null_value or raises an error if the column has none.
+def FeatureClassToNumPyArray(in_table, field_names, where_clause = None, spatial_reference = None, explode_to_points = False,
+        skip_nulls = False, null_value = None):
+    import numpy
+    layer = LayerOf(in_table)
+    fieldtypes = {}
+    for name, fieldType, length in layer["fields"]:
+        fieldtypes[name.upper()] = (fieldType, length)
+    if null_value is None:
+        null_value = {}
+    dtypes = []
+    columns = []
+    for field in field_names:
+        if field.upper() in ["SHAPE@X", "SHAPE@Y", "SHAPE@Z"]:
+            dtype = "<f8"
+        else:
+            fieldType, length = fieldtypes[field.upper()]
+            dtype = {"OID": "<i4", "Integer": "<i4", "SmallInteger": "<i2", "Single": "<f4", "Double": "<f8",
+                "Date": "<M8[us]"}.get(fieldType, "<U" + str(length))
+        column = []
+        for (value,) in SearchCursor(in_table, [field]):
+            if value is None:
+                if field not in null_value:
+                    raise RuntimeError("Field " + field + " contains a null value and no null_value was given")
+                value = null_value[field]
+            column.append(value)
+        dtypes.append((str(field), dtype))
+        columns.append(column)
+    array = numpy.empty(len(layer["rows"]), dtype = dtypes)
+    for (field, dtype), column in zip(dtypes, columns):
+        array[field] = column
+    return array
+
+
+# arcpy.da
+class DataAccess:
+    pass
+
+da = DataAccess()
+da.SearchCursor = SearchCursor
+da.FeatureClassToNumPyArray = FeatureClassToNumPyArray
@@ -0,0 +1,117 @@
+# pyodbc/__init__.py
+# Purpose: A stand-in for the parts of the pyodbc library used by the direct database load of NPSdotGDBtoSQLServer.py
+# and by OneOffScripts/ImportGPSPoints.py, backed by SQLite, so the loads can be run, timed and checked on a machine
+# without Sql Server.  The ARCN_Sheep tables the loads insert into are created in the SQLite database, with just the
+# columns the loads fill in, and the geography functions are stood in for by functions that store the Well-Known Text
+# or Binary as it is, see Geography.
+# This is NOT pyodbc; only put this directory on the Python path for benchmark runs.
+
+# Environment variables read when a connection is opened:
+# SHEEP_BENCHMARK_DATABASE, path of the SQLite database file, an in-memory database if not set
+
+import os
+import re
+import sqlite3
+import sys
+
+Error = sqlite3.Error
+
+pooling = True
+
+# the ARCN_Sheep tables, with the columns the direct load fills in.  The identity columns are SQLite row ids.
+Tables = {
+    "Transect_or_Unit_Information": "TransectID INTEGER PRIMARY KEY, SurveyID, Elevation_M, Aircraft, ObserverName1, " + \
+        "ObserverName2, PilotName, Precipitation, TurbulenceIntensity, TurbulenceDuration, Temperature, TargetLength, Notes, " + \
+        "GeneratedTransectID, FlownDate, Flown, CenterPoint, GeneratedTransect",
+    "TransectPoints": "TransectPointID INTEGER PRIMARY KEY, SurveyID, Elev_M, HasTransect, GeneratedSurveyID, TransectPoint",
+    "Animals": "AnimalID INTEGER PRIMARY KEY, TransectID, PDOP, Speed, SampleDate, DistanceToTransect, Ewes, EweLike, Lambs, " + \
+        "Rams_LessThanFullCurl, Rams_FullCurl, UnclassifiedRams, UnclassifiedSheep, Activity, PlaneAltitude, Yearlings, " + \
+        "GroupNumber, Comments, LongOrShortForm, Rams1_2Curl, Rams3_4Curl, Rams7_8Curl, Rams1_4Curl, Rams_GT_7_8Curl, Location",
+    "TransectTracklog": "TracklogID INTEGER PRIMARY KEY, TransectID, SegmentType, Observer1Direction, SegmentLine, Comments",
+    "Buffers": "BufferID INTEGER PRIMARY KEY, TransectID, GeneratedSurveyID, GeneratedTransectID, SegmentID, Obs1Dir, " + \
+        "PolygonFeature, BufferFileDirectory",
+    "FlatAreas": "FlatAreaID INTEGER PRIMARY KEY, GeneratedSurveyID, SurveyID, PolygonFeature",
+    "GPSTracks": "GPSTrackID INTEGER PRIMARY KEY, PilotName, TailNo, CaptureDate, GPSModel, Altitude, Source, SourceFileName, " + \
+        "TracksFileDirectory, Comment, PointFeature, SurveyID",
+    }
+
+
+# function SQLiteQuery
+# accepts: query, String, a T-SQL query
+# returns: String, the query with the geography::ST... functions renamed to the SQLite functions standing in for them
+def SQLiteQuery(query):
+    return query.replace("geography::", "geography_")
+
+
+# function SQLiteParameters
+# accepts: parameters, sequence of the values bound to a query
+# returns: tuple of the values, with any WKB bytearray as a value SQLite stores as a blob
+def SQLiteParameters(parameters):
+    if sys.version_info[0] < 3:
+        return tuple([buffer(value) if isinstance(value, bytearray) else value for value in parameters])
+    return tuple([bytes(value) if isinstance(value, bytearray) else value for value in parameters])
+
+
+# function Geography
+# accepts: geometry, String, the Well-Known Text of a geography. srid, Integer
+# returns: the Well-Known Text as it is, standing in for the geography.  Like Sql Server's geography functions it
+# raises an error for a latitude outside -90 to 90, e.g. a GPS glitch, so a bad record fails its insert.
+def Geography(geometry, srid):
+    if geometry is not None:
+        for vertex in re.split(r"[(),]", geometry):
+            coordinates = vertex.split() # x y and maybe z, or a geometry type such as POINT
+            if len(coordinates) >= 2 and coordinates[0][:1] in "-.0123456789" and not -90.0 <= float(coordinates[1]) <= 90.0:
+                raise ValueError("Latitude values must be between -90 and 90 degrees.")
+    return geometry
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+        self.fast_executemany = False
+
+    def execute(self, query, parameters = ()):
+        self.cursor.execute(SQLiteQuery(query), SQLiteParameters(parameters))
+        return self
+
+    def executemany(self, query, rows):
+        self.cursor.executemany(SQLiteQuery(query), [SQLiteParameters(parameters) for parameters in rows])
+
+    def commit(self):
+        self.cursor.connection.commit()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def close(self):
+        self.cursor.close()
+
+
+class Connection:
+    def __init__(self, database):
+        self.connection = sqlite3.connect(database)
+        for function in ["STGeomFromText", "STPointFromText"]:
+            self.connection.create_function("geography_" + function, 2, Geography)
+        self.connection.create_function("geography_STGeomFromWKB", 2, lambda geometry, srid: geometry)
+        for table in sorted(Tables):
+            self.connection.execute("CREATE TABLE IF NOT EXISTS " + table + "(" + Tables[table] + ")")
+        self.connection.commit()
+
+    def cursor(self):
+        return Cursor(self.connection)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+def connect(connectionstring, autocommit = False):
+    return Connection(os.environ.get("SHEEP_BENCHMARK_DATABASE", "") or ":memory:")
@@ -0,0 +1,142 @@
+# GPSFileBatch.py
+# Purpose: The batch mode of the National Park Service Arctic and Central Alaska Networks Dall's sheep monitoring
+# program's WaypointsToSQL.py and TracklogToSQL.py, which converts a whole directory of the pilots' GPS shapefiles in
+# one run instead of one shapefile per run.
+
+# A survey season leaves hundreds of waypoint and track shapefiles, renamed by OneOffScripts/GPSFilesRenamer.py to
+# start with the pilot's name and the aircraft's tail number, e.g. Andy_Greenblatt_N12345_AG12345_Waypoints.shp.  The
+# batch mode takes the PilotName and TailNo of each shapefile from its name and converts the shapefiles at the same
+# time in a pool of worker processes, one per processor, each writing its own script.  The scripts are either left
+# beside their shapefiles or combined, in the order of the shapefiles' names, into one script for the whole directory.
+# A summary of each shapefile's conversion is written beside the directory.
+
+import fnmatch
+import getpass
+import os
+import re
+import shutil
+import sys
+import time
+
+# the batch outputs, a script for each shapefile or one combined script
+BatchOutputs = ["PERFILE", "COMBINED"]
+
+# the name GPSFilesRenamer.py gives a shapefile: the pilot's name, with its spaces made underscores, the tail number,
+# N and then the number the pilot's own file name started with, and the pilot's own file name
+RenamedFileName = re.compile(r"^(?P<pilot>.+?)_(?P<tail>N[0-9][0-9A-Za-z]*)_.+$")
+
+
+# function BatchOutput
+# accepts: output, String, the batch output supplied by the user, blank for the default of a script per shapefile
+# returns: String, "PERFILE" or "COMBINED"
+# purpose: Checks the batch output supplied by the user
+def BatchOutput(output):
+    output = output.strip().upper().replace(" ", "").replace("-", "")
+    if output == "":
+        return "PERFILE"
+    if output not in BatchOutputs:
+        sys.exit("ERROR: Unknown batch output '" + output + "', use COMBINED for one script or leave blank for a script per shapefile")
+    return output
+
+
+# function PilotAndTail
+# accepts: filename, String, name or path of a shapefile renamed by GPSFilesRenamer.py
+# returns: tuple of the pilot's name and the aircraft's tail number, e.g. ("Andy Greenblatt", "N12345"), (None, None)
+# if they can't be taken from the name
+def PilotAndTail(filename):
+    match = RenamedFileName.match(os.path.basename(filename))
+    if match is None:
+        return (None, None)
+    return (match.group("pilot").replace("_", " "), match.group("tail"))
+
+
+# function ShapefilePilotAndTail
+# accepts: filename, String, path of the one shapefile to convert. PilotName, TailNo, String, supplied by the user,
+# blank to take them from the shapefile's name
+# returns: tuple of the PilotName and TailNo to write, the ones supplied if both were, otherwise those of the name
+# GPSFilesRenamer.py gave the shapefile
+def ShapefilePilotAndTail(filename, PilotName, TailNo):
+    if PilotName != "" and TailNo != "":
+        return (PilotName, TailNo)
+    pilot, tail = PilotAndTail(filename)
+    if pilot is None:
+        sys.exit("ERROR: Supply the PilotName and TailNo, they can't be taken from the name of " + filename)
+    return (pilot, tail)
+
+
+# function BatchFiles
+# accepts: directory, String, the directory of shapefiles. pattern, String, the file names to convert, e.g.
+# *_Waypoints.shp, blank for every shapefile. PilotName, TailNo, String, used for the shapefiles whose names they can't
+# be taken from, blank to skip those shapefiles
+# returns: tuple of a list of (path, PilotName, TailNo) tuples of the shapefiles to convert, in the order of their
+# names, and a list of the paths of the shapefiles skipped
+def BatchFiles(directory, pattern, PilotName, TailNo):
+    pattern = pattern.strip() or "*.shp"
+    files = []
+    skipped = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if not filename.lower().endswith(".shp") or not fnmatch.fnmatch(filename.lower(), pattern.lower()) or not os.path.isfile(path):
+            continue
+        pilot, tail = PilotAndTail(filename)
+        if pilot is None and PilotName != "" and TailNo != "":
+            pilot, tail = PilotName, TailNo
+        if pilot is None:
+            skipped.append(path)
+        else:
+            files.append((path, pilot, tail))
+    return (files, skipped)
+
+
+# function RunBatch
+# accepts: worker, function converting one shapefile, defined at the top level of its script so the worker processes
+# can find it.  jobs, list of tuples of the arguments of each call of the worker
+# returns: list of what the worker returned for each job, in the order of the jobs
+# purpose: Runs the jobs at the same time in a pool of worker processes, one per processor, see
+# NPSdotGDBtoSQLServer.ExportLayersInParallel.  The script's run at the top level must be inside an
+# if __name__ == "__main__" block, on Windows each worker process runs the script's top level again.
+def RunBatch(worker, jobs):
+    if len(jobs) == 0:
+        return []
+    import multiprocessing
+    # inside ArcMap sys.executable is ArcMap itself, the worker processes have to be started with the python interpreter
+    if os.name == "nt" and not os.path.basename(sys.executable).lower().startswith("python"):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+    pool = multiprocessing.Pool(min(len(jobs), multiprocessing.cpu_count()))
+    results = [pool.apply_async(worker, job) for job in jobs]
+    pool.close()
+    results = [result.get() for result in results]
+    pool.join()
+    return results
+
+
+# function CombineScripts
+# accepts: combinedfile, String, path of the combined script, already holding its header. parts, list of the paths of
+# the scripts to add to it, in order
+# purpose: Appends the scripts to the combined script and deletes them.  The scripts are copied as they are, compressed
+# or not: gzip members and Zstandard frames written one after another decompress as one script.
+def CombineScripts(combinedfile, parts):
+    combined = open(combinedfile, "ab")
+    for part in parts:
+        partfile = open(part, "rb")
+        shutil.copyfileobj(partfile, combined)
+        partfile.close()
+        os.remove(part)
+    combined.close()
+
+
+# function WriteSummary
+# accepts: filename, String, path of the summary to write. title, String, its first line. rows, list of the
+# (status, shapefile, PilotName, TailNo, records read, output script) of each shapefile
+# returns: String, the path of the summary written
+def WriteSummary(filename, title, rows):
+    summary = open(filename, "w")
+    summary.write(title + "\n")
+    summary.write("Written " + time.strftime("%c") + " by " + getpass.getuser() + "\n")
+    summary.write(str(len([row for row in rows if row[0] == "succeeded"])) + " of " + str(len(rows)) + " shapefiles converted, " + \
+        str(sum([row[4] for row in rows])) + " records\n\n")
+    summary.write("Status|Shapefile|PilotName|TailNo|Records|Output\n")
+    for row in rows:
+        summary.write("|".join([str(value) for value in row]) + "\n")
+    summary.close()
+    return filename
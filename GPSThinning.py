@@ -0,0 +1,196 @@
+# GPSThinning.py
+# Purpose: Thins out the GPS points logged by NPS.gdb's GPSPointsLog layer before they are exported, shared by the
+# National Park Service Arctic and Central Alaska Networks Dall's sheep monitoring program's NPSdotGDBtoSQLServer.py and
+# OneOffScripts/ImportGPSPoints.py.
+
+# The GPS logs a point every second or two for the whole of every survey flight, hundreds of thousands of points a
+# season, far more than are needed to show where the aircraft flew.  The points can be thinned three ways, each
+# applied to the points the one before it kept:
+# time interval, drop the points logged less than this many seconds after the last point kept.
+# minimum distance, drop the points less than this many meters from the last point kept.
+# along track, drop the points that lie within this many meters of the straight line between the points either side
+# of them that are kept, so the straight legs of a flight are kept as their ends and the turns are kept in detail.
+# Douglas-Peucker simplification needs the whole track at once so the along track thinning is done with the
+# sleeve-fitting method of Zhao and Saalfeld instead, which decides on each point as it is read: a point is dropped
+# for as long as the direction from the last point kept to the newest point stays within the tolerance of every point
+# in between.  Direction alone can't tell when the track turns back on itself, e.g. an out-and-back leg or a loop
+# flown back over its start, so the point before the newest one is also kept once the newest point is more than the
+# tolerance closer to the last point kept than the furthest point since.  The points are thinned as they are read
+# from the cursor so the layer is never held in memory.
+
+import datetime
+import math
+import sys
+
+# meters along a degree of latitude, the distances are worked out on a flat projection of each pair of points
+MetersPerDegree = 111320.0
+
+# the formats NPS.gdb's DATE_ and TIME_ columns have been seen in, as joined with a space
+HitDateFormats = ["%m/%d/%Y %H:%M:%S", "%m/%d/%Y %I:%M:%S %p", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S"]
+
+
+# function ThinningTolerance
+# accepts: tolerance, String, a thinning tolerance supplied by the user, blank not to thin that way. name, String, what
+# the tolerance is, for the error message
+# returns: Float, the tolerance, 0 not to thin that way
+def ThinningTolerance(tolerance, name):
+    tolerance = tolerance.strip()
+    if tolerance == "":
+        return 0.0
+    try:
+        value = float(tolerance)
+    except ValueError:
+        value = -1.0
+    if not value >= 0: # also catches NaN
+        sys.exit("ERROR: " + name + " '" + tolerance + "' must be a number of 0 or more")
+    return value
+
+
+# function HitSeconds
+# accepts: HitDate, String, the date and time a point was logged, the DATE_ and TIME_ columns joined with a space
+# returns: Float, the time in seconds, None if the date and time can't be read
+def HitSeconds(HitDate):
+    HitDate = str(HitDate).strip()
+    for dateformat in HitDateFormats:
+        try:
+            hit = datetime.datetime.strptime(HitDate, dateformat)
+        except ValueError:
+            continue
+        return (hit - datetime.datetime(1970, 1, 1)).total_seconds()
+    return None
+
+
+# function Offset
+# accepts: fromPoint, toPoint, (x, y) tuples in decimal degrees
+# returns: tuple of the east and north offsets in meters from the first point to the second
+def Offset(fromPoint, toPoint):
+    latitude = math.radians((fromPoint[1] + toPoint[1]) / 2.0)
+    return ((toPoint[0] - fromPoint[0]) * math.cos(latitude) * MetersPerDegree, (toPoint[1] - fromPoint[1]) * MetersPerDegree)
+
+
+# function Angle
+# accepts: angle, Float, radians
+# returns: Float, the same angle between -pi and pi
+def Angle(angle):
+    return math.atan2(math.sin(angle), math.cos(angle))
+
+
+# class PointThinner
+# accepts: interval, Float, seconds. distance, Float, meters. tolerance, Float, meters, the along track tolerance.
+# 0 for any of them not to thin that way
+# purpose: Thins a layer's GPS points as they are read, see thin(), and counts how many were kept and dropped.
+class PointThinner:
+    def __init__(self, interval, distance, tolerance):
+        self.interval = interval
+        self.distance = distance
+        self.tolerance = tolerance
+        self.counts = {"read": 0, "withoutPoint": 0, "kept": 0, "droppedByInterval": 0, "droppedByDistance": 0,
+            "droppedAlongTrack": 0}
+
+    # accepts: rows, iterable of the layer's records, e.g. a cursor. location, function taking a record and returning its
+    # (x, y, HitDate), None if the record has no point
+    # returns: generator of the records that are kept, in the order they were read.  Records without a point are dropped
+    # and counted as withoutPoint.
+    def thin(self, rows, location):
+        return self.alongTrack(self.byDistance(self.byInterval(self.points(rows, location))))
+
+    # the records with a point, as (record, (x, y), HitDate) tuples
+    def points(self, rows, location):
+        for row in rows:
+            self.counts["read"] = self.counts["read"] + 1
+            point = location(row)
+            if point is None or point[0] is None or point[1] is None:
+                self.counts["withoutPoint"] = self.counts["withoutPoint"] + 1
+                continue
+            yield (row, (point[0], point[1]), point[2])
+
+    def byInterval(self, points):
+        if self.interval <= 0:
+            for point in points:
+                yield point
+            return
+        last = None # time of the last point kept
+        for point in points:
+            seconds = HitSeconds(point[2])
+            # points with no readable time are kept, as are points logged before the last one, e.g. a new log
+            if seconds is not None and last is not None and last <= seconds < last + self.interval:
+                self.counts["droppedByInterval"] = self.counts["droppedByInterval"] + 1
+                continue
+            if seconds is not None:
+                last = seconds
+            yield point
+
+    def byDistance(self, points):
+        if self.distance <= 0:
+            for point in points:
+                yield point
+            return
+        last = None # location of the last point kept
+        for point in points:
+            if last is not None:
+                east, north = Offset(last, point[1])
+                if math.hypot(east, north) < self.distance:
+                    self.counts["droppedByDistance"] = self.counts["droppedByDistance"] + 1
+                    continue
+            last = point[1]
+            yield point
+
+    # the sleeve-fitting thinning, see the notes at the top.  anchor is the last point kept and pending the newest point,
+    # which is kept if the next point doesn't fit.  Directions are measured from reference, the direction from the
+    # anchor to the first point further than the tolerance from it, and lowest and highest bound the directions from the
+    # anchor that pass within the tolerance of every point since the anchor.  farthest is the distance from the anchor
+    # of the furthest point since it.
+    def alongTrack(self, points):
+        if self.tolerance <= 0:
+            for point in points:
+                self.counts["kept"] = self.counts["kept"] + 1
+                yield point[0]
+            return
+        anchor = None
+        pending = None
+        reference = None
+        lowest = highest = 0.0
+        farthest = 0.0
+        for point in points:
+            if anchor is None:
+                anchor = point[1]
+                self.counts["kept"] = self.counts["kept"] + 1
+                yield point[0]
+                continue
+            east, north = Offset(anchor, point[1])
+            length = math.hypot(east, north)
+            direction = math.atan2(north, east)
+            if reference is not None and (length < farthest - self.tolerance or \
+                    (length > self.tolerance and not lowest <= Angle(direction - reference) <= highest)):
+                # the newest point is off the line, or the track has turned back towards the anchor, so keep the one
+                # before it and start again from there
+                anchor = pending[1]
+                self.counts["kept"] = self.counts["kept"] + 1
+                yield pending[0]
+                reference = None
+                east, north = Offset(anchor, point[1])
+                length = math.hypot(east, north)
+                direction = math.atan2(north, east)
+                farthest = 0.0
+            elif pending is not None:
+                self.counts["droppedAlongTrack"] = self.counts["droppedAlongTrack"] + 1
+            if length > self.tolerance:
+                spread = math.asin(self.tolerance / length)
+                if reference is None:
+                    reference = direction
+                    lowest, highest = -spread, spread
+                else:
+                    offset = Angle(direction - reference)
+                    lowest, highest = max(lowest, offset - spread), min(highest, offset + spread)
+            farthest = max(farthest, length)
+            pending = point
+        if pending is not None: # the end of the track is always kept
+            self.counts["kept"] = self.counts["kept"] + 1
+            yield pending[0]
+
+    # returns: String, a summary of the points kept and dropped, e.g. for arcpy.AddMessage
+    def message(self):
+        counts = self.counts
+        return "GPS thinning: " + str(counts["kept"]) + " of " + str(counts["read"] - counts["withoutPoint"]) + \
+            " points kept, dropped " + str(counts["droppedByInterval"]) + " by time interval, " + \
+            str(counts["droppedByDistance"]) + " by distance and " + str(counts["droppedAlongTrack"]) + " along track"
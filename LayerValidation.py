@@ -0,0 +1,134 @@
+# LayerValidation.py
+# Purpose: Checks the layers of NPS.gdb for the records that would make a load of the National Park Service Arctic and
+# Central Alaska Networks Dall's sheep monitoring program's ARCN_Sheep database fail, before any script is written or
+# anything is loaded.  Used by NPSdotGDBtoSQLServer.py, which knows the rules of each layer.
+
+# Each layer's scripts insert thousands of records inside one transaction, so a single record breaking one of the
+# database's constraints, e.g. a tracklog segment with a SegType the table doesn't allow, rolls the whole load back,
+# often an hour or more into it.  Each layer is read once, a record at a time, and every problem found is collected
+# into one report so they can all be fixed before the export is run again.
+# Problems are either errors, which would stop the export or make the database reject the load, or warnings, which
+# would be loaded but are probably not what was meant, e.g. a record without a geometry that is skipped.
+
+import math
+import RingGeometry
+
+# the range of a Sql Server geography's longitudes and latitudes
+MaxLongitude = 180.0
+MaxLatitude = 90.0
+
+
+# function CoordinateProblem
+# accepts: x, y, the longitude and latitude of a point or vertex
+# returns: String, what is wrong with them, None if they are a valid geography point
+def CoordinateProblem(x, y):
+    if x is None or y is None or math.isnan(x) or math.isnan(y):
+        return "has a coordinate that is not a number"
+    if not (-MaxLongitude <= x <= MaxLongitude and -MaxLatitude <= y <= MaxLatitude):
+        return "has the coordinates " + repr(x) + " " + repr(y) + ", outside the longitudes and latitudes of a geography"
+    return None
+
+
+# function ShapeParts
+# accepts: shape, arcpy geometry
+# returns: list of the geometry's parts, each a list of rings of (x, y) tuples.  A line part has one ring, a polygon
+# part has its outer ring followed by its holes.
+def ShapeParts(shape):
+    parts = []
+    for part in shape:
+        rings = [[]]
+        for point in part:
+            if point is None: # the start of a hole
+                rings.append([])
+            else:
+                rings[-1].append((point.X, point.Y))
+        parts.append(rings)
+    return parts
+
+
+# function GeometryProblems
+# accepts: shape, arcpy polyline or polygon geometry
+# returns: tuple of lists of the error and warning messages about the geometry, empty if it is a valid geography
+# purpose: Checks the coordinates are longitudes and latitudes, that each line has at least two distinct vertices and
+# each polygon ring is closed and encloses an area.  Which way the rings run isn't checked, the layers store their
+# outer rings clockwise as Esri does and the generators write them as they are read.  Rings that cross themselves are
+# left to Sql Server.
+def GeometryProblems(shape):
+    errors = []
+    warnings = []
+    parts = ShapeParts(shape)
+    for rings in parts:
+        for ring in rings:
+            for x, y in ring:
+                problem = CoordinateProblem(x, y)
+                if problem is not None:
+                    errors.append("Shape " + problem)
+                    return (errors, warnings)
+    if len(parts) == 0:
+        errors.append("Shape is empty")
+    for rings in parts:
+        for position, ring in enumerate(rings):
+            if shape.type == "polyline":
+                if len(set(ring)) < 2:
+                    errors.append("Shape has a line with fewer than 2 distinct vertices")
+                continue
+            name = "an outer ring" if position == 0 else "a hole"
+            if len(ring) < 4 or len(set(ring)) < 3:
+                errors.append("Shape has " + name + " with fewer than 3 distinct vertices")
+            elif ring[0] != ring[-1]:
+                errors.append("Shape has " + name + " that is not closed")
+            elif RingGeometry.RingArea(ring) == 0:
+                errors.append("Shape has " + name + " with no area")
+    return (errors, warnings)
+
+
+# class ValidationReport
+# accepts: filename, String, path of the report to write. title, String, the report's first line
+# purpose: Collects the problems found in each layer and writes them out as a text report, one line per problem.
+class ValidationReport:
+    def __init__(self, filename, title):
+        self.filename = filename
+        self.title = title
+        self.layers = [] # names of the layers checked, in order
+        self.counts = {} # layer: {"features", "errors", "warnings"}
+        self.problems = {} # layer: list of (severity, OBJECTID, message)
+
+    def startLayer(self, layer):
+        self.layers.append(layer)
+        self.counts[layer] = {"features": 0, "errors": 0, "warnings": 0}
+        self.problems[layer] = []
+
+    # record a feature's problems, see GeometryProblems
+    def record(self, layer, objectid, errors, warnings):
+        counts = self.counts[layer]
+        counts["features"] = counts["features"] + 1
+        for message in errors:
+            self.problems[layer].append(("ERROR", objectid, message))
+        for message in warnings:
+            self.problems[layer].append(("WARNING", objectid, message))
+        counts["errors"] = counts["errors"] + len(errors)
+        counts["warnings"] = counts["warnings"] + len(warnings)
+
+    def errorCount(self):
+        return sum([counts["errors"] for counts in self.counts.values()])
+
+    def warningCount(self):
+        return sum([counts["warnings"] for counts in self.counts.values()])
+
+    # returns: String, the number of features checked and problems found in a layer, e.g. for arcpy.AddMessage
+    def layerMessage(self, layer):
+        counts = self.counts[layer]
+        return layer + ": " + str(counts["features"]) + " features checked, " + str(counts["errors"]) + " errors, " + \
+            str(counts["warnings"]) + " warnings"
+
+    # returns: String, the path of the report written
+    def write(self):
+        reportstream = open(self.filename, "w")
+        reportstream.write(self.title + "\n")
+        reportstream.write(str(self.errorCount()) + " errors and " + str(self.warningCount()) + " warnings\n")
+        for layer in self.layers:
+            reportstream.write("\n" + self.layerMessage(layer) + "\n")
+            for severity, objectid, message in self.problems[layer]:
+                reportstream.write(severity + "|" + layer + "|OBJECTID " + str(objectid) + "|" + message + "\n")
+        reportstream.close()
+        return self.filename
@@ -9,8 +9,8 @@
 # When executed, the insert queries will insert a record in the appropriate database table.
 
 # Notes on using the script:
-# This script does not interact with the ARCN_Sheep database in any way; it just exports .sql scripts, so there is
-# no danger of database corruption to test-running the script.
+# Unless a database server is supplied (see DatabaseServer below) this script does not interact with the ARCN_Sheep
+# database in any way; it just exports .sql scripts, so there is no danger of database corruption to test-running the script.
 # The script is designed to be run via an ArcGIS toolbox tool.
 # Ensure the column mappings from the geodatabase to Sql Server tables are correct.
 # Python requires forward slashes for directory delimiters contrary to Windows.  Replace '\' with '/' in any paths.
@@ -23,8 +23,18 @@
 
 # import the arcpy library
 import arcpy
+import hashlib
+import json
+import numpy
 import os
 import sys
+import SQLScriptFiles
+import SQLGeography
+import RunTelemetry
+import GPSThinning
+import SurveyFilter
+import LayerValidation
+import ToolParameters
 
 # USER MUST SUPPLY THE VARIABLES BELOW --------------------------------------------
 # Supply a path to the .mxd containing NPS.gdb workspace
@@ -37,6 +47,106 @@ sqlscriptpath = os.path.dirname(NPSdotGdbMxd) + '/'
 # e.g. the Itkillik 2011 Survey's SurveyID is '1AC66891-5D1E-4749-B962-40AB1BCA577F'
 # Contact the Network data manager for this value
 SurveyID = arcpy.GetParameterAsText(1)
+
+# Optional: the number of records to group into each multi-row INSERT INTO ... VALUES (...),(...) statement.
+# Grouping rows lets Sql Server parse, plan and log many records per statement instead of one at a time.
+# Leave blank (or 1) to write one insert query per record.  Sql Server allows at most 1000 rows per VALUES list.
+InsertBatchSize = ToolParameters.OptionalParameter(arcpy, 2)
+
+# Optional: output format for the GPSPointsLog layer.  Leave blank (or SQL) to write insert queries.  BULK writes a
+# tab delimited data file, a bcp format file and a small driver script that loads the data file with BULK INSERT
+# and copies it into GPSTracks with a single set based insert query, which is many times faster for big GPS logs.
+GPSPointsLogFormat = ToolParameters.OptionalParameter(arcpy, 3).upper()
+
+# Optional: true to export the layers at the same time in separate worker processes, one per layer, instead of one
+# after another.  The layers are independent of each other so on a multi-core workstation the export takes about
+# as long as the slowest layer.  Leave blank (or false) to export the layers one at a time.
+ExportInParallel = ToolParameters.OptionalParameter(arcpy, 4).lower() == "true"
+
+# Optional: split each layer's script into a series of self-contained scripts (<layer>.0001.sql, <layer>.0002.sql, ...)
+# of at most this many megabytes and/or records, listed in order in <layer>.manifest.txt.  Each script has its own
+# USE, BEGIN TRANSACTION and DECLARE/SET header so it can be run, or rerun, on its own.  Leave blank for one script per layer.
+MaxShardMegabytes = ToolParameters.OptionalParameter(arcpy, 5)
+MaxShardRows = ToolParameters.OptionalParameter(arcpy, 6)
+
+# Optional: GZIP or ZSTD to compress the scripts as they are written (<layer>.sql.gz or <layer>.sql.zst), the
+# uncompressed scripts never touch the disk.  Stream a compressed script into sqlcmd with:
+# python SQLScriptFiles.py "C:\Your Script.sql.gz" | sqlcmd /S SERVER\INSTANCE
+# Leave blank for plain text scripts.
+ScriptCompression = ToolParameters.OptionalParameter(arcpy, 7)
+
+# Optional: WKB to write the geometries as hexadecimal Well-Known Binary, geography::STGeomFromWKB(0x..., 4326),
+# which gives smaller scripts that Sql Server loads faster.  Leave blank (or WKT) to write Well-Known Text.
+GeometryEncoding = SQLGeography.GeometryEncoding(ToolParameters.OptionalParameter(arcpy, 8))
+
+# Optional: true to read the point layers (TrnPoints, Animals and GPSPointsLog) into NumPy arrays all at once and
+# convert their values a whole column at a time instead of record by record, which is much quicker for big layers.
+# The scripts are the same either way.  Leave blank (or false) to read the layers a record at a time.
+ColumnarReads = ToolParameters.OptionalParameter(arcpy, 9).lower() == "true"
+
+# Optional: true to export only what has changed in the Animals and Tracklog layers since the survey's last export.
+# Each layer's <layer>.incremental.json, next to the scripts, keeps the OBJECTID of every exported feature with a hash
+# of the values written for it, so a rerun writes insert queries for new features, UPDATE queries for changed features
+# and DELETE queries for removed ones.  Turn it on for the survey's first export, a feature that was exported before
+# it had a manifest is treated as new, and run every script it writes against the database, in order, because the
+# manifest assumes that they have been.  The other layers are always exported in full.  Leave blank (or false) to
+# export every feature.
+IncrementalExport = ToolParameters.OptionalParameter(arcpy, 10).lower() == "true"
+
+# Optional: the Sql Server, e.g. SERVER\INSTANCE, to load the layers straight into the ARCN_Sheep database instead of
+# writing scripts.  The layers are inserted over a single connection with parameterized insert queries, TrnOrig first
+# so the other layers can be related to its transects, and the whole load is committed at the end, or rolled back if
+# any layer fails, so the database is never left half loaded or locked.  No scripts are written and the sharding,
+# compression, columnar, parallel and incremental options don't apply.  Needs the pyodbc library.  Leave blank to
+# write the .sql scripts.
+DatabaseServer = ToolParameters.OptionalParameter(arcpy, 11)
+
+# Optional: true to write scripts that load each layer in bulk through a staging table.  Each script inserts the
+# layer's records as they are into a temporary staging table, InsertBatchSize records (1000 if left blank) per insert
+# query, then checks them and loads them all into the layer's table with a single MERGE, which builds the geographies
+# and looks up the TransectIDs for every record at once.  The MERGE matches each record to the row it was loaded into
+# before, e.g. an animal by its transect and GroupNumber, updating that row instead of inserting another, so running
+# a survey's scripts again does not duplicate it.  Records that are not on one of the survey's transects are reported
+# and left out.  The GPSPointsLog layer is not affected and IncrementalExport doesn't apply.  Leave blank (or false)
+# to write insert queries straight into the tables.
+StagingMerge = ToolParameters.OptionalParameter(arcpy, 12).lower() == "true"
+
+# Optional: the number of decimal places to round the coordinates of the line and polygon layers (TrnOrig, Tracklog,
+# Buffer_Final and FlatAreas) to when they are written as Well-Known Text, e.g. 6 decimal places of a degree is about
+# 10 cm on the ground.  Leave blank to write the coordinates with full precision.
+CoordinatePrecision = SQLGeography.CoordinatePrecision(ToolParameters.OptionalParameter(arcpy, 13))
+
+# Optional: a distance in meters to simplify the lines and polygons of those layers by, dropping the vertices that
+# don't move the line or polygon by more than the distance.  The vertices and bytes saved in each layer are reported
+# in the run report.  Leave blank to write every vertex.
+SimplifyTolerance = SQLGeography.SimplifyTolerance(ToolParameters.OptionalParameter(arcpy, 14))
+
+# Optional: thin out the GPSPointsLog layer's points as they are read, see GPSThinning.py.  GPSThinInterval drops the
+# points logged less than this many seconds after the last point kept, GPSThinDistance the points less than this many
+# meters from it, and GPSThinTolerance the points within this many meters of the straight line along the track between
+# the points either side of them that are kept.  The points kept and dropped are reported in the run report.  Leave
+# them blank to write every GPS point.
+GPSThinInterval = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 15), "GPS thinning interval")
+GPSThinDistance = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 16), "GPS thinning distance")
+GPSThinTolerance = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 17), "GPS thinning tolerance")
+
+# Optional: drop the features of the GPSPointsLog, Tracklog and Animals layers recorded outside the survey, e.g. on
+# ferry flights or while testing the equipment, before they are exported, see SurveyFilter.py.  SurveyBuffers is the
+# path of the survey's buffer polygons, e.g. NPS.gdb/Buffer_Final or the buffers shapefile, and drops the features
+# outside all of them.  SurveyExtent is a bounding box in decimal degrees, "west south east north", and drops the
+# features outside it.  SurveyDates is the first and last days of the survey, e.g. "6/1/2014 6/30/2014", and drops the
+# features dated outside them.  The features kept and dropped are reported in the run report.  Leave them blank to
+# export every feature.
+SurveyBuffers = ToolParameters.OptionalParameter(arcpy, 18)
+SurveyExtent = SurveyFilter.SurveyExtent(ToolParameters.OptionalParameter(arcpy, 19))
+SurveyDatesText = ToolParameters.OptionalParameter(arcpy, 20) # as supplied, for the run report
+SurveyDates = SurveyFilter.SurveyDates(SurveyDatesText)
+
+# Optional: true to check the layers to be exported for the records that would make the export or the load fail, e.g.
+# a tracklog segment with a SegType the database doesn't allow or an animal whose TransectID isn't in TrnOrig, before
+# anything is exported.  Every problem found is listed in NPSdotGDBtoSQLServer.validation.txt in the output directory
+# and the export is only run if there are no errors.  Leave blank (or false) to export without checking.
+PreflightValidation = ToolParameters.OptionalParameter(arcpy, 21).lower() == "true"
 # -----------------------------------------------------------------------------
 
 # echo the parameters
@@ -44,6 +154,44 @@ arcpy.AddMessage("Input geodatabase: " + NPSdotGdbMxd + '\n')
 arcpy.AddMessage("Output directory: " + sqlscriptpath + '\n')
 arcpy.AddMessage("SurveyID: " + SurveyID + '\n')
 
+# validate the insert batch size, Sql Server rejects table value constructors of more than 1000 rows
+MaxInsertBatchSize = 1000
+if InsertBatchSize == "":
+    InsertBatchSize = 1
+    BulkBatchSize = MaxInsertBatchSize # rows per statement of the direct load and the staged merge, see DatabaseServer and StagingMerge
+else:
+    InsertBatchSize = max(1, min(int(InsertBatchSize), MaxInsertBatchSize))
+    BulkBatchSize = InsertBatchSize
+arcpy.AddMessage("Rows per insert query: " + str(InsertBatchSize) + '\n')
+
+# the staged merge scripts already update the rows loaded before instead of inserting them again, see StagingMerge
+if StagingMerge and IncrementalExport:
+    arcpy.AddMessage("Staged merge scripts are written in full, ignoring the incremental export\n")
+    IncrementalExport = False
+
+# the survey's buffer polygons must exist before anything is exported, see SurveyBuffers
+if SurveyBuffers != "" and not arcpy.Exists(SurveyBuffers):
+    errormessage = "ERROR: Survey buffers " + SurveyBuffers + " do not exist"
+    arcpy.AddMessage(errormessage)
+    sys.exit(errormessage)
+
+# connection to the ARCN_Sheep database for the direct load
+DatabaseConnectionString = 'DRIVER={SQL Server Native Client 10.0};SERVER=' + DatabaseServer + ';DATABASE=ARCN_Sheep;Trusted_Connection=yes'
+if DatabaseServer != "":
+    arcpy.AddMessage("Loading directly into: " + DatabaseConnectionString + '\n')
+
+# shard budgets, 0 means no limit
+if MaxShardMegabytes == "":
+    MaxShardBytes = 0
+else:
+    MaxShardBytes = int(float(MaxShardMegabytes) * 1024 * 1024)
+if MaxShardRows == "":
+    MaxShardRows = 0
+else:
+    MaxShardRows = int(MaxShardRows)
+
+# file name suffix of the scripts, .sql unless they are compressed
+ScriptSuffix = SQLScriptFiles.ScriptSuffix(ScriptCompression)
 
 # spatial coordinate system
 # the data in the output sql script will be in the reference system indicated below
@@ -60,6 +208,25 @@ executiontime = time.strftime("%c")
 import getpass
 user = getpass.getuser()
 
+# the settings above that the worker processes need when the layers are exported in parallel.  The worker processes
+# are not run by the toolbox so they cannot read the toolbox parameters themselves.
+WorkerSettings = ["NPSdotGdbMxd", "sqlscriptpath", "InsertBatchSize", "GPSPointsLogFormat", "MaxShardBytes", "MaxShardRows",
+    "ScriptSuffix", "GeometryEncoding", "ColumnarReads", "IncrementalExport", "StagingMerge", "BulkBatchSize", "CoordinatePrecision",
+    "SimplifyTolerance", "GPSThinInterval", "GPSThinDistance", "GPSThinTolerance", "SurveyBuffers",
+    "SurveyExtent", "SurveyDates", "executiontime", "user"]
+
+# the run report, NPSdotGDBtoSQLServer.report.json in the output directory, records how long each layer took and how
+# much it wrote, see RunTelemetry.py
+Telemetry = RunTelemetry.RunReport("NPSdotGDBtoSQLServer", sqlscriptpath + "NPSdotGDBtoSQLServer.report.json",
+    {"input": NPSdotGdbMxd, "SurveyID": SurveyID, "InsertBatchSize": InsertBatchSize, "GPSPointsLogFormat": GPSPointsLogFormat,
+    "ExportInParallel": ExportInParallel, "MaxShardBytes": MaxShardBytes, "MaxShardRows": MaxShardRows,
+    "ScriptSuffix": ScriptSuffix, "GeometryEncoding": GeometryEncoding, "ColumnarReads": ColumnarReads,
+    "IncrementalExport": IncrementalExport, "DatabaseServer": DatabaseServer, "StagingMerge": StagingMerge,
+    "CoordinatePrecision": CoordinatePrecision, "SimplifyTolerance": SimplifyTolerance,
+    "GPSThinInterval": GPSThinInterval, "GPSThinDistance": GPSThinDistance, "GPSThinTolerance": GPSThinTolerance,
+    "SurveyBuffers": SurveyBuffers, "SurveyExtent": SurveyExtent, "SurveyDates": SurveyDatesText,
+    "PreflightValidation": PreflightValidation})
+
 
 # function fixArcGISNullString
 # accepts: str, String to process. quote, Boolean, whether to surround the returned string with single quotes, nullToZero,
@@ -92,6 +259,1002 @@ def fixArcGISNull(inputString, quoted, nullToZero):
     return newStr
 
 
+# the arcpy field types whose values come out of a cursor as numbers or dates, or None for nulls
+IntegerFieldTypes = ["SmallInteger", "Integer", "OID"]
+TypedFieldTypes = IntegerFieldTypes + ["Single", "Double", "Date"]
+
+
+# function SQLConverters
+# accepts: fc, String, path of the layer. formats, list of (column, quoted, nullToZero) tuples, quoted and nullToZero
+# as for fixArcGISNull
+# returns: dictionary of column: function taking a value of the column and returning it formatted for SQL
+# purpose: Made once per layer from the layer's field types so that each value is converted by a function made for
+# its type instead of going through fixArcGISNull.  Numbers and dates can only be None or a value whose str() needs
+# no cleaning up, so they skip fixArcGISNull's strip, quote doubling and null string comparisons.  Text columns still
+# need all of that and get fixArcGISNull itself.  The result is always exactly what fixArcGISNull gives.
+def SQLConverters(fc, formats):
+    fields = ResolveColumns(fc, [column for column, quoted, nullToZero in formats])
+    converters = {}
+    for (column, quoted, nullToZero), field in zip(formats, fields):
+        if field.type in TypedFieldTypes:
+            if nullToZero:
+                null = "0"
+            else:
+                null = "NULL"
+            if quoted:
+                converter = lambda value, null = null: null if value is None else "'" + str(value) + "'"
+            else:
+                converter = lambda value, null = null: null if value is None else str(value)
+        else:
+            converter = lambda value, quoted = quoted, nullToZero = nullToZero: fixArcGISNull(value, quoted, nullToZero)
+        converters[column] = converter
+    return converters
+
+
+# function NumberConverter
+# accepts: fc, String, path of the layer. column, String, name of a numeric column
+# returns: function taking a value of the column and returning it as a float, 0.0 for nulls
+# purpose: float(fixArcGISNull(str(value), False, True)) without the string round trip for integer columns.  Floating
+# point columns keep the float(str()) round trip because Python 2's str() rounds to 12 significant digits and the
+# scripts must not change.
+def NumberConverter(fc, column):
+    field = ResolveColumns(fc, [column])[0]
+    if field.type in IntegerFieldTypes:
+        return lambda value: 0.0 if value is None else float(value)
+    if field.type in ["Single", "Double"]:
+        return lambda value: 0.0 if value is None else float(str(value))
+    return lambda value: float(fixArcGISNull(str(value), False, True))
+
+
+# class ScriptValues
+# accepts: fc, String, path of the layer. formats, list of (column, quoted, nullToZero) tuples of the layer's columns,
+# see SQLConverters. staged, Boolean, whether the geographies are written as just their literals for a StagedMerge.
+# numbers, list of the numeric columns converted to floats, see NumberConverter
+# purpose: Writes the values of a layer's records into the VALUES lists of its script.  Each layer's *Values function,
+# e.g. AnimalsValues, turns a record into the values of its row through these methods, and LoadValues has the same
+# methods binding the values to the direct load's queries instead, so the scripts and the direct load can't drift apart.
+class ScriptValues:
+    def __init__(self, fc, formats, staged, numbers = []):
+        self.converters = SQLConverters(fc, formats)
+        self.staged = staged
+        self.floats = {}
+        for column in numbers:
+            self.floats[column] = NumberConverter(fc, column)
+
+    # a column of the layer, converted for its type
+    def column(self, name, value):
+        return self.converters[name](value)
+
+    # a numeric column of the layer as a float, 0.0 for nulls
+    def toFloat(self, name, value):
+        return self.floats[name](value)
+
+    # a number worked out from the record
+    def number(self, value):
+        return str(value)
+
+    # text worked out from the record, None for a null
+    def text(self, value):
+        if value is None:
+            return "NULL"
+        return "'" + str(value).replace("'", "''") + "'"
+
+    # text worked out from the record that may be one of ArcGIS's null strings, see fixArcGISNull
+    def nullableText(self, value):
+        return fixArcGISNull(value, True, False)
+
+    # a value that isn't taken from the record, written as sql and bound as value
+    def constant(self, sql, value):
+        return sql
+
+    # the TransectID of the transect with the GeneratedTransectID recorded in the field, see TransectLookupSQL
+    def transect(self, GeneratedTransectID):
+        return str(GeneratedTransectID)
+
+    # a point read through the SHAPE@XY and SHAPE@Z tokens, see SQLGeography.GeographyFromXY
+    def point(self, XY, Z, textFunction = "STGeomFromText"):
+        if self.staged:
+            return SQLGeography.GeographyLiteralFromXY(XY, Z, GeometryEncoding)
+        return SQLGeography.GeographyFromXY(XY, Z, epsg, GeometryEncoding, textFunction)
+
+    # a point given as Well-Known Text, which is written as it is whatever the GeometryEncoding
+    def pointWKT(self, WKT):
+        if self.staged:
+            return "'" + WKT + "'"
+        return "geography::STPointFromText('" + WKT + "', " + str(epsg) + ")"
+
+    # a geometry read through the SHAPE@ token. reducer, the layer's SQLGeography.GeometryReducer, see LayerGeometryReducer
+    def shape(self, shape, reducer):
+        if self.staged:
+            return SQLGeography.GeographyLiteral(shape, GeometryEncoding, reducer)
+        return SQLGeography.GeographyFromShape(shape, epsg, GeometryEncoding, "STGeomFromText", reducer)
+
+    # returns: String, the record's VALUES list
+    def join(self, values):
+        return ",".join(values)
+
+
+# class InsertBatchWriter
+# accepts: file, the open output .sql file. insertPrefix, String, the INSERT INTO table(columns) VALUES part of the query.
+# batchSize, Integer, the number of records to group into each insert query. goSeparated, Boolean, whether to
+# precede each query with a PRINT of the row numbers and follow it with a GO batch separator. insertSuffix, String,
+# optional text to put after the VALUES lists, e.g. the rest of an INSERT INTO ... SELECT ... FROM (VALUES ...) query
+# purpose: Collects the VALUES lists of the records destined for a single table and writes them to the output file as
+# multi-row INSERT INTO ... VALUES (...),(...) queries of up to batchSize records each.  With a batchSize of 1 the
+# queries are written exactly as they were before batching was introduced, one INSERT per record.
+# Call add() for each record and flush() once after the last record so the final partial batch is written.
+class InsertBatchWriter:
+    def __init__(self, file, insertPrefix, batchSize, goSeparated = False, insertSuffix = ""):
+        self.file = file
+        self.insertPrefix = insertPrefix
+        self.insertSuffix = insertSuffix
+        self.batchSize = batchSize
+        self.goSeparated = goSeparated
+        self.rows = [] # VALUES lists waiting to be written
+        self.rowCount = 0 # number of records written so far
+
+    # add the VALUES list of one record (without the surrounding parentheses), writes a query when the batch is full
+    def add(self, values):
+        self.rows.append("(" + values + ")")
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    # write the waiting records, if any, as a single insert query
+    def flush(self):
+        if len(self.rows) == 0:
+            return
+        firstRow = self.rowCount + 1
+        self.rowCount = self.rowCount + len(self.rows)
+        statement = ""
+        if self.goSeparated:
+            if len(self.rows) == 1:
+                statement = "PRINT 'ROW " + str(firstRow) + "';\n"
+            else:
+                statement = "PRINT 'ROWS " + str(firstRow) + "-" + str(self.rowCount) + "';\n"
+        if len(self.rows) == 1:
+            statement = statement + self.insertPrefix + self.rows[0] + self.insertSuffix + ";\n"
+        else:
+            statement = statement + self.insertPrefix + "\n" + ",\n".join(self.rows) + self.insertSuffix + ";\n"
+        if self.goSeparated:
+            statement = statement + "GO\n\n"
+        if hasattr(self.file, "writeRecords"): # a ShardedScriptFile, or a layer's RunTelemetry.TimedFile
+            self.file.writeRecords(statement, len(self.rows))
+        else:
+            self.file.write(statement)
+        self.rows = []
+
+
+# class ShardedScriptFile
+# accepts: root, String, path of the layer's script without the file name suffix. suffix, String, file name suffix of
+# the scripts, e.g. '.sql'. maxBytes, Integer, the
+# approximate size at which to start a new shard, 0 for no limit. maxRows, Integer, the number of records at which
+# to start a new shard, 0 for no limit
+# purpose: Stands in for the output file of a layer's .sql script and splits the insert queries across a series of
+# smaller scripts, e.g. Animals.0001.sql, Animals.0002.sql, so no one script is too big for Sql Server Management
+# Studio to open.  Everything written before the first insert query (the USE, BEGIN TRANSACTION and DECLARE/SET
+# statements) is repeated at the top of every shard and everything written after the last insert query is appended
+# to every shard, so each shard is self-contained and can be run, or rerun, on its own.  Insert queries are never
+# split across shards.  A manifest, e.g. Animals.manifest.txt, lists the shards in the order they were written.
+class ShardedScriptFile:
+    def __init__(self, root, suffix, maxBytes, maxRows):
+        self.root = root
+        self.suffix = suffix
+        self.name = root + suffix
+        self.maxBytes = maxBytes
+        self.maxRows = maxRows
+        self.header = "" # text written before the first insert query
+        self.footer = "" # text written after the last insert query
+        self.recordsStarted = False
+        self.shards = [] # [file name, records, size] of each shard
+        self.shard = None # the shard currently being written
+
+    # header and footer text, anything that is not an insert query
+    def write(self, text):
+        if self.recordsStarted:
+            self.footer = self.footer + text
+        else:
+            self.header = self.header + text
+
+    # an insert query of rowCount records, starts a new shard first if the query would push the current one over budget
+    def writeRecords(self, text, rowCount):
+        self.recordsStarted = True
+        if self.shard is not None:
+            shardRows = self.shards[-1][1]
+            shardBytes = self.shards[-1][2]
+            full = (self.maxBytes > 0 and shardBytes + len(text) > self.maxBytes) or \
+                (self.maxRows > 0 and shardRows + rowCount > self.maxRows)
+            if full and shardRows > 0:
+                self.shard.close()
+                self.shard = None
+        if self.shard is None:
+            self.openShard()
+        self.shard.write(text)
+        self.shards[-1][1] = self.shards[-1][1] + rowCount
+        self.shards[-1][2] = self.shards[-1][2] + len(text)
+
+    # start the next shard with a copy of the header
+    def openShard(self):
+        shardName = self.root + "." + "%04d" % (len(self.shards) + 1) + self.suffix
+        self.shard = SQLScriptFiles.OpenOutputFile(shardName, "w")
+        header = self.header.replace(self.name, shardName) # the header refers to the script by name
+        self.shard.write(header)
+        self.shards.append([shardName, 0, len(header)])
+
+    # finish every shard with the footer and write the manifest
+    def close(self):
+        if len(self.shards) == 0:
+            self.openShard() # no records, still write the script so the layer isn't silently missing
+        self.shard.close()
+        for shard in self.shards:
+            shardFile = SQLScriptFiles.OpenOutputFile(shard[0], "a")
+            shardFile.write(self.footer)
+            shardFile.close()
+        manifest = open(self.root + ".manifest.txt", "w")
+        manifest.write("# Shards of " + self.name + " in the order they were written: file name, records, approximate uncompressed size in bytes\n")
+        for shard in self.shards:
+            manifest.write(os.path.basename(shard[0]) + "\t" + str(shard[1]) + "\t" + str(shard[2] + len(self.footer)) + "\n")
+        manifest.close()
+        arcpy.AddMessage(str(len(self.shards)) + " shards listed in " + manifest.name)
+
+
+# function OpenSQLScript
+# accepts: root, String, path of the script to write without the file name suffix, e.g. 'C:/Survey/Animals'
+# returns: the open output file, or a ShardedScriptFile if the scripts are to be sharded
+# purpose: Opens the output script of a layer, compressing it as it is written if requested
+def OpenSQLScript(root):
+    if MaxShardBytes > 0 or MaxShardRows > 0:
+        return ShardedScriptFile(root, ScriptSuffix, MaxShardBytes, MaxShardRows)
+    return SQLScriptFiles.OpenOutputFile(root + ScriptSuffix, "w")
+
+
+# function ResolveColumns
+# accepts: fc, String, path of the layer. columns, list of the columns the target table needs, in the order they are
+# to be returned.  Geometry is requested with a token, e.g. SHAPE@.  A column whose name differs between versions of
+# the layer can be given as a tuple of the possible names, the first one the layer has is used.
+# returns: list with the layer's arcpy Field for each requested column, the token itself for each token, or None for
+# a SHAPE@Z token if the layer has no z values
+# purpose: Looks the columns up by name, ignoring case, so the export doesn't break when the columns of a layer change
+# places.  Aborts with an error naming the column if the layer doesn't have one of the requested columns.
+def ResolveColumns(fc, columns):
+    layerfields = {}
+    for field in arcpy.ListFields(fc):
+        layerfields[field.name.upper()] = field
+    resolved = []
+    for column in columns:
+        if column == "SHAPE@Z" and not arcpy.Describe(fc).hasZ:
+            resolved.append(None)
+            continue
+        if isinstance(column, str) and "@" in column:
+            resolved.append(column) # geometry and other tokens are understood by the cursor whatever the column is called
+            continue
+        if isinstance(column, str):
+            column = (column,)
+        for name in column:
+            if name.upper() in layerfields:
+                resolved.append(layerfields[name.upper()])
+                break
+        else:
+            errormessage = 'ERROR: Layer ' + fc + ' has no column ' + " or ".join(column)
+            arcpy.AddMessage(errormessage)
+            sys.exit(errormessage)
+    return resolved
+
+
+# function ProjectedSearchCursor
+# accepts: fc, String, path of the layer. columns, list of the columns the target table needs, see ResolveColumns.
+# If the layer has no z values the SHAPE@Z token returns None.
+# returns: arcpy.da.SearchCursor returning just the requested columns in the requested order
+# purpose: Each layer has dozens of columns but the target tables only need a few of them.  Asking the cursor for just
+# those columns saves reading, and building Python objects for, all the others.
+def ProjectedSearchCursor(fc, columns):
+    resolved = ResolveColumns(fc, columns)
+    fields = []
+    missingZ = None # position of a SHAPE@Z token the layer can't supply
+    for column in resolved:
+        if column is None:
+            missingZ = len(fields)
+        elif isinstance(column, str):
+            fields.append(column)
+        else:
+            fields.append(column.name)
+    cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
+    if missingZ is not None:
+        return (row[:missingZ] + (None,) + row[missingZ:] for row in cursor)
+    return cursor
+
+
+# function LayerGeometryReducer
+# returns: SQLGeography.GeometryReducer rounding and simplifying a line or polygon layer's geometries, see
+# CoordinatePrecision and SimplifyTolerance, None if they are written in full
+def LayerGeometryReducer():
+    if CoordinatePrecision is None and SimplifyTolerance == 0:
+        return None
+    return SQLGeography.GeometryReducer(CoordinatePrecision, SimplifyTolerance)
+
+
+# function ReportGeometryReduction
+# accepts: reducer, the layer's SQLGeography.GeometryReducer or None. telemetry, the layer's RunTelemetry.LayerTelemetry
+# purpose: Reports the vertices and bytes the reducer saved, in the messages and the run report
+def ReportGeometryReduction(reducer, telemetry):
+    if reducer is not None:
+        telemetry.geometryReduction = reducer.counts
+        arcpy.AddMessage(reducer.message())
+
+
+# function GPSPointsLogThinner
+# returns: GPSThinning.PointThinner thinning the GPSPointsLog layer's points, see GPSThinInterval, GPSThinDistance and
+# GPSThinTolerance, None if every point is written
+def GPSPointsLogThinner():
+    if GPSThinInterval == 0 and GPSThinDistance == 0 and GPSThinTolerance == 0:
+        return None
+    return GPSThinning.PointThinner(GPSThinInterval, GPSThinDistance, GPSThinTolerance)
+
+
+# function GPSPointLocation
+# accepts: XY, the GPS point's SHAPE@XY. HitDate, String, its DATE_ and TIME_ joined with a space
+# returns: tuple (x, y, HitDate) for GPSThinning.PointThinner, None if the point has no geometry
+def GPSPointLocation(XY, HitDate):
+    if XY is None:
+        return None
+    return (XY[0], XY[1], HitDate)
+
+
+# function ReportThinning
+# accepts: thinner, the layer's GPSThinning.PointThinner or None. telemetry, the layer's RunTelemetry.LayerTelemetry
+# purpose: Reports the points the thinner kept and dropped, in the messages and the run report
+def ReportThinning(thinner, telemetry):
+    if thinner is not None:
+        telemetry.thinning = thinner.counts
+        telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + thinner.counts["withoutPoint"]
+        arcpy.AddMessage(thinner.message())
+
+
+# function LayerSurveyFilter
+# returns: SurveyFilter.FeatureFilter dropping a layer's features recorded outside the survey, see SurveyBuffers,
+# SurveyExtent and SurveyDates, None if every feature is exported
+SurveyBuffersIndex = None # grid index of the survey's buffer polygons, built the first time it's needed
+def LayerSurveyFilter():
+    global SurveyBuffersIndex
+    if SurveyBuffers == "" and SurveyExtent is None and SurveyDates is None:
+        return None
+    if SurveyBuffers != "" and SurveyBuffersIndex is None:
+        SurveyBuffersIndex = SurveyFilter.PolygonIndex([SurveyFilter.PolygonRings(shape)
+            for (shape,) in ProjectedSearchCursor(SurveyBuffers, ["SHAPE@"]) if shape is not None])
+    return SurveyFilter.FeatureFilter(SurveyBuffersIndex, SurveyExtent, SurveyDates)
+
+
+# function PointDateLocation
+# accepts: XY, the feature's SHAPE@XY. DATE_, its DATE_
+# returns: tuple (points, date) for SurveyFilter.FeatureFilter
+def PointDateLocation(XY, DATE_):
+    if XY is None:
+        return (None, DATE_)
+    return ([XY], DATE_)
+
+
+# function ReportSurveyFilter
+# accepts: surveyFilter, the layer's SurveyFilter.FeatureFilter or None. telemetry, the layer's RunTelemetry.LayerTelemetry
+# purpose: Reports the features the filter kept and dropped, in the messages and the run report
+def ReportSurveyFilter(surveyFilter, telemetry):
+    if surveyFilter is not None:
+        telemetry.surveyFilter = surveyFilter.counts
+        arcpy.AddMessage(surveyFilter.message())
+
+
+# function GeographySQLColumnFromXY
+# accepts: x, y, z, NumPy arrays of the points' coordinates. textFunction, String, the geography function used for WKT
+# returns: NumPy array of what each point is written as in a VALUES list, see ScriptValues.point
+def GeographySQLColumnFromXY(x, y, z, textFunction = "STGeomFromText"):
+    if StagingMerge:
+        return SQLGeography.GeographyLiteralColumnFromXY(x, y, z, GeometryEncoding)
+    return SQLGeography.GeographyColumnFromXY(x, y, z, epsg, GeometryEncoding, textFunction)
+
+
+# Columnar mode ------------------------------------------------------------------------------------------------------------
+# The functions below read a whole layer into NumPy arrays and build the VALUES lists of its insert queries a column
+# at a time.  They give exactly the same text as the layers' *Values functions, see Records, so any change to how a
+# column is written must be made in both places.
+
+# values that integer columns are given in place of nulls, FeatureClassToNumPyArray can't return nulls.  Each is the
+# smallest value the column's type can hold, a SmallInteger column can't hold the Integer one.
+NullIntegers = {"SmallInteger": -32768, "Integer": -2147483648}
+
+
+# function ReadLayerColumns
+# accepts: fc, String, path of the layer. columns, list of the columns to read, see ResolveColumns.  The point
+# coordinates are read with the SHAPE@X, SHAPE@Y and SHAPE@Z tokens. telemetry, the layer's RunTelemetry.LayerTelemetry
+# returns: list of NumPy arrays, one per requested column, None for a SHAPE@Z token if the layer has no z values
+# purpose: Reads the requested columns of every record of the layer in one go with arcpy.da.FeatureClassToNumPyArray.
+# Nulls are read as NaN in numeric columns and coordinates, the NullIntegers value in integer columns, NaT in dates
+# and "None", what the record at a time code gets from str(None), in text columns.
+def ReadLayerColumns(fc, columns, telemetry):
+    resolved = ResolveColumns(fc, columns)
+    fields = []
+    nullvalues = {}
+    for column in resolved:
+        if column is None:
+            continue
+        if isinstance(column, str):
+            name = column
+            nullvalues[name] = numpy.nan
+        else:
+            name = column.name
+            if column.type in NullIntegers:
+                nullvalues[name] = NullIntegers[column.type]
+            elif column.type in ["Single", "Double"]:
+                nullvalues[name] = numpy.nan
+            elif column.type == "Date":
+                nullvalues[name] = numpy.datetime64("NaT")
+            elif column.type != "OID":
+                nullvalues[name] = "None"
+        fields.append(name)
+    started = time.time()
+    array = arcpy.da.FeatureClassToNumPyArray(fc, fields, "", sr, False, 0, nullvalues)
+    telemetry.readSeconds = telemetry.readSeconds + time.time() - started
+    telemetry.rowsRead = telemetry.rowsRead + len(array)
+    arrays = []
+    for column in resolved:
+        if column is None:
+            arrays.append(None)
+        elif isinstance(column, str):
+            arrays.append(array[column])
+        else:
+            arrays.append(array[column.name])
+    return arrays
+
+
+# function FormatColumn
+# accepts: column, NumPy array read by ReadLayerColumns
+# returns: NumPy array of text, each value formatted with str() as the record at a time code does, nulls as "None"
+def FormatColumn(column):
+    text = numpy.array([str(value) for value in column.tolist()], dtype = str)
+    if column.dtype.kind == "f":
+        return numpy.where(numpy.isnan(column), "None", text)
+    if column.dtype.kind == "i":
+        return numpy.where(column == numpy.iinfo(column.dtype).min, "None", text)
+    return text # text nulls are already "None" and NaT dates come out of tolist() as None
+
+
+# function SQLColumn
+# accepts: column, NumPy array read by ReadLayerColumns. quoted, Boolean, whether to surround the values with single
+# quotes. nullToZero, Boolean, whether to convert nulls to zeroes
+# returns: NumPy array of text
+# purpose: fixArcGISNull for a whole column at once
+def SQLColumn(column, quoted, nullToZero):
+    text = numpy.char.replace(numpy.char.strip(FormatColumn(column)), "'", "''")
+    nulls = (text == "None") | (text == "<Null>") | (text == "NULL") | (text == "")
+    if quoted:
+        text = numpy.char.add(numpy.char.add("'", text), "'")
+    if nullToZero:
+        return numpy.where(nulls, "0", text)
+    return numpy.where(nulls, "NULL", text)
+
+
+# function JoinColumns
+# accepts: columns, list of NumPy arrays of text, or Strings to repeat in every record, the first must be an array
+# returns: NumPy array of the columns joined with commas, i.e. the VALUES list of each record
+def JoinColumns(columns):
+    joined = columns[0]
+    for column in columns[1:]:
+        joined = numpy.char.add(numpy.char.add(joined, ","), column)
+    return joined
+
+
+# function TrnPointsColumnarValues
+# accepts: fc, String, path of the TrnPoints layer. telemetry, the layer's RunTelemetry.LayerTelemetry
+# returns: list of the VALUES list of each transect point, see GenerateTrnPointsSQLScript
+def TrnPointsColumnarValues(fc, telemetry):
+    X, Y, Z, ELEV_M, GeneratedSurveyID, HASTRANS = ReadLayerColumns(fc, ["SHAPE@X", "SHAPE@Y", "SHAPE@Z", "ELEV_M",
+        "GeneratedSurveyID", "HASTRANS"], telemetry)
+    return JoinColumns([numpy.array(["@SurveyID"] * len(X), dtype = str),
+        SQLColumn(ELEV_M, False, False),
+        numpy.where(HASTRANS == "Y", "1", "0"), # convert Y/N to bit
+        SQLColumn(GeneratedSurveyID, True, False),
+        GeographySQLColumnFromXY(X, Y, Z)]).tolist()
+
+
+# function AnimalsColumnarValues
+# accepts: fc, String, path of the Animals layer. telemetry, the layer's RunTelemetry.LayerTelemetry
+# returns: list of the VALUES list of each animal, see GenerateAnimalsSQLScript
+def AnimalsColumnarValues(fc, telemetry):
+    X, Y, Z, OBJECTID_1, ACTIVITY, DATE_, ALTITUDE, PDOP, PLANESPD, TransectID, DIST2TRANS, LT_FCRAMS, GTE_FCRAMS, \
+        UNCLSSRAMS, UNCLSSHEEP, LAMBS, EWELIKE, Comments, CURL_3_4, CURL_7_8, LT_1_2CURL, YEARLING, EWES, FORMNAME = \
+        ReadLayerColumns(fc, ["SHAPE@X", "SHAPE@Y", "SHAPE@Z", "OBJECTID_1", "ACTIVITY", "DATE_", "ALTITUDE", "PDOP",
+        "PLANESPD", "TransectID", "DIST2TRANS", "LT_FCRAMS", "GTE_FCRAMS", "UNCLSSRAMS", "UNCLSSHEEP", "LAMBS", "EWELIKE",
+        "Comments", "CURL_3_4", "CURL_7_8", "LT_1_2CURL", "YEARLING", "EWES", "FORMNAME"], telemetry)
+    ALTITUDE = SQLColumn(ALTITUDE, False, True).astype(float) * 0.3048 # silly units to standard units
+    PLANESPD = SQLColumn(PLANESPD, False, True).astype(float)
+    return JoinColumns([FormatColumn(TransectID),
+        SQLColumn(PDOP, False, False),
+        SQLColumn(PLANESPD, False, False),
+        SQLColumn(DATE_, True, False),
+        SQLColumn(DIST2TRANS, False, False),
+        SQLColumn(EWES, False, True),
+        SQLColumn(EWELIKE, False, True),
+        SQLColumn(LAMBS, False, True),
+        SQLColumn(LT_FCRAMS, False, True),
+        SQLColumn(GTE_FCRAMS, False, True),
+        SQLColumn(UNCLSSRAMS, False, True),
+        SQLColumn(UNCLSSHEEP, False, True),
+        SQLColumn(ACTIVITY, True, False),
+        SQLColumn(ALTITUDE, False, False),
+        SQLColumn(YEARLING, False, True),
+        SQLColumn(OBJECTID_1, False, False),
+        SQLColumn(Comments, True, False),
+        SQLColumn(FORMNAME, True, False),
+        SQLColumn(LT_1_2CURL, False, True),
+        SQLColumn(CURL_3_4, False, True),
+        SQLColumn(CURL_7_8, False, True),
+        " 0",
+        SQLColumn(GTE_FCRAMS, False, True),
+        GeographySQLColumnFromXY(X, Y, Z, "STPointFromText")]).tolist()
+
+
+# function GPSPointsLogColumnarColumns
+# accepts: fc, String, path of the GPSPointsLog layer. telemetry, the layer's RunTelemetry.LayerTelemetry
+# returns: tuple of NumPy arrays X, Y, Z, HitDate, ALTITUDE, PILOTLNAM, AIRCRAFT of the GPS points that have a
+# geometry, Z is None if the layer has no z values
+def GPSPointsLogColumnarColumns(fc, telemetry):
+    X, Y, Z, DATE_, ALTITUDE, TIME_, PILOTLNAM, AIRCRAFT = ReadLayerColumns(fc, ["SHAPE@X", "SHAPE@Y", "SHAPE@Z", "DATE_",
+        "ALTITUDE", "TIME_", "PILOTLNAM", "AIRCRAFT"], telemetry)
+    HitDate = numpy.char.add(numpy.char.add(DATE_, " "), TIME_)
+    # only the points with a geometry are written
+    keep = ~numpy.isnan(X)
+    telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + int(len(X) - numpy.count_nonzero(keep))
+    if Z is not None:
+        Z = Z[keep]
+    return X[keep], Y[keep], Z, HitDate[keep], ALTITUDE[keep], PILOTLNAM[keep], AIRCRAFT[keep]
+
+
+# function TransectLookupSQL
+# accepts: SurveyID, String
+# returns: String, T-SQL loading the survey's GeneratedTransectID to TransectID mapping into the temporary table #Transects
+# purpose: Animals, tracklog segments and buffers are related to their transect through the GeneratedTransectID
+# recorded in the field.  Looking the TransectIDs up once per script and joining to them lets Sql Server relate a whole
+# batch of records in one go instead of running a subquery against Transect_or_Unit_Information for every record.
+# If two of the survey's transects share a GeneratedTransectID the joins would insert a record once for each of them,
+# so the script raises an error and SET NOEXEC ON skips the rest of it, leaving nothing inserted, where the subquery
+# used to fail each insert on its own.
+def TransectLookupSQL(SurveyID):
+    return "\n-- look up the TransectID of each of the survey's GeneratedTransectIDs once, the insert queries below join to it\n" + \
+        "IF OBJECT_ID('tempdb..#Transects') IS NOT NULL DROP TABLE #Transects\n" + \
+        "SELECT GeneratedTransectID, TransectID INTO #Transects FROM Transect_or_Unit_Information " + \
+        "WHERE (SurveyID = '" + str(SurveyID) + "') AND (GeneratedTransectID IS NOT NULL)\n" + \
+        "IF EXISTS (SELECT GeneratedTransectID FROM #Transects GROUP BY GeneratedTransectID HAVING COUNT(*) > 1)\n" + \
+        "BEGIN\n" + \
+        "    RAISERROR('Survey " + str(SurveyID).replace("'", "''") + " has more than one transect with the same " + \
+        "GeneratedTransectID, nothing below is run. Run SET NOEXEC OFF and ROLLBACK, then check Transect_or_Unit_Information', 16, 1)\n" + \
+        "    SET NOEXEC ON -- skips the rest of the script\n" + \
+        "END\n\n"
+
+
+# function TransectLookupInsert
+# accepts: table, String, the table to insert into. columns, list of the table's columns, the first must be TransectID
+# returns: tuple of the insertPrefix and insertSuffix to give an InsertBatchWriter
+# purpose: Builds an INSERT INTO table(columns) SELECT ... FROM (VALUES ...) query that takes the TransectID from
+# #Transects, see TransectLookupSQL.  Each VALUES list starts with the record's GeneratedTransectID instead of the TransectID.
+def TransectLookupInsert(table, columns):
+    valuescolumns = ["LookupGeneratedTransectID"] + columns[1:]
+    insertPrefix = "INSERT INTO " + table + "(" + ",".join(columns) + ")\n" + \
+        "SELECT #Transects.TransectID," + ",".join(["v." + column for column in columns[1:]]) + " FROM (VALUES"
+    insertSuffix = ") AS v(" + ",".join(valuescolumns) + ")\n" + \
+        "LEFT JOIN #Transects ON #Transects.GeneratedTransectID = v.LookupGeneratedTransectID"
+    return insertPrefix, insertSuffix
+
+
+# function TransectLookupUpdate
+# accepts: table, String, the table to update. columns, list of the table's columns, the first must be TransectID.
+# values, String, the record's VALUES list as given to a TransectLookupInsert query. where, String, the condition
+# picking out the record's row, with the table aliased as t
+# returns: String, an UPDATE query setting the row to the values, taking the TransectID from #Transects
+def TransectLookupUpdate(table, columns, values, where):
+    valuescolumns = ["LookupGeneratedTransectID"] + columns[1:]
+    return "UPDATE t SET " + columns[0] + " = #Transects.TransectID," + \
+        ",".join([column + " = v." + column for column in columns[1:]]) + "\n" + \
+        "FROM " + table + " AS t\n" + \
+        "CROSS JOIN (VALUES(" + values + ")) AS v(" + ",".join(valuescolumns) + ")\n" + \
+        "LEFT JOIN #Transects ON #Transects.GeneratedTransectID = v.LookupGeneratedTransectID\n" + \
+        "WHERE " + where + ";\n"
+
+
+# function TransectCondition
+# accepts: TransectID, the GeneratedTransectID recorded in the field
+# returns: String, a condition on the TransectID of a row aliased t matching the survey's transect, see TransectLookupSQL
+def TransectCondition(TransectID):
+    return "t.[TransectID] IN (SELECT lookup.TransectID FROM #Transects AS lookup WHERE lookup.GeneratedTransectID = " + \
+        str(TransectID) + ")"
+
+
+# class IncrementalManifest
+# accepts: root, String, path of the layer's script without the file name suffix. SurveyID, String. table, String,
+# the table the layer is exported to
+# purpose: Keeps track of what an incremental export has written for a layer, see IncrementalExport.  The manifest,
+# e.g. Animals.incremental.json, holds for each SurveyID the OBJECTID of every exported feature with a hash of its
+# VALUES list, so any change to what would be written for the feature shows up as a changed hash, and the condition
+# that picks out the feature's row in the table, aliased t, for updating or deleting it later.  Call check() for each
+# feature, delete() for each feature that was exported before but no longer is, and save() once the script is closed.
+class IncrementalManifest:
+    def __init__(self, root, SurveyID, table):
+        self.filename = root + ".incremental.json"
+        self.SurveyID = SurveyID
+        self.table = table
+        self.surveys = {}
+        if os.path.exists(self.filename):
+            manifeststream = open(self.filename, "r")
+            self.surveys = json.load(manifeststream)
+            manifeststream.close()
+        self.previous = self.surveys.get(SurveyID, {}) # OBJECTID: [hash, condition] as of the last export
+        self.current = {}
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    # returns: String, "new", "changed" or "unchanged", recording the feature's hash and condition for the next export
+    def check(self, objectid, values, where):
+        if not isinstance(values, bytes):
+            values = values.encode("utf-8")
+        digest = hashlib.sha1(values).hexdigest()
+        objectid = str(objectid)
+        self.current[objectid] = [digest, where]
+        if objectid not in self.previous:
+            status = "new"
+        elif self.previous[objectid][0] != digest:
+            status = "changed"
+        else:
+            status = "unchanged"
+        self.counts[status] = self.counts[status] + 1
+        return status
+
+    # returns: String, the condition that picked out the feature's row when it was last exported
+    def previousCondition(self, objectid):
+        return self.previous[str(objectid)][1]
+
+    # the OBJECTIDs exported last time that are not in objectids, e.g. every OBJECTID in the layer
+    def removed(self, objectids):
+        objectids = set([str(objectid) for objectid in objectids])
+        return sorted([objectid for objectid in self.previous if objectid not in objectids], key = int)
+
+    # write a query that must change exactly the feature's row, stopping with an error if it doesn't
+    def writeQuery(self, file, objectid, query):
+        file.writeRecords(query + "IF @@ROWCOUNT <> 1 RAISERROR('" + os.path.basename(self.filename) + " OBJECTID " + \
+            str(objectid) + " did not match exactly one row of " + self.table + ", ROLLBACK and check the table', 16, 1)\n", 1)
+
+    # delete the row of a feature that was exported last time, if it was
+    def delete(self, file, objectid):
+        if str(objectid) in self.previous:
+            self.writeQuery(file, objectid, "DELETE t FROM " + self.table + " AS t WHERE " + self.previousCondition(objectid) + ";\n")
+            self.counts["removed"] = self.counts["removed"] + 1
+
+    # replace this survey's manifest with what was exported this time.  The manifest is written to a temporary file
+    # which is flushed to disk before it replaces the manifest file so a crash can never leave a half written manifest.
+    def save(self):
+        self.surveys[self.SurveyID] = self.current
+        manifeststream = open(self.filename + ".tmp", "w")
+        json.dump(self.surveys, manifeststream, sort_keys = True)
+        manifeststream.flush()
+        os.fsync(manifeststream.fileno())
+        manifeststream.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename) # Windows will not rename over an existing file
+        os.rename(self.filename + ".tmp", self.filename)
+        arcpy.AddMessage(str(self.counts["new"]) + " new, " + str(self.counts["changed"]) + " changed, " + \
+            str(self.counts["removed"]) + " removed and " + str(self.counts["unchanged"]) + " unchanged features, see " + self.filename)
+
+
+# function StartIncrementalExport
+# accepts: file, the layer's open output file. fc, String, path of the layer. root, SurveyID, table as for IncrementalManifest
+# returns: the layer's IncrementalManifest, or None if the layer is to be exported in full
+# purpose: Opens the layer's manifest and deletes the rows of the features removed from the layer since the last
+# export.  They are deleted before anything else is written so a feature deleted and drawn again in the same place
+# can't be mistaken for its replacement.  Call it once the script's header is written.  The deletes are written as
+# records, with a ShardedScriptFile they are in the first shard only and each row is deleted once.
+def StartIncrementalExport(file, fc, root, SurveyID, table):
+    if not IncrementalExport:
+        return None
+    manifest = IncrementalManifest(root, SurveyID, table)
+    objectids = [objectid for (objectid,) in arcpy.da.SearchCursor(fc, ["OID@"])]
+    removed = manifest.removed(objectids)
+    if len(removed) > 0:
+        file.writeRecords("-- features removed from the layer since the last export ------------------------------------------------\n", 0)
+    for objectid in removed:
+        manifest.delete(file, objectid)
+    return manifest
+
+
+
+
+# Staged merge ------------------------------------------------------------------------------------------------------------
+# class StagedMerge
+# accepts: layer, String, the layer being exported. table, String, the table the layer is loaded into. columns, list of
+# the table's columns in the order of the layer's VALUES lists. keys, list of the columns that pick out the row a record
+# was loaded into before. geographies, dictionary of the geography columns, each with the geography function that
+# builds it from the literal in the VALUES lists, e.g. STGeomFromWKB. transectLookup, Boolean, whether the first column
+# is a TransectID taken from #Transects, see TransectLookupSQL
+# purpose: Writes a layer's script as a bulk load through a staging table, see StagingMerge.  The staging table, e.g.
+# #AnimalsStaging, takes its column types from the table, except that the geography columns hold the literals and a
+# TransectID column holds the GeneratedTransectID.  Call start() once the script's header is written, add the records
+# to the InsertBatchWriter it returns and call finish() after the writer's last flush().  With a ShardedScriptFile the
+# staging table is created and merged by every shard, so each shard still runs on its own.
+class StagedMerge:
+    def __init__(self, layer, table, columns, keys, geographies, transectLookup):
+        self.layer = layer
+        self.table = table
+        self.columns = columns
+        self.keys = keys
+        self.geographies = geographies
+        self.transectLookup = transectLookup
+        self.stagingTable = "#" + layer + "Staging"
+        if transectLookup:
+            self.stagedColumns = ["LookupGeneratedTransectID"] + columns[1:]
+        else:
+            self.stagedColumns = list(columns)
+
+    # returns: String, the staged column holding the value of one of the table's columns
+    def staged(self, column):
+        return self.stagedColumns[self.columns.index(column)]
+
+    # writes the creation of the staging table and returns the InsertBatchWriter filling it
+    def start(self, file):
+        copied = [column for column in self.columns if column not in self.geographies]
+        if self.transectLookup:
+            copied = ["lookup.GeneratedTransectID AS LookupGeneratedTransectID"] + ["t." + column for column in copied[1:]]
+            source = self.table + " AS t CROSS JOIN Transect_or_Unit_Information AS lookup"
+        else:
+            copied = ["t." + column for column in copied]
+            source = self.table + " AS t"
+        file.write("\n-- stage the records of " + self.layer + " as they are, the MERGE below loads them into " + self.table + "\n" + \
+            "IF OBJECT_ID('tempdb.." + self.stagingTable + "') IS NOT NULL DROP TABLE " + self.stagingTable + "\n" + \
+            "SELECT TOP 0 " + ",".join(copied) + " INTO " + self.stagingTable + " FROM " + source + "\n" + \
+            "ALTER TABLE " + self.stagingTable + " ADD " + \
+            ",".join([column + " " + SQLGeography.LiteralType(self.geographies[column]) + " NULL" \
+                for column in self.columns if column in self.geographies]) + "\n\n")
+        return InsertBatchWriter(file, "INSERT INTO " + self.stagingTable + "(" + ",".join(self.stagedColumns) + ")VALUES", BulkBatchSize)
+
+    # writes the checks and the MERGE of the staging table into the table
+    def finish(self, file):
+        selected = []
+        for column in self.columns:
+            if self.transectLookup and column == self.columns[0]:
+                selected.append("#Transects.TransectID AS " + column)
+            elif column in self.geographies:
+                selected.append("geography::" + self.geographies[column] + "(s." + column + ", " + str(epsg) + ") AS " + column)
+            else:
+                selected.append("s." + column + " AS " + column)
+        conditions = []
+        for column in self.keys:
+            if column in self.geographies:
+                conditions.append("t." + column + ".STEquals(s." + column + ") = 1")
+            else:
+                conditions.append("t." + column + " = s." + column)
+        source = self.stagingTable + " AS s"
+        if self.transectLookup:
+            source = source + " INNER JOIN #Transects ON #Transects.GeneratedTransectID = s.LookupGeneratedTransectID"
+        statement = "\n-- check the staged records and merge them into " + self.table + ", updating the rows loaded before\n" + \
+            "IF EXISTS (SELECT 1 FROM " + self.stagingTable + " GROUP BY " + ",".join([self.staged(column) for column in self.keys]) + \
+            " HAVING COUNT(*) > 1)\n" + \
+            "    RAISERROR('" + self.layer + " has more than one record with the same " + ", ".join(self.keys) + \
+            ", ROLLBACK and check the layer', 16, 1)\n" + \
+            "ELSE BEGIN\n"
+        if self.transectLookup:
+            statement = statement + \
+                "    DECLARE @Unmatched int = (SELECT COUNT(*) FROM " + self.stagingTable + " AS s WHERE NOT EXISTS " + \
+                "(SELECT 1 FROM #Transects WHERE #Transects.GeneratedTransectID = s.LookupGeneratedTransectID))\n" + \
+                "    IF @Unmatched > 0 PRINT 'WARNING: ' + CAST(@Unmatched AS nvarchar(20)) + ' records of " + self.layer + \
+                " are not on one of the survey''s transects and are left out'\n"
+        statement = statement + \
+            "    MERGE " + self.table + " AS t\n" + \
+            "    USING (SELECT " + ",".join(selected) + "\n" + \
+            "        FROM " + source + ") AS s\n" + \
+            "    ON " + " AND ".join(conditions) + "\n" + \
+            "    WHEN MATCHED THEN UPDATE SET " + \
+            ",".join([column + " = s." + column for column in self.columns if column not in self.keys]) + "\n" + \
+            "    WHEN NOT MATCHED BY TARGET THEN INSERT (" + ",".join(self.columns) + ")\n" + \
+            "        VALUES (" + ",".join(["s." + column for column in self.columns]) + ");\n" + \
+            "    PRINT CAST(@@ROWCOUNT AS nvarchar(20)) + ' records of " + self.layer + " merged into " + self.table + "'\n" + \
+            "END\n" + \
+            "DROP TABLE " + self.stagingTable + "\n"
+        file.write(statement)
+
+
+
+
+# Records ------------------------------------------------------------------------------------------------------------
+# How each layer's records become the rows of its table, shared by the layer's Generate*SQLScript function, which
+# writes the values into its script through a ScriptValues, and its Load* function, which binds them to the direct
+# load's queries through a LoadValues.  For each layer, the columns read from it, how its columns are converted, see
+# SQLConverters, the columns of its table and its *Values function, which takes the values of a record in the order
+# the columns are read and returns the values of its row in the order of the table's columns.
+
+TrnOrigFields = ["SHAPE@", "ELEV_M", "Aircraft", "OBSLNAM1", "OBSLNAM2", "PILOTLNAM", "PRECIP", "TURBINT", "TURBDUR",
+    "TEMPRTURE", "TARGETLEN", "CNTR_NOTE", "TransectID", "FLOWNDATE", "Flown", "DD_LONG1", "DD_LAT1"]
+TrnOrigFormats = [("ELEV_M", False, False), ("Aircraft", True, False), ("OBSLNAM1", True, False), ("OBSLNAM2", True, False),
+    ("PILOTLNAM", True, False), ("PRECIP", True, False), ("TURBINT", True, False), ("TURBDUR", True, False),
+    ("TEMPRTURE", False, False), ("TARGETLEN", False, False), ("CNTR_NOTE", True, False), ("TransectID", True, False),
+    ("FLOWNDATE", True, False), ("Flown", True, False)]
+TrnOrigColumns = ["SurveyID", "Elevation_M", "Aircraft", "ObserverName1", "ObserverName2", "PilotName", "Precipitation",
+    "TurbulenceIntensity", "TurbulenceDuration", "Temperature", "TargetLength", "Notes", "GeneratedTransectID", "FlownDate",
+    "Flown", "CenterPoint", "GeneratedTransect"]
+
+# function TrnOrigValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from TrnOrig. SurveyID, String.
+# reducer, the layer's SQLGeography.GeometryReducer or None
+# returns: list of the values of the transect's row of Transect_or_Unit_Information
+def TrnOrigValues(values, row, SurveyID, reducer):
+    Shape, ELEV_M, Aircraft, OBSLNAM1, OBSLNAM2, PILOTLNAM, PRECIP, TURBINT, TURBDUR, TEMPRTURE, TARGETLEN, \
+        CNTR_NOTE, TransectID, FLOWNDATE, Flown, DD_LONG1, DD_LAT1 = row
+    return [values.constant("@SurveyID", SurveyID),
+        values.column("ELEV_M", ELEV_M),
+        values.column("Aircraft", Aircraft),
+        values.column("OBSLNAM1", OBSLNAM1),
+        values.column("OBSLNAM2", OBSLNAM2),
+        values.column("PILOTLNAM", PILOTLNAM),
+        values.column("PRECIP", PRECIP),
+        values.column("TURBINT", TURBINT),
+        values.column("TURBDUR", TURBDUR),
+        values.column("TEMPRTURE", TEMPRTURE),
+        values.column("TARGETLEN", TARGETLEN),
+        values.column("CNTR_NOTE", CNTR_NOTE),
+        values.column("TransectID", TransectID),
+        values.column("FLOWNDATE", FLOWNDATE),
+        values.column("Flown", Flown),
+        values.pointWKT("POINT(" + str(DD_LONG1) + " " + str(DD_LAT1) + " " + str(ELEV_M) + ")"), # always written as WKT
+        values.shape(Shape, reducer)]
+
+
+TrnPointsFields = ["SHAPE@XY", "SHAPE@Z", "ELEV_M", "GeneratedSurveyID", "HASTRANS"]
+TrnPointsFormats = [("ELEV_M", False, False), ("GeneratedSurveyID", True, False)]
+TrnPointsColumns = ["[SurveyID]", "[Elev_M]", "[HasTransect]", "[GeneratedSurveyID]", "[TransectPoint]"]
+
+# function TrnPointsValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from TrnPoints. SurveyID, String
+# returns: list of the values of the point's row of TransectPoints
+def TrnPointsValues(values, row, SurveyID):
+    XY, Z, ELEV_M, GeneratedSurveyID, HASTRANS = row
+    # convert Y/N to bit
+    if HASTRANS == 'Y':
+        HASTRANS = values.constant("1", 1)
+    else:
+        HASTRANS = values.constant("0", 0)
+    return [values.constant("@SurveyID", SurveyID),
+        values.column("ELEV_M", ELEV_M),
+        HASTRANS,
+        values.column("GeneratedSurveyID", GeneratedSurveyID),
+        values.point(XY, Z)]
+
+
+AnimalsFields = ["SHAPE@XY", "SHAPE@Z", "OBJECTID_1", "ACTIVITY", "DATE_", "ALTITUDE", "PDOP", "PLANESPD", "TransectID",
+    "DIST2TRANS", "LT_FCRAMS", "GTE_FCRAMS", "UNCLSSRAMS", "UNCLSSHEEP", "LAMBS", "EWELIKE", "Comments", "CURL_3_4",
+    "CURL_7_8", "LT_1_2CURL", "YEARLING", "EWES", "FORMNAME"]
+AnimalsFormats = [("PDOP", False, False), ("DATE_", True, False), ("DIST2TRANS", False, False), ("EWES", False, True),
+    ("EWELIKE", False, True), ("LAMBS", False, True), ("LT_FCRAMS", False, True), ("GTE_FCRAMS", False, True),
+    ("UNCLSSRAMS", False, True), ("UNCLSSHEEP", False, True), ("ACTIVITY", True, False), ("YEARLING", False, True),
+    ("OBJECTID_1", False, False), ("Comments", True, False), ("FORMNAME", True, False), ("LT_1_2CURL", False, True),
+    ("CURL_3_4", False, True), ("CURL_7_8", False, True)]
+AnimalsNumbers = ["ALTITUDE", "PLANESPD"]
+AnimalsColumns = ["[TransectID]", "[PDOP]", "[Speed]", "[SampleDate]", "[DistanceToTransect]", "[Ewes]", "[EweLike]",
+    "[Lambs]", "[Rams_LessThanFullCurl]", "[Rams_FullCurl]", "[UnclassifiedRams]", "[UnclassifiedSheep]", "[Activity]",
+    "[PlaneAltitude]", "[Yearlings]", "[GroupNumber]", "[Comments]", "[LongOrShortForm]", "[Rams1_2Curl]", "[Rams3_4Curl]",
+    "[Rams7_8Curl]", "[Rams1_4Curl]", "[Rams_GT_7_8Curl]", "[Location]"]
+
+# function AnimalsValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from Animals
+# returns: list of the values of the animal's row of Animals, the first is its transect's TransectID
+def AnimalsValues(values, row):
+    XY, Z, OBJECTID_1, ACTIVITY, DATE_, ALTITUDE, PDOP, PLANESPD, TransectID, DIST2TRANS, LT_FCRAMS, GTE_FCRAMS, \
+        UNCLSSRAMS, UNCLSSHEEP, LAMBS, EWELIKE, Comments, CURL_3_4, CURL_7_8, LT_1_2CURL, YEARLING, EWES, FORMNAME = row
+    ALTITUDE = values.toFloat("ALTITUDE", ALTITUDE) * 0.3048 # silly units to standard units
+    PLANESPD = values.toFloat("PLANESPD", PLANESPD)
+    # NOTE: There is a database column Rams1_4Curl defined as 'Number of rams with horns equal to or greater than 1/4 curl but less than 1/2 curl. These must be differentiated from ewes. They are usually 2-3 years old.'
+    # NPS.gdb however has no column matching the database column so it has been set to 0 below.
+    return [values.transect(TransectID),
+        values.column("PDOP", PDOP),
+        values.number(PLANESPD),
+        values.column("DATE_", DATE_),
+        values.column("DIST2TRANS", DIST2TRANS),
+        values.column("EWES", EWES),
+        values.column("EWELIKE", EWELIKE),
+        values.column("LAMBS", LAMBS),
+        values.column("LT_FCRAMS", LT_FCRAMS),
+        values.column("GTE_FCRAMS", GTE_FCRAMS),
+        values.column("UNCLSSRAMS", UNCLSSRAMS),
+        values.column("UNCLSSHEEP", UNCLSSHEEP),
+        values.column("ACTIVITY", ACTIVITY),
+        values.number(ALTITUDE),
+        values.column("YEARLING", YEARLING),
+        values.column("OBJECTID_1", OBJECTID_1),
+        values.column("Comments", Comments),
+        values.column("FORMNAME", FORMNAME),
+        values.column("LT_1_2CURL", LT_1_2CURL),
+        values.column("CURL_3_4", CURL_3_4),
+        values.column("CURL_7_8", CURL_7_8),
+        values.constant(" 0", 0),
+        values.column("GTE_FCRAMS", GTE_FCRAMS),
+        values.point(XY, Z, "STPointFromText")]
+
+
+TracklogFields = ["SHAPE@", "TransectID", "SegType", "Obs1Dir", "Comments", "OID@"]
+TracklogColumns = ["[TransectID]", "[SegmentType]", "[Observer1Direction]", "[SegmentLine]", "[Comments]"]
+
+# function TracklogValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from Tracklog, which must have a line.
+# reducer, the layer's SQLGeography.GeometryReducer or None
+# returns: list of the values of the segment's row of TransectTracklog, the first is its transect's TransectID
+def TracklogValues(values, row, reducer):
+    SHAPE, TransectID, SegType, Obs1Dir, Comments, OBJECTID = row
+    # arcpad app provides choices that conflict with sql server constraint on SegType
+    # SegType must be either 'On Transect' or 'Off Transect', not "OnTransect" or "OffTransect" so fix it here
+    # if it's not covered below then it's a disallowed value, let sql server constraint bomb so it's brought to light for fixing
+    if SegType == "OnTransect":
+        SegType = "On Transect"
+    elif SegType == "OffTransect":
+        SegType = "Off Transect"
+    return [values.transect(TransectID),
+        values.text(SegType),
+        values.text(Obs1Dir),
+        values.shape(SHAPE, reducer),
+        values.text(str(Comments))]
+
+
+BuffersFields = ["SHAPE@", ("GeneratedTransectID", "TransectID")]
+BuffersColumns = ["TransectID", "GeneratedSurveyID", "GeneratedTransectID", "SegmentID", "Obs1Dir", "PolygonFeature",
+    "BufferFileDirectory"]
+
+# function BuffersValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from Buffer_Final. fc, String, path of
+# the layer. reducer, the layer's SQLGeography.GeometryReducer or None
+# returns: list of the values of the buffer's row of Buffers, the first is its transect's TransectID
+def BuffersValues(values, row, fc, reducer):
+    SHAPE, GeneratedTransectID = row
+    GeneratedSurveyID = "Buffer_Final-" + str(GeneratedTransectID) # for lack of anything better
+    return [values.transect(GeneratedTransectID),
+        values.text(GeneratedSurveyID),
+        values.text(str(GeneratedTransectID)),
+        values.constant("NULL", None),
+        values.constant("NULL", None),
+        values.shape(SHAPE, reducer),
+        values.text(fc + "/Buffer_Final")]
+
+
+FlatAreasFields = ["SHAPE@", "GeneratedSurveyID"]
+FlatAreasColumns = ["GeneratedSurveyID", "SurveyID", "PolygonFeature"]
+
+# function FlatAreasValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from FlatAreas. SurveyID, String.
+# reducer, the layer's SQLGeography.GeometryReducer or None
+# returns: list of the values of the flat area's row of FlatAreas
+def FlatAreasValues(values, row, SurveyID, reducer):
+    Shape, GeneratedSurveyID = row
+    return [values.text(str(GeneratedSurveyID)),
+        values.constant("@SurveyID", SurveyID),
+        values.shape(Shape, reducer)]
+
+
+GPSPointsLogFields = ["SHAPE@XY", "SHAPE@Z", "DATE_", "ALTITUDE", "TIME_", "PILOTLNAM", "AIRCRAFT"]
+GPSPointsLogFormats = [("PILOTLNAM", True, False), ("AIRCRAFT", True, False), ("ALTITUDE", False, True)]
+GPSPointsLogColumns = ["PilotName", "TailNo", "CaptureDate", "GPSModel", "Altitude", "Source", "SourceFileName",
+    "TracksFileDirectory", "Comment", "PointFeature", "SurveyID"]
+
+# function GPSPointsLogValues
+# accepts: values, the layer's ScriptValues or LoadValues. row, a record read from GPSPointsLog, which must have a
+# point. fc, String, path of the layer. SurveyID, String
+# returns: list of the values of the GPS point's row of GPSTracks
+def GPSPointsLogValues(values, row, fc, SurveyID):
+    XY, Z, DATE_, ALTITUDE, TIME_, PILOTLNAM, AIRCRAFT = row
+    HitDate =  DATE_ + " " + TIME_
+    # notes:
+    # GPSModel,Source, SourceFileName, TracksFileDirectory and Comment don't appear in NPS.gdb
+    # Most of the time GPS track logs will use point features.  If the tracklog is a line feature then
+    # modify the script to put the line into LineFeature instead of PointFeature
+    return [values.column("PILOTLNAM", PILOTLNAM),
+        values.column("AIRCRAFT", AIRCRAFT),
+        values.nullableText(HitDate),
+        values.constant(" NULL", None),
+        values.column("ALTITUDE", ALTITUDE),
+        values.text(fc),
+        values.text(fc),
+        values.constant(" NULL", None),
+        values.constant(" NULL", None),
+        values.point(XY, Z),
+        values.text(str(SurveyID))]
+
 
 
 
@@ -100,7 +1263,9 @@ def GenerateTrnOrigSQLScript(SurveyID):
     layer = "TrnOrig"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -115,84 +1280,28 @@ def GenerateTrnOrigSQLScript(SurveyID):
         file.write("DECLARE @SurveyID nvarchar(50) -- SurveyID of the record in the Surveys table to which the transects below will be related\n")
         file.write("SET @SurveyID = '" + SurveyID + "'\n")
 
-        # we'll need to create a searchcursor a little further on to access the records in the layer.  the cursor has a fields parameter
-        # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. Shape@; see ArcGIS documentation,
-        # so we have to submit all the columns as a list with Shape changed to the Shape@ token that will allow us to get at geometry info.
-        # The easiest way to do this is to loop through the column names and load them into a list making our edits as needed
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            elif field.name == "SHAPE":
-                fields.append("SHAPE@")
-            else:
-                fields.append(field.name)
-
         # get the transect data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-
-        # Sometimes the columns change places.  The code below will output the column names and order numbers to
-        # standard output.  You can then copy them back into the script to get the variable names synchronized with
-        # the column positions.
-        # i = 0
-        # for field in fieldsList:
-        #     arcpy.AddMessage(field.name + " = row[" + str(i) + "]")
-        #     i = i + 1
-
-        for row in cursor:
-            OBJECTID_1 = row[0]
-            Shape = row[1]
+        # only the columns used in the insert queries are read, the geometry is returned through the SHAPE@ token; see ArcGIS documentation
+        cursor = ProjectedSearchCursor(fc, TrnOrigFields)
+
+        # the insert queries are grouped into batches of InsertBatchSize records
+        table = "[ARCN_Sheep].[dbo].[Transect_or_Unit_Information]"
+        columns = TrnOrigColumns
+        if StagingMerge:
+            # a transect's row is the one with its GeneratedTransectID among the survey's transects
+            staging = StagedMerge(layer, table, columns, ["SurveyID", "GeneratedTransectID"],
+                {"CenterPoint": "STPointFromText", "GeneratedTransect": SQLGeography.GeographyFunction(GeometryEncoding)}, False)
+            batch = staging.start(file)
+        else:
+            batch = InsertBatchWriter(file, "INSERT INTO " + table + "(" + ",".join(columns) + ")VALUES", InsertBatchSize)
+
+        # each record is written as its row's values, see TrnOrigValues
+        scriptValues = ScriptValues(fc, TrnOrigFormats, StagingMerge)
+
+        for row in telemetry.timedRows(cursor):
+            Shape = row[0]
             if Shape == "None" or Shape == "<Null>" or Shape == "NULL" or Shape == "":
                 sys.exit('ERROR: Script execution aborted at row ' + str(row) + '. Shape is required but is NULL')
-            PT_ID = row[3]
-            PROJTD_X1 = row[4]
-            PROJTD_Y1 = row[5]
-            PROJTD_X2 = row[6]
-            PROJTD_Y2 = row[7]
-            PROJECTION = row[8]
-            DD_LATSEED = row[9]
-            DD_LONGSEE = row[10]
-            DD_LAT1 = row[11]
-            DD_LONG1 = row[12]
-            DD_LAT2 = row[13]
-            DD_LONG2 = row[14]
-            DM_LATSEED = row[15]
-            DM_LONGSEE = row[16]
-            DM_LAT1 = row[17]
-            DM_LONG1 = row[18]
-            DM_LAT2 = row[19]
-            DM_LONG2 = row[20]
-            LENGTH_MTR = row[21]
-            ELEV_M = row[22]
-            ELEVFT = row[23]
-            CNTR_NOTE = row[24]
-            LABEL_M = row[25]
-            LABEL_FT = row[26]
-            SurveyID = row[27]
-            BATCH_ID = row[28]
-            Flown = row[29]
-            TransectID = row[30]
-            Aircraft = row[31]
-            OBSLNAM1 = row[32]
-            OBSLNAM2 = row[33]
-            FLOWNDATE = row[34]
-            PILOTLNAM = row[35]
-            CLOUDCOVER = row[36]
-            PRECIP = row[37]
-            TURBINT = row[38]
-            TURBDUR = row[39]
-            TEMPRTURE = row[40]
-            TARGETLEN = row[41]
-            Shape_Length = row[42]
-            BuffArea_m = row[43]
-            WBairds_Y_N = row[44]
-            DeLongs_Y_N = row[45]
-            Area2014_YN = row[46]
-            HasSheep = row[47]
-            EffLength_m = row[48]
 
             # we need to insert the feature into sql server as a geography item via the Well-Known Text representation of the feature
             if Shape.WKT == "None" or Shape.WKT == "<Null>" or Shape.WKT == "NULL" or Shape.WKT == "":
@@ -200,50 +1309,15 @@ def GenerateTrnOrigSQLScript(SurveyID):
                 arcpy.AddMessage(errormessage)
                 sys.exit(errormessage)
 
-            # build an insert query
-            insertquery = "INSERT INTO [ARCN_Sheep].[dbo].[Transect_or_Unit_Information](" + \
-            "SurveyID" + \
-            ",Elevation_M" + \
-            ",Aircraft" + \
-            ",ObserverName1" + \
-            ",ObserverName2" + \
-            ",PilotName" + \
-            ",Precipitation" + \
-            ",TurbulenceIntensity" + \
-            ",TurbulenceDuration" + \
-            ",Temperature" + \
-            ",TargetLength" + \
-            ",Notes" + \
-            ",GeneratedTransectID" + \
-            ",FlownDate" + \
-            ",Flown" + \
-            ",CenterPoint" + \
-            ",GeneratedTransect" + \
-            ")" + \
-            "VALUES(" + \
-            "@SurveyID" + \
-            "," + fixArcGISNull(ELEV_M,False, False) + \
-            "," + fixArcGISNull(Aircraft,True, False) + \
-            "," + fixArcGISNull(OBSLNAM1,True, False) + \
-            "," + fixArcGISNull(OBSLNAM2,True, False) + \
-            "," + fixArcGISNull(PILOTLNAM,True, False) + \
-            "," + fixArcGISNull(PRECIP,True, False) + \
-            "," + fixArcGISNull(TURBINT,True, False) + \
-            "," + fixArcGISNull(TURBDUR,True, False) + \
-            "," + fixArcGISNull(TEMPRTURE,False, False) + \
-            "," + fixArcGISNull(TARGETLEN,False, False) + \
-            "," + fixArcGISNull(CNTR_NOTE,True, False) + \
-            "," + fixArcGISNull(TransectID,True, False) + \
-            "," + fixArcGISNull(FLOWNDATE,True, False) + \
-            "," + fixArcGISNull(Flown,True, False) + \
-            ", geography::STPointFromText('POINT(" + str(DD_LONG1) + " " + str(DD_LAT1) + " " + str(ELEV_M) + ")', " + str(epsg) + ")" +  \
-            ", geography::STGeomFromText('" + str(Shape.WKT) + "', " + str(epsg) + ")" + \
-            ");\n"
-
-            file.write(insertquery) # write the query to the output file
+            batch.add(scriptValues.join(TrnOrigValues(scriptValues, row, SurveyID, reducer))) # write the query to the output file
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
         arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
@@ -261,7 +1335,8 @@ def GenerateTrnPointsSQLScript(SurveyID):
     layer = "TrnPoints"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -276,67 +1351,37 @@ def GenerateTrnPointsSQLScript(SurveyID):
         file.write("DECLARE @SurveyID nvarchar(50) -- SurveyID of the record in the Surveys table to which the transects below will be related\n")
         file.write("SET @SurveyID = '" + str(SurveyID) + "'\n")
 
-        # we'll need to create a searchcursor a little further on to access the records in the layer.  the cursor has a fields parameter
-        # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. Shape@; see ArcGIS documentation,
-        # so we have to submit all the columns as a list with Shape changed to the Shape@ token that will allow us to get at geometry info.
-        # The easiest way to do this is to loop through the column names and load them into a list making our edits as needed
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            elif field.name == "SHAPE":
-                fields.append("SHAPE@")
-            else:
-                fields.append(field.name)
-
         # get the transect data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        for row in cursor:
-            OBJECTID_1 = row[0]
-            Shape = row[1]
-            OBJECTID = row[2]
-            ELEV_FT = row[3]
-            ELEV_M = row[4]
-            PROJTD_X = row[5]
-            PROJTD_Y = row[6]
-            PROJECTION = row[7]
-            PTDD_LAT = row[8]
-            PTDD_LONG = row[9]
-            PTDM_LAT = row[10]
-            PTDM_LONG = row[11]
-            GeneratedSurveyID = row[12]
-            BATCH_ID = row[13]
-            HASTRANS = row[14]
-
-            # convert Y/N to bit
-            if HASTRANS == 'Y':
-                HASTRANS = 1
-            else:
-                HASTRANS = 0
-
-            # build an insert query
-            insertquery = "INSERT INTO [ARCN_Sheep].[dbo].[TransectPoints](" + \
-                "[SurveyID]," + \
-                "[Elev_M]," + \
-                "[HasTransect]," + \
-                "[GeneratedSurveyID]," + \
-                "[TransectPoint]" + \
-            ")" + \
-            "VALUES(" + \
-            "@SurveyID" + \
-            "," + fixArcGISNull(ELEV_M,False, False) + \
-            "," + fixArcGISNull(HASTRANS,False, True) + \
-            "," + fixArcGISNull(GeneratedSurveyID,True, False) + \
-            ",geography::STGeomFromText('" + Shape.WKT + "', " + str(epsg) + ")" + \
-            ");\n"
-
-            file.write(insertquery) # write the query to the output file
+        # only the columns used in the insert queries are read.  The points are read as just their coordinates through the
+        # SHAPE@XY and SHAPE@Z tokens, which is much quicker than building a geometry object for each one; see ArcGIS documentation
+        if ColumnarReads:
+            cursor = [] # the whole layer is read and converted a column at a time below instead
+        else:
+            cursor = ProjectedSearchCursor(fc, TrnPointsFields)
+        # each record is written as its row's values, see TrnPointsValues
+        scriptValues = ScriptValues(fc, TrnPointsFormats, StagingMerge)
+        # the insert queries are grouped into batches of InsertBatchSize records
+        table = "[ARCN_Sheep].[dbo].[TransectPoints]"
+        columns = TrnPointsColumns
+        if StagingMerge:
+            # a point's row is the survey's row with its geography
+            staging = StagedMerge(layer, table, columns, ["[SurveyID]", "[TransectPoint]"],
+                {"[TransectPoint]": SQLGeography.GeographyFunction(GeometryEncoding)}, False)
+            batch = staging.start(file)
+        else:
+            batch = InsertBatchWriter(file, "INSERT INTO " + table + "(" + ",".join(columns) + ")VALUES", InsertBatchSize)
+        for row in telemetry.timedRows(cursor):
+            batch.add(scriptValues.join(TrnPointsValues(scriptValues, row, SurveyID))) # write the query to the output file
+        if ColumnarReads:
+            for values in TrnPointsColumnarValues(fc, telemetry):
+                batch.add(values)
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        telemetry.finish()
         arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
@@ -358,7 +1403,8 @@ def GenerateAnimalsSQLScript(SurveyID):
     layer = "Animals"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -369,137 +1415,66 @@ def GenerateAnimalsSQLScript(SurveyID):
         file.write("USE ARCN_Sheep \n")
         file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.write("SET QUOTED_IDENTIFIER ON\n\n")
+        file.write(TransectLookupSQL(SurveyID))
+        table = "[ARCN_Sheep].[dbo].[Animals]"
         file.write("\n-- insert the animals from " + layer + " -----------------------------------------------------------\n")
-
-        # make a fields list for the layer
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            else:
-                fields.append(field.name)
+        manifest = StartIncrementalExport(file, fc, sqlscriptpath + layer, SurveyID, table) # None unless IncrementalExport
 
         # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        for row in cursor:
-            OBJECTID_1 = row[0]
-            Shape = row[1]
-            OBJECTID = row[2]
-            SPECIES = row[3]
-            GROUPSIZE = row[4]
-            ACTIVITY = row[5]
-            PCTCOVER = row[6]
-            PCTSNOW = row[7]
-            DATE_ = row[8]
-            ALTITUDE = float(fixArcGISNull(str(row[9]), False, True))
-            ALTITUDE = float(ALTITUDE) * 0.3048 # silly units to standard units
-            LATITUDE = row[10]
-            LONGITUDE = row[11]
-            XCOORD = row[12]
-            YCOORD = row[13]
-            PDOP = row[14]
-            PLANESPD = float(fixArcGISNull(str(row[15]), False, True))
-            TIME_ = row[16]
-            GeneratedSurveyID = row[17]
-            TransectID = row[18]
-            SegmentID = row[19]
-            DIST2TRANS = row[20]
-            AnimalID = row[21]
-            OBS1LNAM = row[22]
-            OBS1DIR = row[23]
-            OBS1REPT = row[24]
-            OBS2LNAM = row[25]
-            OBS2DIR = row[26]
-            OBS2REPT = row[27]
-            PILOTLNAM = row[28]
-            PILOTDIR = row[29]
-            PILOTREPT = row[30]
-            HorizonID = row[31]
-            GROUPTYPE = row[32]
-            LT_FCRAMS = row[33]
-            GTE_FCRAMS = row[34]
-            UNCLSSRAMS = row[35]
-            UNCLSSHEEP = row[36]
-            LAMBS = row[37]
-            EWELIKE = row[38]
-            TOTAL = row[39]
-            ANIMALTYPE = row[40]
-            Year = row[41]
-            SurveyName = row[42]
-            Park = row[43]
-            Comments = row[44]
-            CURL_1_2 = row[45]
-            CURL_3_4 = row[46]
-            CURL_7_8 = row[47]
-            LT_1_2CURL = row[48]
-            YEARLING = row[49]
-            EWES = row[50]
-            FORMNAME = row[51]
-
-            # build an insert query
-            # NOTE: There is a database column Rams1_4Curl defined as 'Number of rams with horns equal to or greater than 1/4 curl but less than 1/2 curl. These must be differentiated from ewes. They are usually 2-3 years old.'
-            # NPS.gdb however has no column matching the database column so it has been set to 0 below.
-            insertquery = "INSERT INTO [ARCN_Sheep].[dbo].[Animals](" + \
-                "[TransectID]" + \
-                ",[PDOP]" + \
-                ",[Speed]" + \
-                ",[SampleDate]" + \
-                ",[DistanceToTransect]" + \
-                ",[Ewes]" + \
-                ",[EweLike]" + \
-                ",[Lambs]" + \
-                ",[Rams_LessThanFullCurl]" + \
-                ",[Rams_FullCurl]" + \
-                ",[UnclassifiedRams]" + \
-                ",[UnclassifiedSheep]" + \
-                ",[Activity]" + \
-                ",[PlaneAltitude]" + \
-                ",[Yearlings]" + \
-                ",[GroupNumber]" + \
-                ",[Comments]" + \
-                ",[LongOrShortForm]" + \
-                ",[Rams1_2Curl]" + \
-                ",[Rams3_4Curl]" + \
-                ",[Rams7_8Curl]" + \
-                ",[Rams1_4Curl]" + \
-                ",[Rams_GT_7_8Curl]" + \
-                ",[Location]" + \
-                ")" + \
-                "VALUES(" + \
-                "(SELECT TransectID FROM Transect_or_Unit_Information WHERE (SurveyID = '" + str(SurveyID) + "') AND (GeneratedTransectID = " + str(TransectID) + "))" + \
-                "," + fixArcGISNull(str(PDOP), False, False) + \
-                "," + fixArcGISNull(str(PLANESPD), False, False) + \
-                "," + fixArcGISNull(str(DATE_), True, False) + \
-                "," + fixArcGISNull(str(DIST2TRANS), False, False) + \
-                "," + fixArcGISNull(str(EWES), False, True) + \
-                "," + fixArcGISNull(str(EWELIKE), False, True) + \
-                "," + fixArcGISNull(str(LAMBS), False, True) + \
-                "," + fixArcGISNull(str(LT_FCRAMS), False, True) + \
-                "," + fixArcGISNull(str(GTE_FCRAMS), False, True) + \
-                "," + fixArcGISNull(str(UNCLSSRAMS), False, True) + \
-                "," + fixArcGISNull(str(UNCLSSHEEP), False, True) + \
-                "," + fixArcGISNull(str(ACTIVITY), True, False) + \
-                "," + fixArcGISNull(str(ALTITUDE), False, False) + \
-                "," + fixArcGISNull(str(YEARLING), False, True) + \
-                "," + fixArcGISNull(str(OBJECTID_1),False,False) + \
-                "," + fixArcGISNull(str(Comments), True, False) + \
-                "," + fixArcGISNull(str(FORMNAME),True, False) + \
-                "," + fixArcGISNull(str(LT_1_2CURL), False, True) + \
-                "," + fixArcGISNull(str(CURL_3_4), False, True) + \
-                "," + fixArcGISNull(str(CURL_7_8), False, True) + \
-                ", 0" + \
-                "," + str(GTE_FCRAMS) + \
-                ",geography::STPointFromText('" + str(Shape.WKT) + "', " + str(epsg) + ")" + \
-                ");\n"
-
-            file.write(insertquery) # write the query to the output .sql file
+        # only the columns used in the insert queries are read, the points are read as just their coordinates
+        # an incremental export checks the features one at a time so it always reads the layer a record at a time, as
+        # does the survey filter
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        columnar = ColumnarReads and manifest is None and surveyFilter is None
+        if columnar:
+            cursor = [] # the whole layer is read and converted a column at a time below instead
+        else:
+            cursor = ProjectedSearchCursor(fc, AnimalsFields)
+        rows = telemetry.timedRows(cursor)
+        if surveyFilter is not None:
+            # an animal dropped by the filter that was exported before is deleted, as if it had been removed from the layer
+            rows = surveyFilter.filter(rows, lambda row: PointDateLocation(row[0], row[4]),
+                None if manifest is None else lambda row: manifest.delete(file, row[2]))
+        # each record is written as its row's values, see AnimalsValues
+        scriptValues = ScriptValues(fc, AnimalsFormats, StagingMerge, AnimalsNumbers)
+        # the insert queries are grouped into batches of InsertBatchSize records
+        # the TransectID of each animal is taken from #Transects, see TransectLookupSQL
+        columns = AnimalsColumns
+        if StagingMerge:
+            # an animal's row is the one with its GroupNumber among the rows of its transect
+            staging = StagedMerge(layer, table, columns, ["[TransectID]", "[GroupNumber]"], {"[Location]": "STPointFromText"}, True)
+            batch = staging.start(file)
+        else:
+            insertPrefix, insertSuffix = TransectLookupInsert(table, columns)
+            batch = InsertBatchWriter(file, insertPrefix, InsertBatchSize, False, insertSuffix)
+        for row in rows:
+            values = scriptValues.join(AnimalsValues(scriptValues, row))
+            if manifest is None:
+                batch.add(values) # write the query to the output .sql file
+                continue
+            # an animal's row is the one with its GroupNumber among the rows of its transect
+            OBJECTID_1, TransectID = row[2], row[8]
+            status = manifest.check(OBJECTID_1, values, "t.[GroupNumber] = " + scriptValues.column("OBJECTID_1", OBJECTID_1) + \
+                " AND " + TransectCondition(TransectID))
+            if status == "new":
+                batch.add(values)
+            elif status == "changed":
+                manifest.writeQuery(file, OBJECTID_1, TransectLookupUpdate(table, columns, values, manifest.previousCondition(OBJECTID_1)))
+        if columnar:
+            for values in AnimalsColumnarValues(fc, telemetry):
+                batch.add(values)
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
 
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        if manifest is not None:
+            manifest.save() # only once the script is complete
+            telemetry.incremental = manifest.counts
+        ReportSurveyFilter(surveyFilter, telemetry)
+        telemetry.finish()
         arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
@@ -510,7 +1485,9 @@ def GenerateTrackLogSQLScript(SurveyID):
     layer = "Tracklog"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -521,72 +1498,65 @@ def GenerateTrackLogSQLScript(SurveyID):
         file.write("USE ARCN_Sheep \n")
         file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.write("SET QUOTED_IDENTIFIER ON\n\n")
+        file.write(TransectLookupSQL(SurveyID))
+        table = "[ARCN_Sheep].[dbo].[TransectTracklog]"
         file.write("\n-- insert the tracklog lines from " + layer + " -----------------------------------------------------------\n")
-
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            elif field.name == "SHAPE":
-                fields.append("SHAPE@")
-            else:
-                fields.append(field.name)
+        manifest = StartIncrementalExport(file, fc, sqlscriptpath + layer, SurveyID, table) # None unless IncrementalExport
 
         # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        for row in cursor:
-            OBJECTID = row[0]
-            SHAPE = row[1]
-            GeneratedSurveyID = row[2]
-            SHAPE_Length = row[3]
-            TransectID = row[4]
-            # arcpad app provides choices that conflict with sql server constraint on SegType
-            # SegType must be either 'On Transect' or 'Off Transect', not "OnTransect" or "OffTransect" so fix it here
-            if row[5] == "OnTransect":
-                SegType = "On Transect"
-            elif row[5] == "OffTransect":
-                SegType = "Off Transect"
-            else:
-                SegType = row[5] # if it's not covered above then it's a disallowed value, let sql server constraint bomb so it's brought to light for fixing
-            SegmentID = row[6]
-            PilotLNam = row[7]
-            Obs1LNam = row[8]
-            Obs1Dir = row[9]
-            PilotDir = row[10]
-            Obs2Dir = row[11]
-            Obs2LNam = row[12]
-            Comments = row[13]
-
-            # a single quote in the string will booger up the sql query, replace with double single quote
-            if Comments is not None:
-                Comments = Comments.replace("'", "''")
-
-            if SHAPE is None:
-                insertquery = ''
+        # only the columns used in the insert queries are read, the geometry is returned through the SHAPE@ token
+        cursor = ProjectedSearchCursor(fc, TracklogFields)
+        rows = telemetry.timedRows(cursor)
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        if surveyFilter is not None:
+            # a segment dropped by the filter that was exported before is deleted, as if it had been removed from the layer
+            rows = surveyFilter.filter(rows, lambda row: (None if row[0] is None else SurveyFilter.LineVertices(row[0]), None),
+                None if manifest is None else lambda row: manifest.delete(file, row[5]))
+        # the insert queries are grouped into batches of InsertBatchSize records
+        # the TransectID of each segment is taken from #Transects, see TransectLookupSQL
+        columns = TracklogColumns
+        scriptValues = ScriptValues(fc, [], StagingMerge) # each record is written as its row's values, see TracklogValues
+        if StagingMerge:
+            # a segment's row is the one on its transect with its line
+            staging = StagedMerge(layer, table, columns, ["[TransectID]", "[SegmentLine]"],
+                {"[SegmentLine]": SQLGeography.GeographyFunction(GeometryEncoding)}, True)
+            batch = staging.start(file)
+        else:
+            insertPrefix, insertSuffix = TransectLookupInsert(table, columns)
+            batch = InsertBatchWriter(file, insertPrefix, InsertBatchSize, False, insertSuffix)
+        for row in rows:
+            SHAPE, TransectID, OBJECTID = row[0], row[1], row[5]
+            if SHAPE is not None:
+                record = TracklogValues(scriptValues, row, reducer)
+                geography = record[3]
+                values = scriptValues.join(record)
+                if manifest is None:
+                    batch.add(values) # write the query to the output .sql file
+                    continue
+                # a segment has no ID of its own in the table, its row is the one on its transect with its line
+                status = manifest.check(OBJECTID, values, TransectCondition(TransectID) + \
+                    " AND t.[SegmentLine].STEquals(" + geography + ") = 1")
+                if status == "new":
+                    batch.add(values)
+                elif status == "changed":
+                    manifest.writeQuery(file, OBJECTID, TransectLookupUpdate(table, columns, values, manifest.previousCondition(OBJECTID)))
             else:
-                # build an insert query
-                insertquery = "INSERT INTO [ARCN_Sheep].[dbo].[TransectTracklog](" + \
-                    "[TransectID]," + \
-                    "[SegmentType]," + \
-                    "[Observer1Direction]," + \
-                    "[SegmentLine]," + \
-                    "[Comments]" + \
-                    ")" + \
-                    "VALUES(" + \
-                    "(SELECT TransectID FROM Transect_or_Unit_Information WHERE (SurveyID = '" + str(SurveyID) + "') AND (GeneratedTransectID = " + str(TransectID) + "))," + \
-                    "'" + SegType + "'," + \
-                    "'" + OBS1DIR + "'," + \
-                    "geography::STGeomFromText('" + str(Shape.WKT) + "', " + str(epsg) + ")," + \
-                    "'" + str(Comments) + "'" + \
-                    ");\n"
-                file.write(insertquery) # write the query to the output .sql file
+                telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
+                if manifest is not None:
+                    manifest.delete(file, OBJECTID) # its line was exported before it was cleared
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
 
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        if manifest is not None:
+            manifest.save() # only once the script is complete
+            telemetry.incremental = manifest.counts
+        ReportGeometryReduction(reducer, telemetry)
+        ReportSurveyFilter(surveyFilter, telemetry)
+        telemetry.finish()
         arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
@@ -605,7 +1575,9 @@ def GenerateBuffersSQLScript(SurveyID):
     layer = "Buffer_Final" # standard name for the buffers layer
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -616,53 +1588,35 @@ def GenerateBuffersSQLScript(SurveyID):
         file.write("USE ARCN_Sheep \n")
         file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.write("SET QUOTED_IDENTIFIER ON\n\n")
+        file.write(TransectLookupSQL(SurveyID))
         file.write("\n-- insert the GPS track points from " + layer + " -----------------------------------------------------------\n")
 
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            print field.name
-            if field.name == "SHAPE":
-                fields.append("SHAPE@")
-            elif field.name == "Shape":
-                fields.append("Shape@")
-            else:
-                fields.append(field.name)
-
         # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        for row in cursor:
-            OBJECTID = row[0]
-            SHAPE = row[1]
-            GeneratedTransectID = row[2]
-            GeneratedSurveyID = layer + "-" + str(GeneratedTransectID) # for lack of anything better
-
-            # build an insert query
-            insertquery = "INSERT INTO Buffers(" + \
-                "TransectID," + \
-                "GeneratedSurveyID," + \
-                "GeneratedTransectID," + \
-                "SegmentID," + \
-                "Obs1Dir," + \
-                "PolygonFeature," + \
-                "BufferFileDirectory" + \
-                ") VALUES(" + \
-                "(SELECT TransectID FROM Transect_or_Unit_Information WHERE (GeneratedTransectID = " + str(GeneratedTransectID) + ") And (SurveyID = '" + str(SurveyID) + "'))," + \
-                "'" + str(GeneratedSurveyID) + "'," + \
-                "'" + str(GeneratedTransectID) + "'," + \
-                "NULL," + \
-                "NULL," + \
-                "geography::STGeomFromText('" + str(Shape.WKT) + "', " + str(epsg) + ")," + \
-                "'" + fc + "/" + layer + "'" + \
-                ");\n"
-
-            file.write(insertquery) # write the query to the output .sql file
+        # only the columns used in the insert queries are read, the geometry is returned through the SHAPE@ token
+        cursor = ProjectedSearchCursor(fc, BuffersFields)
+        scriptValues = ScriptValues(fc, [], StagingMerge) # each record is written as its row's values, see BuffersValues
+        # the insert queries are grouped into batches of InsertBatchSize records
+        # the TransectID of each buffer is taken from #Transects, see TransectLookupSQL
+        columns = BuffersColumns
+        if StagingMerge:
+            # a buffer's row is the one of its transect
+            staging = StagedMerge(layer, "Buffers", columns, ["TransectID", "GeneratedTransectID"],
+                {"PolygonFeature": SQLGeography.GeographyFunction(GeometryEncoding)}, True)
+            batch = staging.start(file)
+        else:
+            insertPrefix, insertSuffix = TransectLookupInsert("Buffers", columns)
+            batch = InsertBatchWriter(file, insertPrefix, InsertBatchSize, False, insertSuffix)
+        for row in telemetry.timedRows(cursor):
+            batch.add(scriptValues.join(BuffersValues(scriptValues, row, fc, reducer))) # write the query to the output .sql file
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
 
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
         arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
@@ -675,7 +1629,9 @@ def GenerateFlatAreasSQLScript(SurveyID):
     layer = "FlatAreas"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -691,38 +1647,30 @@ def GenerateFlatAreasSQLScript(SurveyID):
         file.write("SET @SurveyID = '" + str(SurveyID) + "'\n")
 
 
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            else:
-                fields.append(field.name)
-
         # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        for row in cursor:
-            Shape = row[1]
-            GeneratedSurveyID = row[6]
-
-            # build an insert query
-            insertquery = "INSERT INTO FlatAreas(" + \
-                "GeneratedSurveyID," + \
-                "SurveyID," + \
-                "PolygonFeature" + \
-                ") VALUES(" + \
-                "'" + str(GeneratedSurveyID) + "'," + \
-                "@SurveyID," + \
-                "geography::STGeomFromText('" + str(Shape.WKT) + "', " + str(epsg) + ")" + \
-                ");\n"
-
-            file.write(insertquery) # write the query to the output .sql file
+        # only the columns used in the insert queries are read, the geometry is returned through the SHAPE@ token
+        cursor = ProjectedSearchCursor(fc, FlatAreasFields)
+        scriptValues = ScriptValues(fc, [], StagingMerge) # each record is written as its row's values, see FlatAreasValues
+        # the insert queries are grouped into batches of InsertBatchSize records
+        columns = FlatAreasColumns
+        if StagingMerge:
+            # a flat area's row is the survey's row with its polygon
+            staging = StagedMerge(layer, "FlatAreas", columns, ["SurveyID", "PolygonFeature"],
+                {"PolygonFeature": SQLGeography.GeographyFunction(GeometryEncoding)}, False)
+            batch = staging.start(file)
+        else:
+            batch = InsertBatchWriter(file, "INSERT INTO FlatAreas(" + ",".join(columns) + ") VALUES", InsertBatchSize)
+        for row in telemetry.timedRows(cursor):
+            batch.add(scriptValues.join(FlatAreasValues(scriptValues, row, SurveyID, reducer))) # write the query to the output .sql file
+        batch.flush() # write the last partial batch
+        if StagingMerge:
+            staging.finish(file) # merge the staged records into the table
 
         #  close the output file
         file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
 
@@ -738,10 +1686,14 @@ def GenerateFlatAreasSQLScript(SurveyID):
 #  NOTE: The code section for GPS Tracklog can potentially contain many thousands of
 # records which can take a long time to run.
 def GenerateGPSPointsLogSQLScript(SurveyID):
+    if GPSPointsLogFormat == "BULK":
+        GenerateGPSPointsLogBulkCopyFiles(SurveyID)
+        return
     layer = "GPSPointsLog"
     fc = NPSdotGdbMxd + "/" + layer
     if arcpy.Exists(fc):
-        file = open(sqlscriptpath +  layer + ".sql", "w")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        file = telemetry.timedFile(OpenSQLScript(sqlscriptpath +  layer))
         arcpy.AddMessage('Processing ' + layer + "...")
 
         # write some metadata to the sql script
@@ -758,108 +1710,831 @@ def GenerateGPSPointsLogSQLScript(SurveyID):
         file.write("SET QUOTED_IDENTIFIER ON\n\n")
         file.write("\n-- insert the GPS track points from " + layer + " -----------------------------------------------------------\n")
 
-        fieldsList = arcpy.ListFields(fc) #get the fields
-        fields = [] # create an empty list
-        #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
-        for field in fieldsList:
-            if field.name == "Shape":
-                fields.append("Shape@")
-            elif field.name == "SHAPE":
-                fields.append("SHAPE@")
+        # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
+        # only the columns used in the insert queries are read, the points are read as just their coordinates
+        thinner = GPSPointsLogThinner() # None unless GPSThinInterval, GPSThinDistance or GPSThinTolerance is set
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        # the points are filtered and thinned as they are read so a filtered or thinned layer is read a row at a time
+        columnar = ColumnarReads and thinner is None and surveyFilter is None
+        if columnar:
+            cursor = [] # the whole layer is read and converted a column at a time below instead
+        else:
+            cursor = ProjectedSearchCursor(fc, GPSPointsLogFields)
+        rows = telemetry.timedRows(cursor)
+        if surveyFilter is not None:
+            rows = surveyFilter.filter(rows, lambda row: PointDateLocation(row[0], row[2]))
+        if thinner is not None:
+            rows = thinner.thin(rows, lambda row: GPSPointLocation(row[0], row[2] + " " + row[4]))
+        # each record is written as its row's values, see GPSPointsLogValues.  The GPS points are never staged.
+        scriptValues = ScriptValues(fc, GPSPointsLogFormats, False)
+        # the insert queries are grouped into batches of InsertBatchSize records, each batch is numbered with a PRINT
+        # statement and sent to the server on its own with a GO
+        batch = InsertBatchWriter(file, "INSERT INTO GPSTracks(" + ",".join(GPSPointsLogColumns) + ")" + "VALUES", InsertBatchSize, True)
+        for row in rows:
+            XY = row[0]
+            # only write out the query if we have a geometry
+            if XY is not None and XY[0] is not None:
+                batch.add(scriptValues.join(GPSPointsLogValues(scriptValues, row, fc, SurveyID))) # write the query to the output .sql file
             else:
-                fields.append(field.name)
+                telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
+        if columnar:
+            X, Y, Z, HitDate, ALTITUDE, PILOTLNAM, AIRCRAFT = GPSPointsLogColumnarColumns(fc, telemetry)
+            for values in JoinColumns([SQLColumn(PILOTLNAM, True, False),
+                    SQLColumn(AIRCRAFT, True, False),
+                    SQLColumn(HitDate, True, False),
+                    " NULL",
+                    SQLColumn(ALTITUDE, False, True),
+                    scriptValues.text(fc),
+                    scriptValues.text(fc),
+                    " NULL",
+                    " NULL",
+                    SQLGeography.GeographyColumnFromXY(X, Y, Z, epsg, GeometryEncoding),
+                    scriptValues.text(str(SurveyID))]).tolist():
+                batch.add(values)
+        batch.flush() # write the last partial batch
+        # close the output file
+        file.close()
+        ReportSurveyFilter(surveyFilter, telemetry)
+        ReportThinning(thinner, telemetry)
+        telemetry.finish()
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
 
+# GPS Tracklog as bulk copy files ------------------------------------------------------------------------------------------
+# Writes the GPSPointsLog layer as three files instead of one enormous script of insert queries:
+# GPSPointsLog.dat, a tab delimited data file with one line per GPS point.
+# GPSPointsLog.fmt, a bcp format file describing the columns of the data file.
+# GPSPointsLog.sql, a driver script that BULK INSERTs the data file into a temporary staging table and then copies the
+# staging table into GPSTracks with one set based INSERT ... SELECT, building the geography points on the server.
+# NOTE: BULK INSERT reads the data and format files from the Sql Server machine's point of view.  If the files are not
+# on the server then copy them to a share the server can read and edit the paths at the top of the driver script.
+def GenerateGPSPointsLogBulkCopyFiles(SurveyID):
+    layer = "GPSPointsLog"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        arcpy.AddMessage('Processing ' + layer + " into bulk copy files...")
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        datafilename = sqlscriptpath + layer + ".dat"
+        formatfilename = sqlscriptpath + layer + ".fmt"
+
+        # write the format file, the rows of the data file end with \r\n
+        formatfile = open(formatfilename, "w")
+        formatfile.write("10.0\n")
+        formatfile.write("6\n")
+        formatfile.write('1 SQLCHAR 0 50 "\\t" 1 PilotName ""\n')
+        formatfile.write('2 SQLCHAR 0 50 "\\t" 2 TailNo ""\n')
+        formatfile.write('3 SQLCHAR 0 30 "\\t" 3 CaptureDate ""\n')
+        formatfile.write('4 SQLCHAR 0 30 "\\t" 4 Altitude ""\n')
+        formatfile.write('5 SQLCHAR 0 30 "\\t" 5 Latitude ""\n')
+        formatfile.write('6 SQLCHAR 0 30 "\\r\\n" 6 Longitude ""\n')
+        formatfile.close()
+
+        # write the data file, one tab delimited line per GPS point.  Empty fields are loaded as NULLs.  The lines are
+        # written ending with \r\n, the row terminator in the format file, and the file is opened without newline
+        # translation so they end with \r\n on any machine
+        if sys.version_info[0] >= 3:
+            datafile = telemetry.timedFile(open(datafilename, "w", newline = ""))
+        else:
+            datafile = telemetry.timedFile(open(datafilename, "wb"))
         # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-        # loop through the cursor and save fields as variables to be used later in insert queries
-        cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-        i = 1
-        for row in cursor:
-            OBJECTID = row[0]
-            SHAPE = row[1]
-            DATE_ = row[2]
-            ALTITUDE = row[3]
-            LATITUDE = row[4]
-            LONGITUDE = row[5]
-            XCOORD = row[6]
-            YCOORD = row[7]
-            PDOP = row[8]
-            PLANESPD = row[9]
-            TIME_ = row[10]
-            GeneratedSurveyID = row[11]
-            PILOTLNAM = row[12]
-            AIRCRAFT = row[13]
+        # only the columns used in the data file are read, the points are read as just their coordinates
+        thinner = GPSPointsLogThinner() # None unless GPSThinInterval, GPSThinDistance or GPSThinTolerance is set
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        # the points are filtered and thinned as they are read so a filtered or thinned layer is read a row at a time
+        columnar = ColumnarReads and thinner is None and surveyFilter is None
+        if columnar:
+            cursor = [] # the whole layer is read and converted a column at a time below instead
+        else:
+            cursor = ProjectedSearchCursor(fc, ["SHAPE@XY", "DATE_", "ALTITUDE", "TIME_", "PILOTLNAM", "AIRCRAFT"])
+        rows = telemetry.timedRows(cursor)
+        if surveyFilter is not None:
+            rows = surveyFilter.filter(rows, lambda row: PointDateLocation(row[0], row[1]))
+        if thinner is not None:
+            rows = thinner.thin(rows, lambda row: GPSPointLocation(row[0], row[1] + " " + row[3]))
+        altitudeToSQL = SQLConverters(fc, [("ALTITUDE", False, True)])["ALTITUDE"]
+        rowcount = 0
+        for row in rows:
+            XY, DATE_, ALTITUDE, TIME_, PILOTLNAM, AIRCRAFT = row
             HitDate =  DATE_ + " " + TIME_
 
-
-            if not SHAPE is None:
-                WKT = SHAPE.WKT
+            # only write out the point if we have a geometry
+            if XY is not None and XY[0] is not None:
+                values = [PILOTLNAM, AIRCRAFT, HitDate, altitudeToSQL(ALTITUDE), repr(XY[1]), repr(XY[0])]
+                line = []
+                for value in values:
+                    value = str(value).strip()
+                    if value == "None" or value == "<Null>" or value == "NULL":
+                        value = ""
+                    line.append(value.replace("\t", " ").replace("\r", " ").replace("\n", " "))
+                datafile.write("\t".join(line) + "\r\n")
+                rowcount = rowcount + 1
             else:
-                WKT = "NULL"
-            geog = "geography::STGeomFromText('" + WKT + "', " + str(epsg) + ")"
-
-            # build an insert query
-            # notes:
-            # GPSModel,Source, SourceFileName, TracksFileDirectory and Comment don't appear in NPS.gdb
-            # Most of the time GPS track logs will use point features.  If the tracklog is a line feature then
-            # modify the script to put the line into LineFeature instead of PointFeature
-            insertquery = "INSERT INTO GPSTracks(" + \
-                "PilotName," + \
-                "TailNo," + \
-                "CaptureDate," + \
-                "GPSModel," + \
-                "Altitude," + \
-                "Source," + \
-                "SourceFileName," + \
-                "TracksFileDirectory," + \
-                "Comment," + \
-                "PointFeature," + \
-                "SurveyID" + \
-                ")" + \
-                "VALUES(" + \
-                fixArcGISNull(PILOTLNAM, True,False) +  \
-                "," + fixArcGISNull(AIRCRAFT, True,False) +  \
-                "," + fixArcGISNull(HitDate, True, False)  + \
-                ", NULL" + \
-                "," + fixArcGISNull(str(ALTITUDE), False, True) + \
-                ",'" + fc + "'" + \
-                ",'" + fc + "'" + \
-                ", NULL" + \
-                "," + fixArcGISNull(str(Comments), True, False) + \
-                "," + geog  + \
-                ",'" + str(SurveyID) + "'" + \
-                ");\n"
+                telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
+        if columnar:
+            X, Y, Z, HitDate, ALTITUDE, PILOTLNAM, AIRCRAFT = GPSPointsLogColumnarColumns(fc, telemetry)
+            columns = [FormatColumn(PILOTLNAM), FormatColumn(AIRCRAFT), FormatColumn(HitDate), SQLColumn(ALTITUDE, False, True),
+                numpy.array([repr(value) for value in Y.tolist()], dtype = str), numpy.array([repr(value) for value in X.tolist()], dtype = str)]
+            line = None
+            for column in columns:
+                column = numpy.char.strip(column)
+                column = numpy.where((column == "None") | (column == "<Null>") | (column == "NULL"), "", column)
+                for character in ["\t", "\r", "\n"]:
+                    column = numpy.char.replace(column, character, " ")
+                if line is None:
+                    line = column
+                else:
+                    line = numpy.char.add(numpy.char.add(line, "\t"), column)
+            if len(X) > 0:
+                datafile.write("\r\n".join(line.tolist()) + "\r\n")
+            rowcount = len(X)
+        datafile.close()
+
+        # write the driver script
+        file = telemetry.timedFile(open(sqlscriptpath +  layer + ".sql", "w"))
+        file.write("-- Bulk load of the GPS points from ARCN Sheep monitoring field geodatabase " + NPSdotGdbMxd + " into ARCN_Sheep database\n")
+        file.write("-- File generated " + executiontime + " by " + user + "\n")
+        file.write("-- " + str(rowcount) + " GPS points are loaded from the data file " + datafilename + "\n")
+        file.write("-- The data and format file paths below are read by the Sql Server service, edit them if the files have been copied elsewhere\n")
+        file.write("USE ARCN_Sheep \n")
+        file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
+        file.write("SET QUOTED_IDENTIFIER ON\n\n")
+        file.write("DECLARE @SurveyID nvarchar(50) -- SurveyID of the record in the Surveys table to which the GPS points below will be related\n")
+        file.write("DECLARE @DataFile nvarchar(4000) -- tab delimited GPS points\n")
+        file.write("DECLARE @FormatFile nvarchar(4000) -- bcp format file describing the data file\n")
+        file.write("SET @SurveyID = '" + str(SurveyID) + "'\n")
+        file.write("SET @DataFile = N'" + datafilename.replace("'", "''") + "'\n")
+        file.write("SET @FormatFile = N'" + formatfilename.replace("'", "''") + "'\n\n")
+
+        # BULK INSERT will not take the file names from variables so the statement is built and run with EXEC
+        file.write("-- load the data file into a staging table\n")
+        file.write("CREATE TABLE #GPSPointsLogStaging(PilotName varchar(50) NULL, TailNo varchar(50) NULL, CaptureDate varchar(30) NULL, " + \
+            "Altitude float NULL, Latitude float NOT NULL, Longitude float NOT NULL)\n")
+        file.write("EXEC('BULK INSERT #GPSPointsLogStaging FROM ''' + REPLACE(@DataFile, '''', '''''') + " + \
+            "''' WITH (FORMATFILE = ''' + REPLACE(@FormatFile, '''', '''''') + ''', KEEPNULLS, TABLOCK)')\n\n")
+
+        file.write("-- copy the staging table into GPSTracks in one go\n")
+        file.write("INSERT INTO GPSTracks(" + \
+            "PilotName," + \
+            "TailNo," + \
+            "CaptureDate," + \
+            "GPSModel," + \
+            "Altitude," + \
+            "Source," + \
+            "SourceFileName," + \
+            "TracksFileDirectory," + \
+            "Comment," + \
+            "PointFeature," + \
+            "SurveyID" + \
+            ")\n" + \
+            "SELECT PilotName, TailNo, CaptureDate, NULL, Altitude, '" + fc + "', '" + fc + "', NULL, NULL, " + \
+            "geography::Point(Latitude, Longitude, " + str(epsg) + "), @SurveyID\n" + \
+            "FROM #GPSPointsLogStaging;\n\n")
+        file.write("DROP TABLE #GPSPointsLogStaging\n")
 
-            # only write out the query if we have a geometry
-            if not WKT == 'NULL':
-                file.write("PRINT 'ROW " + str(i) + "';\n")
-                file.write(insertquery) # write the query to the output .sql file
-                file.write("GO\n\n")
-                i = i + 1
-        # close the output file
+        #  close the output file
+        file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
         file.close()
+        ReportSurveyFilter(surveyFilter, telemetry)
+        ReportThinning(thinner, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage('Done')
     else:
         arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
 
 
 
 
+# Direct load ------------------------------------------------------------------------------------------------------------
+# The functions below load the layers straight into the ARCN_Sheep database instead of writing scripts, see
+# DatabaseServer.  Each Load* function reads its layer the same way as the layer's Generate*SQLScript function and
+# binds the values the layer's *Values function gives, see Records, to a parameterized insert query, so the database
+# ends up the same either way.
+
+# function TextParameter
+# accepts: value, a value of a text column. null, what to return for a null, None or 0
+# returns: the value stripped of surrounding spaces, or null if it is one of ArcGIS's null strings, see fixArcGISNull
+def TextParameter(value, null):
+    text = str(value).strip()
+    if text == "None" or text == "<Null>" or text == "NULL" or text == "":
+        return null
+    return text
+
+
+# function ParameterConverters
+# accepts: fc, String, path of the layer. formats, list of (column, nullToZero) tuples, nullToZero as for fixArcGISNull
+# returns: dictionary of column: function taking a value of the column and returning the value to bind to a query parameter
+# purpose: The direct load's SQLConverters.  The values are bound as they are so nothing needs quoting, numbers and
+# dates are passed straight through and text columns are cleaned up by TextParameter.
+def ParameterConverters(fc, formats):
+    fields = ResolveColumns(fc, [column for column, nullToZero in formats])
+    converters = {}
+    for (column, nullToZero), field in zip(formats, fields):
+        if nullToZero:
+            null = 0
+        else:
+            null = None
+        if field.type in TypedFieldTypes:
+            converter = lambda value, null = null: null if value is None else value
+        else:
+            converter = lambda value, null = null: TextParameter(value, null)
+        converters[column] = converter
+    return converters
+
+
+# function TransectKey
+# accepts: value, a GeneratedTransectID, as recorded in the field or as stored in Transect_or_Unit_Information
+# returns: String, the value as text so the two can be compared, whole numbers without a decimal point, or None
+def TransectKey(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value == int(value):
+        value = int(value)
+    return str(value).strip()
+
+
+# function ReadTransectIDs
+# accepts: sqlcursor, a cursor on the database connection. SurveyID, String
+# returns: dictionary of the TransectID of each of the survey's transects keyed on its GeneratedTransectID, see TransectKey
+# purpose: The direct load's TransectLookupSQL.  Read after TrnOrig has been loaded, inside the same transaction, so
+# the new transects are included.  Aborts if two of the survey's transects share a GeneratedTransectID, as the scripts do.
+def ReadTransectIDs(sqlcursor, SurveyID):
+    sqlcursor.execute("SELECT GeneratedTransectID, TransectID FROM Transect_or_Unit_Information " + \
+        "WHERE (SurveyID = ?) AND (GeneratedTransectID IS NOT NULL)", (SurveyID,))
+    transects = {}
+    for GeneratedTransectID, TransectID in sqlcursor.fetchall():
+        key = TransectKey(GeneratedTransectID)
+        if key in transects:
+            errormessage = 'ERROR: Survey ' + str(SurveyID) + ' has more than one transect with GeneratedTransectID ' + key
+            arcpy.AddMessage(errormessage)
+            sys.exit(errormessage)
+        transects[key] = TransectID
+    return transects
+
+
+# class LoadValues
+# accepts: fc, String, path of the layer. formats, list of (column, quoted, nullToZero) tuples of the layer's columns,
+# see ScriptValues. transects, dictionary of the survey's TransectIDs, see ReadTransectIDs, None if the layer's
+# records aren't related to transects. numbers, list of the numeric columns converted to floats, see NumberConverter
+# purpose: The direct load's ScriptValues.  Gives the values of a layer's records as the query parameters to bind,
+# nothing needs quoting, numbers and dates are passed as they are and the geometries as their WKT or WKB.
+class LoadValues:
+    def __init__(self, fc, formats, transects = None, numbers = []):
+        self.converters = ParameterConverters(fc, [(column, nullToZero) for column, quoted, nullToZero in formats])
+        self.transects = transects
+        self.floats = {}
+        for column in numbers:
+            self.floats[column] = NumberConverter(fc, column)
+
+    def column(self, name, value):
+        return self.converters[name](value)
+
+    def toFloat(self, name, value):
+        return self.floats[name](value)
+
+    def number(self, value):
+        return value
+
+    def text(self, value):
+        return value
+
+    def nullableText(self, value):
+        return TextParameter(value, None)
+
+    def constant(self, sql, value):
+        return value
+
+    def transect(self, GeneratedTransectID):
+        return self.transects.get(TransectKey(GeneratedTransectID))
+
+    def point(self, XY, Z, textFunction = "STGeomFromText"):
+        return SQLGeography.XYParameter(XY, Z, GeometryEncoding)
+
+    def pointWKT(self, WKT):
+        return WKT
+
+    def shape(self, shape, reducer):
+        return SQLGeography.ShapeParameter(shape, GeometryEncoding, reducer)
+
+    # returns: tuple, the record's query parameters
+    def join(self, values):
+        return tuple(values)
+
+
+# class DatabaseInsertWriter
+# accepts: sqlcursor, a cursor on the database connection. table, String, the table to insert into. columns, list of
+# the table's columns. placeholders, list of the query parameter of each column, ? or a T-SQL expression taking a ?,
+# see SQLGeography.GeographyPlaceholder. batchSize, Integer, the number of records to send at a time. telemetry, the
+# layer's RunTelemetry.LayerTelemetry
+# purpose: The direct load's InsertBatchWriter.  Collects the query parameters of the records destined for a single
+# table and sends them to the server batchSize records at a time with executemany, which pyodbc's fast_executemany
+# sends as arrays in a single round trip.  Nothing is committed, see LoadLayersIntoDatabase.  The time spent sending
+# the records is reported as the layer's write time.
+# Call add() for each record and flush() once after the last record so the final partial batch is sent.
+class DatabaseInsertWriter:
+    def __init__(self, sqlcursor, table, columns, placeholders, batchSize, telemetry):
+        self.sqlcursor = sqlcursor
+        self.query = "INSERT INTO " + table + "(" + ",".join(columns) + ") VALUES(" + ",".join(placeholders) + ")"
+        self.batchSize = batchSize
+        self.telemetry = telemetry
+        self.rows = [] # parameters waiting to be sent
+        self.rowCount = 0 # number of records sent so far
+
+    # add the query parameters of one record, sends the batch when it is full
+    def add(self, parameters):
+        self.rows.append(parameters)
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    # send the waiting records, if any
+    def flush(self):
+        if len(self.rows) == 0:
+            return
+        started = time.time()
+        self.sqlcursor.executemany(self.query, self.rows)
+        self.telemetry.writeSeconds = self.telemetry.writeSeconds + time.time() - started
+        self.rowCount = self.rowCount + len(self.rows)
+        self.rows = []
+
+
+# TrnOrig, see GenerateTrnOrigSQLScript
+def LoadTrnOrig(sqlcursor, SurveyID):
+    layer = "TrnOrig"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        arcpy.AddMessage('Loading ' + layer + "...")
+        cursor = ProjectedSearchCursor(fc, TrnOrigFields)
+        loadValues = LoadValues(fc, TrnOrigFormats)
+        batch = DatabaseInsertWriter(sqlcursor, "Transect_or_Unit_Information", TrnOrigColumns,
+            ["?"] * 15 + ["geography::STPointFromText(?, " + str(epsg) + ")", SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding)],
+            BulkBatchSize, telemetry)
+        for row in telemetry.timedRows(cursor):
+            Shape = row[0]
+            if Shape is None or Shape.WKT == "None" or Shape.WKT == "<Null>" or Shape.WKT == "NULL" or Shape.WKT == "":
+                errormessage = 'ERROR: Load aborted at row ' + str(row) + '. Shape is required but is NULL'
+                arcpy.AddMessage(errormessage)
+                sys.exit(errormessage)
+            batch.add(loadValues.join(TrnOrigValues(loadValues, row, SurveyID, reducer)))
+        batch.flush() # send the last partial batch
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# TrnPoints, see GenerateTrnPointsSQLScript
+def LoadTrnPoints(sqlcursor, SurveyID):
+    layer = "TrnPoints"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        arcpy.AddMessage('Loading ' + layer + "...")
+        cursor = ProjectedSearchCursor(fc, TrnPointsFields)
+        loadValues = LoadValues(fc, TrnPointsFormats)
+        batch = DatabaseInsertWriter(sqlcursor, "TransectPoints", TrnPointsColumns,
+            ["?"] * 4 + [SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding)], BulkBatchSize, telemetry)
+        for row in telemetry.timedRows(cursor):
+            batch.add(loadValues.join(TrnPointsValues(loadValues, row, SurveyID)))
+        batch.flush() # send the last partial batch
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# Animals, see GenerateAnimalsSQLScript
+def LoadAnimals(sqlcursor, SurveyID):
+    layer = "Animals"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        arcpy.AddMessage('Loading ' + layer + "...")
+        transects = ReadTransectIDs(sqlcursor, SurveyID)
+        cursor = ProjectedSearchCursor(fc, AnimalsFields)
+        rows = telemetry.timedRows(cursor)
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        if surveyFilter is not None:
+            rows = surveyFilter.filter(rows, lambda row: PointDateLocation(row[0], row[4]))
+        loadValues = LoadValues(fc, AnimalsFormats, transects, AnimalsNumbers)
+        batch = DatabaseInsertWriter(sqlcursor, "Animals", AnimalsColumns,
+            ["?"] * 23 + [SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding, "STPointFromText")], BulkBatchSize, telemetry)
+        for row in rows:
+            batch.add(loadValues.join(AnimalsValues(loadValues, row)))
+        batch.flush() # send the last partial batch
+        ReportSurveyFilter(surveyFilter, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# Tracklog, see GenerateTrackLogSQLScript
+def LoadTrackLog(sqlcursor, SurveyID):
+    layer = "Tracklog"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        arcpy.AddMessage('Loading ' + layer + "...")
+        transects = ReadTransectIDs(sqlcursor, SurveyID)
+        cursor = ProjectedSearchCursor(fc, TracklogFields)
+        rows = telemetry.timedRows(cursor)
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        if surveyFilter is not None:
+            rows = surveyFilter.filter(rows, lambda row: (None if row[0] is None else SurveyFilter.LineVertices(row[0]), None))
+        loadValues = LoadValues(fc, [], transects)
+        batch = DatabaseInsertWriter(sqlcursor, "TransectTracklog", TracklogColumns,
+            ["?", "?", "?", SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding), "?"], BulkBatchSize, telemetry)
+        for row in rows:
+            if row[0] is not None:
+                batch.add(loadValues.join(TracklogValues(loadValues, row, reducer)))
+            else:
+                telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
+        batch.flush() # send the last partial batch
+        ReportGeometryReduction(reducer, telemetry)
+        ReportSurveyFilter(surveyFilter, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# Buffers, see GenerateBuffersSQLScript
+def LoadBuffers(sqlcursor, SurveyID):
+    layer = "Buffer_Final" # standard name for the buffers layer
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        arcpy.AddMessage('Loading ' + layer + "...")
+        transects = ReadTransectIDs(sqlcursor, SurveyID)
+        cursor = ProjectedSearchCursor(fc, BuffersFields)
+        loadValues = LoadValues(fc, [], transects)
+        batch = DatabaseInsertWriter(sqlcursor, "Buffers", BuffersColumns,
+            ["?"] * 5 + [SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding), "?"], BulkBatchSize, telemetry)
+        for row in telemetry.timedRows(cursor):
+            batch.add(loadValues.join(BuffersValues(loadValues, row, fc, reducer)))
+        batch.flush() # send the last partial batch
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# FlatAreas, see GenerateFlatAreasSQLScript
+def LoadFlatAreas(sqlcursor, SurveyID):
+    layer = "FlatAreas"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        reducer = LayerGeometryReducer() # None unless CoordinatePrecision or SimplifyTolerance is set
+        arcpy.AddMessage('Loading ' + layer + "...")
+        cursor = ProjectedSearchCursor(fc, FlatAreasFields)
+        loadValues = LoadValues(fc, [])
+        batch = DatabaseInsertWriter(sqlcursor, "FlatAreas", FlatAreasColumns,
+            ["?", "?", SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding)], BulkBatchSize, telemetry)
+        for row in telemetry.timedRows(cursor):
+            batch.add(loadValues.join(FlatAreasValues(loadValues, row, SurveyID, reducer)))
+        batch.flush() # send the last partial batch
+        ReportGeometryReduction(reducer, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# GPSPointsLog, see GenerateGPSPointsLogSQLScript
+def LoadGPSPointsLog(sqlcursor, SurveyID):
+    layer = "GPSPointsLog"
+    fc = NPSdotGdbMxd + "/" + layer
+    if arcpy.Exists(fc):
+        telemetry = Telemetry.startLayer(layer) # timings and counts for the run report
+        thinner = GPSPointsLogThinner() # None unless GPSThinInterval, GPSThinDistance or GPSThinTolerance is set
+        surveyFilter = LayerSurveyFilter() # None unless SurveyBuffers, SurveyExtent or SurveyDates is set
+        arcpy.AddMessage('Loading ' + layer + "...")
+        cursor = ProjectedSearchCursor(fc, GPSPointsLogFields)
+        rows = telemetry.timedRows(cursor)
+        if surveyFilter is not None:
+            rows = surveyFilter.filter(rows, lambda row: PointDateLocation(row[0], row[2]))
+        if thinner is not None:
+            rows = thinner.thin(rows, lambda row: GPSPointLocation(row[0], row[2] + " " + row[4]))
+        loadValues = LoadValues(fc, GPSPointsLogFormats)
+        batch = DatabaseInsertWriter(sqlcursor, "GPSTracks", GPSPointsLogColumns,
+            ["?"] * 9 + [SQLGeography.GeographyPlaceholder(epsg, GeometryEncoding), "?"], BulkBatchSize, telemetry)
+        for row in rows:
+            XY = row[0]
+            # only load the point if we have a geometry
+            if XY is not None and XY[0] is not None:
+                batch.add(loadValues.join(GPSPointsLogValues(loadValues, row, fc, SurveyID)))
+            else:
+                telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
+        batch.flush() # send the last partial batch
+        ReportSurveyFilter(surveyFilter, telemetry)
+        ReportThinning(thinner, telemetry)
+        telemetry.finish()
+        arcpy.AddMessage(str(batch.rowCount) + ' records inserted')
+    else:
+        arcpy.AddMessage('\nERROR: Layer' + layer + ' does not exist.\n\n')
+
+
+# function LoadLayersIntoDatabase
+# accepts: loaderNames, list of the names of the Load* functions to run, in the order to run them. SurveyID, String
+# purpose: Runs the loaders one after another over a single connection to the database, pooled by pyodbc, inside a
+# single transaction.  The transaction is committed once every layer has been loaded and rolled back if anything
+# fails, so the database is never left holding part of a survey or locked by an open transaction.
+def LoadLayersIntoDatabase(loaderNames, SurveyID):
+    import pyodbc # only needed by the direct load
+    connection = pyodbc.connect(DatabaseConnectionString, autocommit = False)
+    try:
+        sqlcursor = connection.cursor()
+        sqlcursor.fast_executemany = True # bind each batch's values as arrays and send them in one round trip
+        for loaderName in loaderNames:
+            globals()[loaderName](sqlcursor, SurveyID)
+        connection.commit()
+        arcpy.AddMessage("Committed the load of " + NPSdotGdbMxd + " into ARCN_Sheep on " + DatabaseServer)
+    except BaseException: # including the sys.exit calls used to abort a layer
+        connection.rollback()
+        arcpy.AddMessage("ERROR: Rolled back, nothing from " + NPSdotGdbMxd + " has been loaded into ARCN_Sheep on " + DatabaseServer)
+        raise
+    finally:
+        connection.close()
+
+
+
+
+# function ExportLayerWorker
+# accepts: generatorName, String, name of the Generate*SQLScript function to run. settings, dictionary of the
+# WorkerSettings values from the parent process. SurveyID, String
+# returns: tuple of (generatorName, Boolean whether the export succeeded, list of the messages it produced, list of
+# the run report summaries of the layers it exported)
+# purpose: Runs one layer's export in a worker process.  The worker's arcpy messages and run report can't reach the
+# toolbox so they are collected and handed back to the parent process, which reports them once the layer is done.
+def ExportLayerWorker(generatorName, settings, SurveyID):
+    globals().update(settings)
+    messages = []
+    arcpy.AddMessage = messages.append # this is the worker's own copy of arcpy, the parent's is untouched
+    firstLayer = len(Telemetry.layers) # the pool reuses its workers, only hand back the layers exported this time
+    try:
+        globals()[generatorName](SurveyID)
+        succeeded = True
+    except BaseException: # including the sys.exit calls used to abort a layer
+        import traceback
+        messages.append(traceback.format_exc())
+        Telemetry.fail(sys.exc_info()[1])
+        succeeded = False
+    return (generatorName, succeeded, messages, [telemetry.summary() for telemetry in Telemetry.layers[firstLayer:]])
+
+
+# function ExportLayersInParallel
+# accepts: generatorNames, list of the names of the Generate*SQLScript functions to run. SurveyID, String
+# returns: list of the generator names that failed
+# purpose: Exports the layers at the same time using a pool of worker processes, each with its own SearchCursor and
+# output file, then reports each layer's messages and whether it succeeded.
+def ExportLayersInParallel(generatorNames, SurveyID):
+    import multiprocessing
+    # inside ArcMap sys.executable is ArcMap itself, the worker processes have to be started with the python interpreter
+    if os.name == "nt" and not os.path.basename(sys.executable).lower().startswith("python"):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+    settings = {}
+    for name in WorkerSettings:
+        settings[name] = globals()[name]
+    pool = multiprocessing.Pool(min(len(generatorNames), multiprocessing.cpu_count()))
+    results = [pool.apply_async(ExportLayerWorker, (generatorName, settings, SurveyID)) for generatorName in generatorNames]
+    pool.close()
+    failures = []
+    for result in results:
+        generatorName, succeeded, messages, summaries = result.get()
+        Telemetry.addSummaries(summaries)
+        for message in messages:
+            arcpy.AddMessage(message)
+        if succeeded:
+            arcpy.AddMessage(generatorName + " succeeded\n")
+        else:
+            arcpy.AddMessage("ERROR: " + generatorName + " failed\n")
+            failures.append(generatorName)
+    pool.join()
+    return failures
+
+
+# Pre-flight validation ------------------------------------------------------------------------------------------------
+# Checks the layers an export will write for the records that would make it fail, see LayerValidation.py and
+# PreflightValidation.  The rules below are what the generators and loaders, and the ARCN_Sheep tables behind them,
+# require of each layer.  Any change to what a generator requires of its layer must be made here too.
+
+# the layer each generator and loader exports
+ExportedLayers = {"GenerateTrnOrigSQLScript": "TrnOrig", "LoadTrnOrig": "TrnOrig",
+    "GenerateTrnPointsSQLScript": "TrnPoints", "LoadTrnPoints": "TrnPoints",
+    "GenerateAnimalsSQLScript": "Animals", "LoadAnimals": "Animals",
+    "GenerateTrackLogSQLScript": "Tracklog", "LoadTrackLog": "Tracklog",
+    "GenerateBuffersSQLScript": "Buffer_Final", "LoadBuffers": "Buffer_Final",
+    "GenerateFlatAreasSQLScript": "FlatAreas", "LoadFlatAreas": "FlatAreas",
+    "GenerateGPSPointsLogSQLScript": "GPSPointsLog", "LoadGPSPointsLog": "GPSPointsLog"}
+
+# the SegType values the TransectTracklog table allows, as they are recorded in NPS.gdb, see GenerateTrackLogSQLScript
+SegmentTypes = ["OnTransect", "OffTransect", "On Transect", "Off Transect"]
+
+
+# class PreflightChecks
+# purpose: The checks of each layer's records.  Each layer's method, see PreflightLayers, accepts a record of the
+# layer's columns and its OBJECTID and returns a tuple of lists of the error and warning messages about it, see
+# LayerValidation.GeometryProblems.  TrnOrig is checked first and its transects are remembered so the records of
+# the other layers can be checked against them.
+class PreflightChecks:
+    def __init__(self):
+        self.transects = None # TransectKey: OBJECTID of each of TrnOrig's transects, None if there is no TrnOrig layer
+
+    # the errors about a record related to a transect by its TransectID, see TransectLookupSQL
+    def transect(self, TransectID):
+        if TransectKey(TransectID) in [None, ""]:
+            return ["TransectID is required but is NULL"]
+        if self.transects is not None and TransectKey(TransectID) not in self.transects:
+            return ["TransectID " + str(TransectID) + " is not the TransectID of any transect in TrnOrig so it can't be related to one"]
+        return []
+
+    # the errors and warnings about a shape, one without a geometry is an error unless the layer skips them
+    def shape(self, Shape, skipped):
+        if Shape is None:
+            if skipped:
+                return ([], ["Shape is NULL, the record is skipped"])
+            return (["Shape is required but is NULL"], [])
+        return LayerValidation.GeometryProblems(Shape)
+
+    # the errors and warnings about a point read through SHAPE@XY, see shape
+    def point(self, XY, skipped):
+        if XY is None or XY[0] is None:
+            return self.shape(None, skipped)
+        problem = LayerValidation.CoordinateProblem(XY[0], XY[1])
+        if problem is not None:
+            return (["Shape " + problem], [])
+        return ([], [])
+
+    def trnOrig(self, row, objectid):
+        Shape, TransectID, ELEV_M, DD_LONG1, DD_LAT1 = row
+        errors, warnings = self.shape(Shape, False)
+        key = TransectKey(TransectID)
+        if key is None or key == "":
+            errors.append("TransectID is required, the other layers are related to the transect by it")
+        elif key in self.transects:
+            errors.append("TransectID " + key + " is also the TransectID of OBJECTID " + str(self.transects[key]))
+        else:
+            self.transects[key] = objectid
+        # the center point is written as POINT(DD_LONG1 DD_LAT1 ELEV_M)
+        problem = LayerValidation.CoordinateProblem(DD_LONG1, DD_LAT1)
+        if problem is not None:
+            errors.append("The center point DD_LONG1 DD_LAT1 " + problem)
+        if not isinstance(ELEV_M, (int, float)):
+            errors.append("ELEV_M is required for the center point but is " + str(ELEV_M))
+        return (errors, warnings)
+
+    def trnPoints(self, row, objectid):
+        XY, = row
+        return self.point(XY, False)
+
+    def animals(self, row, objectid):
+        XY, TransectID, GTE_FCRAMS = row
+        errors, warnings = self.point(XY, False)
+        if GTE_FCRAMS is None:
+            warnings.append("GTE_FCRAMS is NULL, Rams_FullCurl and Rams_GT_7_8Curl are loaded as 0")
+        return (errors + self.transect(TransectID), warnings)
+
+    def tracklog(self, row, objectid):
+        Shape, TransectID, SegType, Obs1Dir = row
+        errors, warnings = self.shape(Shape, True)
+        if Shape is None:
+            return (errors, warnings) # the segment isn't exported
+        if SegType not in SegmentTypes:
+            errors.append("SegType " + str(SegType) + " is not one of " + ", ".join(SegmentTypes))
+        if Obs1Dir is None:
+            errors.append("Obs1Dir is required but is NULL")
+        return (errors + self.transect(TransectID), warnings)
+
+    def buffers(self, row, objectid):
+        Shape, GeneratedTransectID = row
+        errors, warnings = self.shape(Shape, False)
+        return (errors + self.transect(GeneratedTransectID), warnings)
+
+    def flatAreas(self, row, objectid):
+        Shape, = row
+        return self.shape(Shape, False)
+
+    def gpsPointsLog(self, row, objectid):
+        XY, DATE_, TIME_ = row
+        errors, warnings = self.point(XY, True)
+        if XY is not None and XY[0] is not None and (DATE_ is None or TIME_ is None):
+            errors.append("DATE_ and TIME_ are required but are " + str(DATE_) + " and " + str(TIME_))
+        return (errors, warnings)
+
+
+# the PreflightChecks method checking each layer and the columns it reads
+PreflightLayers = {"TrnOrig": ("trnOrig", ["SHAPE@", "TransectID", "ELEV_M", "DD_LONG1", "DD_LAT1"]),
+    "TrnPoints": ("trnPoints", ["SHAPE@XY"]),
+    "Animals": ("animals", ["SHAPE@XY", "TransectID", "GTE_FCRAMS"]),
+    "Tracklog": ("tracklog", ["SHAPE@", "TransectID", "SegType", "Obs1Dir"]),
+    "Buffer_Final": ("buffers", ["SHAPE@", ("GeneratedTransectID", "TransectID")]),
+    "FlatAreas": ("flatAreas", ["SHAPE@"]),
+    "GPSPointsLog": ("gpsPointsLog", ["SHAPE@XY", "DATE_", "TIME_"])}
+
+
+# function ValidateLayers
+# accepts: exporterNames, list of the names of the Generate* or Load* functions about to be run
+# returns: LayerValidation.ValidationReport of the problems found
+# purpose: Checks the records of the layers the functions export in one pass through each layer and writes every
+# problem found to NPSdotGDBtoSQLServer.validation.txt.  TrnOrig is always read since the other layers are related
+# to its transects, its problems are only reported if it is to be exported.
+def ValidateLayers(exporterNames):
+    layers = [ExportedLayers[name] for name in exporterNames]
+    report = LayerValidation.ValidationReport(sqlscriptpath + "NPSdotGDBtoSQLServer.validation.txt",
+        "Pre-flight validation of " + NPSdotGdbMxd + " for SurveyID " + str(SurveyID) + ", " + executiontime + " by " + user)
+    checks = PreflightChecks()
+    for layer in ["TrnOrig"] + [layer for layer in layers if layer != "TrnOrig"]:
+        fc = NPSdotGdbMxd + "/" + layer
+        if not arcpy.Exists(fc):
+            continue
+        arcpy.AddMessage('Validating ' + layer + "...")
+        if layer == "TrnOrig":
+            checks.transects = {}
+        method, columns = PreflightLayers[layer]
+        check = getattr(checks, method)
+        reported = layer in layers
+        if reported:
+            report.startLayer(layer)
+        for row in ProjectedSearchCursor(fc, columns + ["OID@"]):
+            errors, warnings = check(row[:-1], row[-1])
+            if reported:
+                report.record(layer, row[-1], errors, warnings)
+        if reported:
+            arcpy.AddMessage(report.layerMessage(layer))
+    Telemetry.validation = report.counts
+    arcpy.AddMessage("Validation report: " + report.write() + "\n")
+    return report
+
+
 # Generate the SQL insert query scripts
-GenerateTrnOrigSQLScript(SurveyID) # TrnOrig layer
-GenerateAnimalsSQLScript(SurveyID) # Animals layer
-GenerateBuffersSQLScript(SurveyID) # Buffers layer
-GenerateFlatAreasSQLScript(SurveyID) # Flat areas layer
-# GenerateGPSPointsLogSQLScript(SurveyID) # GPSPointsLog layer. Note: Only import these GPS waypoints at the
-# discretion of the project leader.  The waypoints from the pilot's GPS are preferred, with the observer's
-# waypoints as secondary
-GenerateTrackLogSQLScript(SurveyID) # Tracklog layer
-GenerateTrnPointsSQLScript(SurveyID) # TrnPoints layer
-
-
-# Give some feedback
-arcpy.AddMessage("Done!")
-arcpy.AddMessage("Finished processing " + NPSdotGdbMxd)
-arcpy.AddMessage("Input geodatabase: " + NPSdotGdbMxd)
-arcpy.AddMessage("Output directory: " + sqlscriptpath)
-arcpy.AddMessage("SurveyID: " + str(SurveyID))
-arcpy.AddMessage("")
-arcpy.AddMessage("Your SQL insert query scripts are available at " + sqlscriptpath.replace("/","\\"))
\ No newline at end of file
+# the worker processes import this script too, everything below only runs in the toolbox's own process
+if __name__ == "__main__":
+    LayerGenerators = [
+        "GenerateTrnOrigSQLScript", # TrnOrig layer
+        "GenerateAnimalsSQLScript", # Animals layer
+        "GenerateBuffersSQLScript", # Buffers layer
+        "GenerateFlatAreasSQLScript", # Flat areas layer
+        # "GenerateGPSPointsLogSQLScript", # GPSPointsLog layer. Note: Only import these GPS waypoints at the
+        # discretion of the project leader.  The waypoints from the pilot's GPS are preferred, with the observer's
+        # waypoints as secondary.  Set the GPSPointsLog output format parameter to BULK to write bulk copy files instead,
+        # and the GPS thinning parameters to write fewer of the points.
+        "GenerateTrackLogSQLScript", # Tracklog layer
+        "GenerateTrnPointsSQLScript", # TrnPoints layer
+        ]
+    # the direct load's loaders, TrnOrig first since the animals, tracklog and buffers are related to its transects
+    LayerLoaders = [
+        "LoadTrnOrig", # TrnOrig layer
+        "LoadTrnPoints", # TrnPoints layer
+        "LoadAnimals", # Animals layer
+        "LoadTrackLog", # Tracklog layer
+        "LoadBuffers", # Buffers layer
+        "LoadFlatAreas", # Flat areas layer
+        # "LoadGPSPointsLog", # GPSPointsLog layer. Note: Only import these GPS waypoints at the discretion of the project leader.
+        ]
+    # the run report is written whether or not the export succeeds
+    try:
+        # nothing is exported if the layers have any of the problems that would make the export fail
+        if PreflightValidation:
+            if DatabaseServer != "":
+                report = ValidateLayers(LayerLoaders)
+            else:
+                report = ValidateLayers(LayerGenerators)
+            if report.errorCount() > 0:
+                errormessage = "ERROR: " + str(report.errorCount()) + " problems must be fixed before the layers are exported, see " + \
+                    report.filename
+                arcpy.AddMessage(errormessage)
+                sys.exit(errormessage)
+        if DatabaseServer != "":
+            LoadLayersIntoDatabase(LayerLoaders, SurveyID)
+        elif ExportInParallel:
+            failures = ExportLayersInParallel(LayerGenerators, SurveyID)
+            if len(failures) > 0:
+                arcpy.AddMessage("ERROR: " + str(len(failures)) + " layers failed to export: " + ", ".join(failures))
+        else:
+            for generatorName in LayerGenerators:
+                globals()[generatorName](SurveyID)
+    except BaseException as ex: # including the sys.exit calls used to abort a layer
+        Telemetry.fail(ex)
+        raise
+    finally:
+        arcpy.AddMessage("Run report: " + Telemetry.write())
+
+
+    # Give some feedback
+    arcpy.AddMessage("Done!")
+    arcpy.AddMessage("Finished processing " + NPSdotGdbMxd)
+    arcpy.AddMessage("Input geodatabase: " + NPSdotGdbMxd)
+    arcpy.AddMessage("Output directory: " + sqlscriptpath)
+    arcpy.AddMessage("SurveyID: " + str(SurveyID))
+    arcpy.AddMessage("")
+    if DatabaseServer != "":
+        arcpy.AddMessage("The layers have been loaded into ARCN_Sheep on " + DatabaseServer)
+    else:
+        arcpy.AddMessage("Your SQL insert query scripts are available at " + sqlscriptpath.replace("/","\\"))
\ No newline at end of file
@@ -5,17 +5,39 @@
 
 # Written by Scott D. Miller, Data Manager, Arctic and Central Alaska Inventory and Monitoring Networks, April, 2015
 
-# import the arcpy library
-import arcpy
+# import the arcpy library, or the shapefile reader that stands in for it.  The script can be run without ArcGIS, e.g. on
+# a Linux batch node, with the toolbox parameters in order on the command line, e.g.
+# python BuffersToSqlServer.py Buffers.shp <SurveyID> <SOPNumber> <SOPVersion>
+# The buffers shapefile must then be in WGS84, see ShapefileReader.py for what else the reader can't do.
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # the shared ShapefileReader.py, SQLScriptFiles.py, SQLGeography.py, RunTelemetry.py and ToolParameters.py are in the parent directory
+import ShapefileReader
+arcpy = ShapefileReader.Backend() # ESRI's arcpy, or the shapefile reader where ArcGIS isn't installed, see ShapefileReader.py
+import SQLScriptFiles
+import SQLGeography
+import RunTelemetry
+import ToolParameters
 
 # USER MUST SUPPLY THE VARIABLES BELOW --------------------------------------------
 
 # source shapefile of the survey buffers
 bufferfile = arcpy.GetParameterAsText(0)
 
+# Optional: GZIP or ZSTD to compress the sql script as it is written, leave blank for a plain text script
+ScriptCompression = ToolParameters.OptionalParameter(arcpy, 4)
+
+# Optional: WKB to write the buffers as hexadecimal Well-Known Binary, which gives a smaller script that Sql Server
+# loads faster.  Leave blank (or WKT) to write Well-Known Text.
+GeometryEncoding = SQLGeography.GeometryEncoding(ToolParameters.OptionalParameter(arcpy, 5))
+
+# Optional: the number of decimal places to round the buffers' Well-Known Text coordinates to, e.g. 6, and a distance
+# in meters to simplify the buffers by.  Leave blank to write the buffers in full.
+CoordinatePrecision = SQLGeography.CoordinatePrecision(ToolParameters.OptionalParameter(arcpy, 6))
+SimplifyTolerance = SQLGeography.SimplifyTolerance(ToolParameters.OptionalParameter(arcpy, 7))
+
 # directory where the sql script will be created
-outputfile  = bufferfile + '.sql'
+outputfile  = bufferfile + SQLScriptFiles.ScriptSuffix(ScriptCompression)
 
 # Supply the SurveyID from the Surveys table of the ARCN_Sheep database for this survey campaign.
 #  e.g. the Itkillik 2011 Survey's SurveyID is '1AC66891-5D1E-4749-B962-40AB1BCA577F'
@@ -49,7 +71,15 @@ user = getpass.getuser()
 
 # Buffers ------------------------------------------------------------------------------------------------------------
 arcpy.AddMessage("Processing: " + outputfile)
-file = open(outputfile, "w")
+# the run report, written next to the output script, records how long the export took and how much it wrote, see RunTelemetry.py
+Telemetry = RunTelemetry.RunReport("BuffersToSqlServer", bufferfile + ".report.json",
+    {"input": bufferfile, "SurveyID": SurveyID, "output": outputfile, "GeometryEncoding": GeometryEncoding,
+    "CoordinatePrecision": CoordinatePrecision, "SimplifyTolerance": SimplifyTolerance})
+telemetry = Telemetry.startLayer(bufferfile)
+reducer = None # rounds and simplifies the buffers, see SQLGeography.GeometryReducer
+if CoordinatePrecision is not None or SimplifyTolerance > 0:
+    reducer = SQLGeography.GeometryReducer(CoordinatePrecision, SimplifyTolerance)
+file = telemetry.timedFile(SQLScriptFiles.OpenOutputFile(outputfile, "w"))
 
 # write some metadata to the sql script
 file.write("-- Insert queries to transfer data from ARCN Sheep monitoring buffers shapefile " + bufferfile + " into ARCN_Sheep database\n")
@@ -62,6 +92,21 @@ file.write("-- SurveyID: " + SurveyID + "\n")
 file.write("-- If this file is too big to run in Sql Server Management Studio then run from a Windows Power Shell prompt: sqlcmd /S YOURSQLSERVER\INSTANCENAME /i ""C:\Your Script.sql""\n")
 file.write("USE ARCN_Sheep \n")
 file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
+
+# look up the TransectID of each of the survey's GeneratedTransectIDs once and join the buffers to it instead of
+# running a subquery against Transect_or_Unit_Information for every buffer.  If two of the survey's transects share a
+# GeneratedTransectID the join would insert a buffer once for each of them, so the script raises an error and skips the
+# rest of itself instead.
+file.write("\n-- look up the TransectID of each of the survey's GeneratedTransectIDs once, the insert queries below join to it\n")
+file.write("IF OBJECT_ID('tempdb..#Transects') IS NOT NULL DROP TABLE #Transects\n")
+file.write("SELECT GeneratedTransectID, TransectID INTO #Transects FROM Transect_or_Unit_Information " + \
+    "WHERE (SurveyID = '" + SurveyID + "') AND (GeneratedTransectID IS NOT NULL)\n")
+file.write("IF EXISTS (SELECT GeneratedTransectID FROM #Transects GROUP BY GeneratedTransectID HAVING COUNT(*) > 1)\n")
+file.write("BEGIN\n")
+file.write("    RAISERROR('Survey " + SurveyID.replace("'", "''") + " has more than one transect with the same GeneratedTransectID, " + \
+    "nothing below is run. Run SET NOEXEC OFF and ROLLBACK, then check Transect_or_Unit_Information', 16, 1)\n")
+file.write("    SET NOEXEC ON -- skips the rest of the script\n")
+file.write("END\n\n")
 file.write("\n-- insert the buffers from " + bufferfile + " -----------------------------------------------------------\n")
 
 fieldsList = arcpy.ListFields(bufferfile) #get the fields
@@ -78,7 +123,8 @@ for field in fieldsList:
 # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
 # loop through the cursor and save fields as variables to be used later in insert queries
 cursor = arcpy.da.SearchCursor(bufferfile,fields,"",sr)
-for row in cursor:
+bufferrows = [] # VALUES lists of the buffers
+for row in telemetry.timedRows(cursor):
     FID = row[0]
     Shape = row[1]
     GeneratedTransectID = row[2]
@@ -86,7 +132,22 @@ for row in cursor:
     SurveyName = row[4]
     F_AREA = row[5]
 
-    # build an insert query
+    # build the VALUES list of the buffer, starting with its GeneratedTransectID in place of the TransectID
+    values = "(" + str(GeneratedTransectID) + "," + \
+        "'" + str(GeneratedTransectID) + "'," + \
+        "'" + str(SurveyID) + "'," + \
+        "NULL," + \
+        "NULL," + \
+        SQLGeography.GeographyFromShape(Shape, epsg, GeometryEncoding, reducer = reducer) + "," + \
+        "'" + bufferfile + "'," + \
+        SOPNumber + "," + \
+        SOPVersion +  \
+        ")"
+    bufferrows.append(values)
+
+# write the buffers as insert queries of up to 1000 records each, matching the batches of NPSdotGDBtoSQLServer.py, that
+# take each buffer's TransectID from #Transects
+for first in range(0, len(bufferrows), 1000):
     insertquery = "INSERT INTO Buffers(" + \
         "TransectID," + \
         "GeneratedTransectID," + \
@@ -97,17 +158,13 @@ for row in cursor:
         "BufferFileDirectory," + \
         "SOPNumber," + \
         "SOPVersion" + \
-        ") VALUES(" + \
-        "(SELECT TransectID FROM Transect_or_Unit_Information WHERE (SurveyID = '" + SurveyID + "' And GeneratedTransectID = " + str(GeneratedTransectID) + "))," + \
-        "'" + str(GeneratedTransectID) + "'," + \
-        "'" + str(SurveyID) + "'," + \
-        "NULL," + \
-        "NULL," + \
-        "geography::STGeomFromText('" + Shape.WKT + "', " + str(epsg) + ")," + \
-        "'" + bufferfile + "'," + \
-        SOPNumber + "," + \
-        SOPVersion +  \
-        ");\n"
+        ")\n" + \
+        "SELECT #Transects.TransectID,v.GeneratedTransectID,v.GeneratedSurveyID,v.SegmentID,v.Obs1Dir,v.PolygonFeature," + \
+        "v.BufferFileDirectory,v.SOPNumber,v.SOPVersion FROM (VALUES\n" + \
+        ",\n".join(bufferrows[first:first + 1000]) + \
+        ") AS v(LookupGeneratedTransectID,GeneratedTransectID,GeneratedSurveyID,SegmentID,Obs1Dir,PolygonFeature," + \
+        "BufferFileDirectory,SOPNumber,SOPVersion)\n" + \
+        "LEFT JOIN #Transects ON #Transects.GeneratedTransectID = v.LookupGeneratedTransectID;\n"
 
     # print insertquery # print the query to standard output
     file.write(insertquery) # write the query to the output .sql file
@@ -115,4 +172,9 @@ for row in cursor:
 #  close the output file
 file.write("\n-- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
 file.close()
+if reducer is not None:
+    telemetry.geometryReduction = reducer.counts
+    arcpy.AddMessage(reducer.message())
+telemetry.finish()
+arcpy.AddMessage("Run report: " + Telemetry.write())
 arcpy.AddMessage('Output written to ' + outputfile)
\ No newline at end of file
@@ -3,18 +3,48 @@
 # NOTE: This script writes data directly to the database.  Do not 'test' the script without knowing
 # what you are doing.
 # NOTE: NPS.gdb collects prolific GPS points.  This script may take many hours to complete.
+# Supplying the optional 'Rows per commit' parameter switches to the bulk load mode: the GPS points are sent to the server
+# in batches as a single parameterized insert query with the values bound as arrays (pyodbc fast_executemany) and
+# committed once per batch, which is many times faster than executing and committing every insert query on its own.
+# NOTE: The OBJECTID of the last committed GPS point is recorded for each layer and SurveyID in a checkpoint file
+# (ImportGPSPointsCheckpoint.json, next to NPS.gdb).  If the script dies part way through, running it again picks up
+# after the last committed GPS point instead of starting over and inserting duplicates.  Delete the checkpoint file
+# to import a layer again from the beginning.  The bulk load mode checkpoints each batch as it is committed, the one row
+# at a time mode every CheckpointRows rows or CheckpointSeconds seconds, whichever comes first, so if the script dies
+# the rows committed since its last checkpoint, at most that many rows or seconds' worth, are inserted again.
+# Supplying any of the optional GPS thinning parameters imports fewer of the GPS points, see GPSThinning.py.  The points
+# are thinned as they are read so the checkpoint still records the last point committed.  A run resumed from a
+# checkpoint starts thinning afresh from the first point after it.
 
 # Written by Scott D. Miller, Data Manager, Arctic and Central Alaska Inventory and Monitoring Networks, October, 2014
 
 import arcpy # import the arcpy library
 import pyodbc # import pyodbc library to allow database connections
 import os # operating system functions
+import json # reading and writing the checkpoint file
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # the shared SQLGeography.py, RunTelemetry.py, GPSThinning.py and ToolParameters.py are in the parent directory
+import SQLGeography # formats the points' Well-Known Text
+import RunTelemetry # the run report
+import GPSThinning # thins out the GPS points
+import ToolParameters # reads the optional parameters
 
 # ArcToolbox parameters --------------------------------------------
 NPSdotGdbMxd = arcpy.GetParameterAsText(0) # path to the NPS.gdb
 server = arcpy.GetParameterAsText(1) # SQL Server
 database = 'ARCN_Sheep'
 SurveyID = arcpy.GetParameterAsText(2) # the SurveyID from the ARCN_Sheep database to which the GPS points will be related
+BatchSize = ToolParameters.OptionalParameter(arcpy, 3) # optional, rows per commit for the bulk load mode. Leave blank to insert and commit one row at a time
+# optional, drop the GPS points logged less than this many seconds after, less than this many meters from, or within
+# this many meters of the track through the points kept.  Leave blank to import every GPS point
+ThinInterval = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 4), "GPS thinning interval")
+ThinDistance = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 5), "GPS thinning distance")
+ThinTolerance = GPSThinning.ThinningTolerance(ToolParameters.OptionalParameter(arcpy, 6), "GPS thinning tolerance")
+
+# how often the one row at a time mode checkpoints, rather than writing and syncing the checkpoint file after every row
+CheckpointRows = 1000
+CheckpointSeconds = 10
+
 connectionstring = 'DRIVER={SQL Server Native Client 10.0};SERVER=' + server + ';DATABASE=' + database + ';Trusted_Connection=yes'
 
 # echo parameters
@@ -23,6 +53,17 @@ arcpy.AddMessage('Server: ' + server)
 arcpy.AddMessage('Database: ' + database)
 arcpy.AddMessage('SurveyID: ' + SurveyID)
 arcpy.AddMessage('Connection string: ' + connectionstring)
+if BatchSize == "":
+    BatchSize = 0 # one insert query and one commit per row
+else:
+    BatchSize = max(1, int(BatchSize))
+    arcpy.AddMessage('Rows per commit: ' + str(BatchSize))
+if ThinInterval == 0 and ThinDistance == 0 and ThinTolerance == 0:
+    thinner = None # every GPS point is imported
+else:
+    thinner = GPSThinning.PointThinner(ThinInterval, ThinDistance, ThinTolerance)
+    arcpy.AddMessage('GPS thinning: ' + str(ThinInterval) + ' seconds, ' + str(ThinDistance) + ' meters apart, ' + \
+        str(ThinTolerance) + ' meters along track')
 
 # spatial coordinate system
 # the data in the output sql script will be in the reference system indicated below
@@ -61,6 +102,95 @@ def fixArcGISNull(inputString, quoted, nullToZero):
     return newStr
 
 
+# function fixArcGISNullParameter
+# accepts: value, the value to process. nullToZero, Boolean, whether to convert nulls to zeroes
+# returns: the value, or None if it is one of ArcGIS's many null values
+# purpose: The parameterized insert query equivalent of fixArcGISNull.  Values are bound to the query as they are
+# rather than written into the SQL so there is no quoting to do, but the nulls still need fixing.
+def fixArcGISNullParameter(value, nullToZero):
+    if value is None or str(value).strip() in ("None", "<Null>", "NULL", ""):
+        if nullToZero == True:
+            return 0
+        return None
+    return value
+
+
+# function BulkInsertRows
+# accepts: connection, an open database connection. sqlcursor, a cursor on the connection. insertquery, String,
+# parameterized insert query with a ? placeholder for each value. rows, list of (row number, tuple of query parameters)
+# returns: list of (row number, tuple of query parameters, error message) for each row that failed to insert
+# purpose: Inserts the rows with a single executemany call and commits them.  If the batch fails it is rolled back and
+# split in half, and each half is tried again, until the rows that fail have been narrowed down to individual rows so
+# every good row still gets inserted and every bad row can be reported on its own.
+# The connection only needs to follow the Python DB-API so a sqlite3 connection can stand in for Sql Server when testing.
+def BulkInsertRows(connection, sqlcursor, insertquery, rows):
+    try:
+        sqlcursor.executemany(insertquery, [parameters for rownumber, parameters in rows])
+        connection.commit()
+        return []
+    except Exception as ex:
+        connection.rollback()
+        if len(rows) == 1:
+            return [(rows[0][0], rows[0][1], str(ex))]
+        half = len(rows) // 2
+        return BulkInsertRows(connection, sqlcursor, insertquery, rows[:half]) + \
+            BulkInsertRows(connection, sqlcursor, insertquery, rows[half:])
+
+
+# function ReadCheckpoints
+# accepts: checkpointfile, String, path to the checkpoint file
+# returns: dictionary of the last committed OBJECTID keyed on layer and SurveyID, empty if there is no checkpoint file
+# purpose: Loads the checkpoints left by earlier runs so the import can resume where it left off
+def ReadCheckpoints(checkpointfile):
+    # SaveCheckpoint replaces the file with a freshly written copy, if it died before the copy was renamed use the copy
+    for path in (checkpointfile, checkpointfile + '.tmp'):
+        if os.path.exists(path):
+            checkpointstream = open(path, "r")
+            try:
+                return json.load(checkpointstream)
+            except ValueError:
+                pass # partially written, try the next one
+            finally:
+                checkpointstream.close()
+    return {}
+
+
+# function SaveCheckpoint
+# accepts: lastOBJECTID, Integer, the OBJECTID of the last GPS point whose insert has been committed
+# purpose: Durably records the checkpoint for this layer and SurveyID.  The checkpoints are written to a temporary file
+# which is flushed to disk before it replaces the checkpoint file so a crash can never leave a half written checkpoint.
+def SaveCheckpoint(lastOBJECTID):
+    checkpoints[checkpointkey] = lastOBJECTID
+    checkpointstream = open(checkpointfile + '.tmp', "w")
+    json.dump(checkpoints, checkpointstream, indent = 1, sort_keys = True)
+    checkpointstream.flush()
+    os.fsync(checkpointstream.fileno())
+    checkpointstream.close()
+    if os.path.exists(checkpointfile):
+        os.remove(checkpointfile) # Windows will not rename over an existing file
+    os.rename(checkpointfile + '.tmp', checkpointfile)
+
+
+# function WriteBatch
+# accepts: rows, list of (row number, tuple of query parameters) waiting to be inserted. lastOBJECTID, Integer, the
+# OBJECTID of the last GPS point read from the layer
+# returns: Integer, the number of rows that failed to insert
+# purpose: Bulk inserts a batch of GPS points, reports the outcome to the user and the log file and checkpoints the batch
+def WriteBatch(rows, lastOBJECTID):
+    started = time.time()
+    failures = BulkInsertRows(connection, sqlcursor, bulkinsertquery, rows)
+    telemetry.writeSeconds = telemetry.writeSeconds + time.time() - started
+    SaveCheckpoint(lastOBJECTID)
+    msg = 'Success|Rows: ' + str(rows[0][0]) + '-' + str(rows[-1][0]) + '|' + str(len(rows) - len(failures)) + ' rows inserted|\n'
+    arcpy.AddMessage(msg)
+    file.write(msg)
+    for rownumber, parameters, error in failures:
+        msg = 'FAILED|Row: ' + str(rownumber) + '|' + str(parameters) + '|' + error + '\n'
+        arcpy.AddMessage(msg)
+        file.write(msg)
+    return len(failures)
+
+
 
 
 # GPS Tracklog ------------------------------------------------------------------------------------------------------------
@@ -71,6 +201,9 @@ arcpy.AddMessage('Processing ' + layer + "...")
 # open a connection to the sql server
 connection = pyodbc.connect(connectionstring)
 sqlcursor = connection.cursor()# get a cursor
+if BatchSize > 0:
+    # bind each batch's values as arrays and send them to the server in one round trip
+    sqlcursor.fast_executemany = True
 
 # create a log file
 # Supply a directory to output the sql scripts to, the scripts will be named according to the layer they came from
@@ -93,25 +226,74 @@ file.write('SurveyID: ' + SurveyID + '\n')
 file.write('Connection string: ' + connectionstring + '\n' )
 file.write('/n')
 
+# the run report, written next to the log file, records how long the import took and how many queries failed, see
+# RunTelemetry.py.  The time spent inserting the GPS points into the database is reported as the write time.
+Telemetry = RunTelemetry.RunReport("ImportGPSPoints", logfilepath + "ImportGPSPoints.report.json",
+    {"input": NPSdotGdbMxd, "server": server, "database": database, "SurveyID": SurveyID, "BatchSize": BatchSize,
+    "ThinInterval": ThinInterval, "ThinDistance": ThinDistance, "ThinTolerance": ThinTolerance})
+telemetry = Telemetry.startLayer(fc)
+
+# look for a checkpoint left by an earlier run of this layer and SurveyID
+checkpointfile = logfilepath + 'ImportGPSPointsCheckpoint.json'
+checkpointkey = fc + '|' + SurveyID
+checkpoints = ReadCheckpoints(checkpointfile)
+objectidfield = arcpy.AddFieldDelimiters(fc, "OBJECTID")
+if checkpointkey in checkpoints:
+    # skip the rows that have already been committed, the file geodatabase does the skipping so they are never read
+    whereclause = objectidfield + " > " + str(checkpoints[checkpointkey])
+    msg = 'Resuming after OBJECTID ' + str(checkpoints[checkpointkey]) + ' (checkpoint file ' + checkpointfile + ')\n'
+    arcpy.AddMessage(msg)
+    file.write(msg)
+else:
+    whereclause = ""
+
 fieldsList = arcpy.ListFields(fc) #get the fields
 fields = [] # create an empty list
 #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
+#  the SHAPE@XY token returns just the point's coordinates, which is much quicker than building a geometry object for every point
 for field in fieldsList:
-    if field.name == "Shape":
-        fields.append("Shape@")
-    elif field.name == "SHAPE":
-        fields.append("SHAPE@")
+    if field.name == "Shape" or field.name == "SHAPE":
+        fields.append("SHAPE@XY")
     else:
         fields.append(field.name)
+# the points' elevations are added to the end of the list if the layer has them
+hasZ = arcpy.Describe(fc).hasZ
+if hasZ:
+    fields.append("SHAPE@Z")
 
 # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
 # loop through the cursor and save fields as variables to be used later in insert queries
-cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
+# the rows are read in OBJECTID order so that everything up to the checkpointed OBJECTID is known to be committed
+cursor = arcpy.da.SearchCursor(fc,fields,whereclause,sr,False,(None, "ORDER BY " + objectidfield))
+rows = telemetry.timedRows(cursor)
+if thinner is not None:
+    # only the points kept are read below, in OBJECTID order, the points without a geometry are dropped too
+    rows = thinner.thin(rows, lambda row: None if row[1] is None else (row[1][0], row[1][1], row[2] + " " + row[10]))
 i = 1 # a counter; increments with each iteration
 failedquerycount = 0 # increments with each failed insert query to give an idea of how many failed
-for row in cursor:
+
+# parameterized insert query used by the bulk load mode, the values are bound to the ? placeholders
+bulkinsertquery = "INSERT INTO GPSTracks(" + \
+    "PilotName," + \
+    "TailNo," + \
+    "CaptureDate," + \
+    "GPSModel," + \
+    "Altitude," + \
+    "Source," + \
+    "SourceFileName," + \
+    "TracksFileDirectory," + \
+    "Comment," + \
+    "PointFeature," + \
+    "SurveyID" + \
+    ")" + \
+    "VALUES(?,?,?,NULL,?,?,?,NULL,NULL,geography::STGeomFromText(?, " + str(epsg) + "),?);"
+pendingrows = [] # rows waiting to be bulk inserted
+OBJECTID = None # OBJECTID of the last row read
+uncheckpointedrows = 0 # rows committed one at a time since the last checkpoint
+checkpointed = time.time() # when the last checkpoint was saved
+for row in rows:
     OBJECTID = row[0]
-    SHAPE = row[1]
+    XY = row[1]
     DATE_ = row[2]
     ALTITUDE = row[3]
     LATITUDE = row[4]
@@ -126,10 +308,14 @@ for row in cursor:
     AIRCRAFT = 'Unknown' #row[13]
     HitDate =  DATE_ + " " + TIME_
 
-    if not SHAPE is None:
-        WKT = SHAPE.WKT
+    if not XY is None and not XY[0] is None:
+        if hasZ:
+            WKT = SQLGeography.PointWKT(XY[0], XY[1], row[-1])
+        else:
+            WKT = SQLGeography.PointWKT(XY[0], XY[1])
     else:
         WKT = "NULL"
+        telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + 1
     geog = "geography::STGeomFromText('" + WKT + "', " + str(epsg) + ")"
 
     # build an insert query
@@ -167,8 +353,16 @@ for row in cursor:
 
 
     # only write out the query if we have a geometry
-    if not WKT == 'NULL' :
+    if not WKT == 'NULL' and BatchSize > 0:
+        # bulk load mode, queue the row's values and insert them once the batch is full
+        pendingrows.append((i, (PILOTLNAM, AIRCRAFT, fixArcGISNullParameter(HitDate, False),
+            fixArcGISNullParameter(ALTITUDE, True), fc, fc, WKT, SurveyID)))
+        if len(pendingrows) >= BatchSize:
+            failedquerycount = failedquerycount + WriteBatch(pendingrows, OBJECTID)
+            pendingrows = []
+    elif not WKT == 'NULL' :
         # try to execute the insert query, if it fails report why
+        started = time.time()
         try:
             sqlcursor.execute(insertquery)
             sqlcursor.commit()
@@ -179,9 +373,29 @@ for row in cursor:
             msg = 'FAILED|Row: ' + str(i) + '|' + insertquery + '|' + str(ex) + '\n'
             arcpy.AddMessage(msg)
             failedquerycount = failedquerycount + 1
+        telemetry.writeSeconds = telemetry.writeSeconds + time.time() - started
+        uncheckpointedrows = uncheckpointedrows + 1
+        if uncheckpointedrows >= CheckpointRows or time.time() - checkpointed >= CheckpointSeconds:
+            SaveCheckpoint(OBJECTID)
+            uncheckpointedrows = 0
+            checkpointed = time.time()
     i = i + 1
 
+# insert the last partial batch
+if len(pendingrows) > 0:
+    failedquerycount = failedquerycount + WriteBatch(pendingrows, OBJECTID)
+elif OBJECTID is not None:
+    SaveCheckpoint(OBJECTID) # the rows since the last checkpoint, or at the end of the layer without a geometry
+
 # report done
+telemetry.failedQueries = failedquerycount
+if thinner is not None:
+    telemetry.thinning = thinner.counts
+    telemetry.skippedNullGeometry = telemetry.skippedNullGeometry + thinner.counts["withoutPoint"]
+    arcpy.AddMessage(thinner.message())
+    file.write(thinner.message() + '\n')
+telemetry.finish()
 arcpy.AddMessage('Done')
+arcpy.AddMessage('Run report: ' + Telemetry.write())
 arcpy.AddMessage(str(failedquerycount) + ' queries failed to execute')
 arcpy.AddMessage('\nLog file available at ' + file.name + '\n')
\ No newline at end of file
@@ -3,7 +3,12 @@
 # Written by Scott Miller, Data Manager, National Park Service, Arctic and Central Alaska Inventory and Monitoring Networks
 # April, 2015
 
-import arcpy
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # the shared ShapefileReader.py and SQLGeography.py are in the parent directory
+import ShapefileReader
+arcpy = ShapefileReader.Backend() # ESRI's arcpy, or the shapefile reader where ArcGIS isn't installed, see ShapefileReader.py
+import SQLGeography
 
 # input shapefile
 fc = "C:/Temp/MurphyProjected.shp"
@@ -11,6 +16,12 @@ fc = "C:/Temp/MurphyProjected.shp"
 # Supply an output file to which to export the insert queries
 file = open("C:/Work/VitalSigns/ARCN-CAKN Dall Sheep/zWorking/Murphy1974.sql", "w")
 
+# Optional: round the units' coordinates to this many decimal places, e.g. 6, and simplify the unit polygons by this
+# many meters.  None and 0 write the polygons in full.
+CoordinatePrecision = None
+SimplifyTolerance = 0
+reducer = SQLGeography.GeometryReducer(CoordinatePrecision, SimplifyTolerance) # also counts the vertices and bytes written
+
 # we'll need to create a searchcursor a little further on to access the records in the layer.  the cursor has a fields parameter
 # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. Shape@,
 # so we have to submit all the columns as a list with Shape changed to the Shape@ token that will allow us to get at geometry info.
@@ -42,7 +53,7 @@ for row in cursor:
     Shape = row[1]
     CODE = row[2]
     UnitID = "'DENA74-" + str(CODE) + "',"
-    Geog = "geography::STGeomFromText('" + Shape.WKT + "', " + str(epsg) + ")"
+    Geog = SQLGeography.GeographyFromShape(Shape, epsg, "WKT", reducer = reducer)
     Sql = "INSERT INTO [LegacyUnits](" + \
         "[LegacyUnitID]," + \
         "[ARCNUnitName]," + \
@@ -53,4 +64,5 @@ for row in cursor:
         Geog + ")"
     file.write(Sql + "\n")
 file.close()
+print reducer.message()
 
@@ -5,7 +5,12 @@ __author__ = 'SDMiller'
 # Written by Scott Miller, Data Manager, National Park Service, Arctic and Central Alaska Inventory and Monitoring Networks
 # April, 2015
 
-import arcpy
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # the shared ShapefileReader.py and SQLGeography.py are in the parent directory
+import ShapefileReader
+arcpy = ShapefileReader.Backend() # ESRI's arcpy, or the shapefile reader where ArcGIS isn't installed, see ShapefileReader.py
+import SQLGeography
 
 # input shapefile
 layername = "WRST_SurveyUnits_1992"
@@ -14,6 +19,12 @@ fc = "C:/Work/VitalSigns/ARCN-CAKN Dall Sheep/Data/LegacySurveyUnits/" + layerna
 # Supply an output file to which to export the insert queries
 file = open("C:/Work/VitalSigns/ARCN-CAKN Dall Sheep/Data/LegacySurveyUnits/" + layername + ".sql", "w")
 
+# Optional: round the units' coordinates to this many decimal places, e.g. 6, and simplify the unit polygons by this
+# many meters.  None and 0 write the polygons in full.
+CoordinatePrecision = None
+SimplifyTolerance = 0
+reducer = SQLGeography.GeometryReducer(CoordinatePrecision, SimplifyTolerance) # also counts the vertices and bytes written
+
 # we'll need to create a searchcursor a little further on to access the records in the layer.  the cursor has a fields parameter
 # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. Shape@,
 # so we have to submit all the columns as a list with Shape changed to the Shape@ token that will allow us to get at geometry info.
@@ -60,7 +71,7 @@ for row in cursor:
     FLAT_KM2 = row[10]
     SURF_KM2 = row[11]
     RUGG = row[12]
-    geog = "geography::STGeomFromText('" + Shape.WKT + "', " + str(epsg) + ")"
+    geog = SQLGeography.GeographyFromShape(Shape, epsg, "WKT", reducer = reducer)
 
     # build insert query
     sql = "INSERT INTO [LegacyUnits](" + \
@@ -77,6 +88,7 @@ for row in cursor:
         str(geog) + ")"
     file.write(sql + "\n")
 file.close()
+print reducer.message()
 print "Output written to " + file.name
 
 
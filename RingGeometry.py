@@ -0,0 +1,31 @@
+# RingGeometry.py
+# Purpose: The plane geometry of polygon rings shared by the National Park Service Arctic and Central Alaska Networks
+# Dall's sheep monitoring program's modules: LayerValidation.py checks that rings enclose an area, SurveyFilter.py
+# finds the buffer polygons a point is inside and ShapefileReader.py groups a shapefile's rings into polygons.
+
+# A ring is a list of (x, y) tuples of longitudes and latitudes, closed, its last vertex repeating its first.  The
+# rings are treated as flat, which is close enough over the few kilometres of a survey's polygons.
+
+
+# function RingArea
+# accepts: ring, list of (x, y) tuples, closed
+# returns: Float, the area inside the ring, positive if the ring runs counter-clockwise and negative if clockwise
+def RingArea(ring):
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        area = area + x1 * y2 - x2 * y1
+    return area / 2.0
+
+
+# function RingsContain
+# accepts: rings, list of the rings of a polygon, its outer ring and holes. x, y, Float
+# returns: Boolean, whether the point is inside the polygon, by counting the ring edges a ray east from the point crosses
+def RingsContain(rings, x, y):
+    inside = False
+    for ring in rings:
+        x1, y1 = ring[-1]
+        for x2, y2 in ring:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+            x1, y1 = x2, y2
+    return inside
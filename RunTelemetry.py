@@ -0,0 +1,175 @@
+# RunTelemetry.py
+# Purpose: Run reports shared by the National Park Service Arctic and Central Alaska Networks Dall's sheep monitoring
+# program's exporters and importers (NPSdotGDBtoSQLServer.py, WaypointsToSQL.py, TracklogToSQL.py,
+# OneOffScripts/BuffersToSqlServer.py and OneOffScripts/ImportGPSPoints.py).
+
+# Each run writes a small JSON report next to its output, e.g. NPSdotGDBtoSQLServer.report.json, recording for each
+# layer how long it took, how that time split between reading the layer, formatting the SQL and writing it out, how
+# many records were read, skipped for having no geometry or failed to insert, and how much SQL was written.  Keeping
+# the reports from each survey season shows whether the exports are getting slower and where the time goes on the
+# big layers.  The time spent formatting is what is left of the layer's time once reading and writing are taken out.
+
+import getpass
+import json
+import sys
+import time
+
+
+# class TimedFile
+# accepts: file, an open output file. telemetry, the LayerTelemetry of the layer being written
+# purpose: Stands in for an output file, timing the writes and counting the characters written before any
+# compression.  Anything else is passed through to the file.
+class TimedFile:
+    def __init__(self, file, telemetry):
+        self.file = file
+        self.telemetry = telemetry
+
+    def write(self, text):
+        started = time.time()
+        self.file.write(text)
+        self.telemetry.writeSeconds = self.telemetry.writeSeconds + time.time() - started
+        self.telemetry.bytesWritten = self.telemetry.bytesWritten + len(text)
+
+    # an insert query of rowCount records, see NPSdotGDBtoSQLServer.ShardedScriptFile
+    def writeRecords(self, text, rowCount):
+        started = time.time()
+        if hasattr(self.file, "writeRecords"):
+            self.file.writeRecords(text, rowCount)
+        else:
+            self.file.write(text)
+        self.telemetry.writeSeconds = self.telemetry.writeSeconds + time.time() - started
+        self.telemetry.bytesWritten = self.telemetry.bytesWritten + len(text)
+
+    def close(self):
+        started = time.time()
+        self.file.close() # compressed and sharded files do some of their writing when they are closed
+        self.telemetry.writeSeconds = self.telemetry.writeSeconds + time.time() - started
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+# class LayerTelemetry
+# accepts: name, String, the layer, or input file, being processed
+# purpose: Collects the timings and counts of one layer.  The layer counts as failed until finish() is called.
+class LayerTelemetry:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.finished = None
+        self.error = None
+        self.readSeconds = 0.0
+        self.writeSeconds = 0.0
+        self.rowsRead = 0
+        self.skippedNullGeometry = 0
+        self.failedQueries = 0
+        self.bytesWritten = 0
+        self.incremental = None # new, changed, unchanged and removed feature counts of an incremental export
+        self.geometryReduction = None # vertices and bytes before and after rounding and simplifying, see SQLGeography.GeometryReducer
+        self.thinning = None # GPS points kept and dropped by thinning, see GPSThinning.PointThinner
+        self.surveyFilter = None # features kept and dropped as outside the survey, see SurveyFilter.FeatureFilter
+
+    # wraps a cursor, or any other iterable of records, timing and counting the records as they are read
+    def timedRows(self, cursor):
+        rows = iter(cursor)
+        while True:
+            started = time.time()
+            try:
+                row = next(rows)
+            except StopIteration:
+                self.readSeconds = self.readSeconds + time.time() - started
+                return
+            self.readSeconds = self.readSeconds + time.time() - started
+            self.rowsRead = self.rowsRead + 1
+            yield row
+
+    # wraps an output file so the writes are timed and counted
+    def timedFile(self, file):
+        return TimedFile(file, self)
+
+    def finish(self):
+        self.finished = time.time()
+
+    # returns: dictionary of the layer's timings and counts as they are written to the report
+    def summary(self):
+        wallSeconds = (self.finished or time.time()) - self.started
+        if self.finished is not None:
+            status = "succeeded"
+        else:
+            status = "failed"
+        return {
+            "layer": self.name,
+            "status": status,
+            "error": self.error,
+            "wallSeconds": round(wallSeconds, 3),
+            "readSeconds": round(self.readSeconds, 3),
+            "formatSeconds": round(max(0.0, wallSeconds - self.readSeconds - self.writeSeconds), 3),
+            "writeSeconds": round(self.writeSeconds, 3),
+            "rowsRead": self.rowsRead,
+            "rowsPerSecond": round(self.rowsRead / max(wallSeconds, 1e-6), 1),
+            "skippedNullGeometry": self.skippedNullGeometry,
+            "failedQueries": self.failedQueries,
+            "bytesWritten": self.bytesWritten,
+            "bytesPerSecond": round(self.bytesWritten / max(wallSeconds, 1e-6), 1),
+            "incremental": self.incremental,
+            "geometryReduction": self.geometryReduction,
+            "thinning": self.thinning,
+            "surveyFilter": self.surveyFilter,
+            }
+
+
+# class RunReport
+# accepts: tool, String, name of the script. reportfile, String, path of the JSON report to write. settings,
+# dictionary of the run's parameters worth recording, e.g. the input file and insert batch size
+# purpose: Collects the LayerTelemetry of each layer of a run and writes them out as the run report.  Call
+# startLayer() as each layer is started, finish() on the LayerTelemetry when it is done and write() at the end of
+# the run, whether it succeeded or not.
+class RunReport:
+    def __init__(self, tool, reportfile, settings):
+        self.tool = tool
+        self.reportfile = reportfile
+        self.settings = settings
+        self.started = time.time()
+        self.layers = [] # LayerTelemetry of the layers processed by this process
+        self.summaries = [] # summaries of the layers processed by other processes, see addSummaries
+        self.error = None
+        self.validation = None # features checked and problems found in each layer by a pre-flight validation, if any
+
+    def startLayer(self, name):
+        telemetry = LayerTelemetry(name)
+        self.layers.append(telemetry)
+        return telemetry
+
+    # add the summaries of layers processed by a worker process
+    def addSummaries(self, summaries):
+        self.summaries.extend(summaries)
+
+    # record why the run stopped, against the run and any layer that was left unfinished
+    def fail(self, error):
+        self.error = str(error)
+        for telemetry in self.layers:
+            if telemetry.finished is None and telemetry.error is None:
+                telemetry.error = self.error
+
+    def write(self):
+        layers = [telemetry.summary() for telemetry in self.layers] + self.summaries
+        totals = {}
+        for name in ["rowsRead", "skippedNullGeometry", "failedQueries", "bytesWritten"]:
+            totals[name] = sum([layer[name] for layer in layers])
+        totals["failedLayers"] = len([layer for layer in layers if layer["status"] != "succeeded"])
+        report = {
+            "tool": self.tool,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wallSeconds": round(time.time() - self.started, 3),
+            "user": getpass.getuser(),
+            "python": sys.version.split()[0],
+            "settings": self.settings,
+            "error": self.error,
+            "validation": self.validation,
+            "layers": layers,
+            "totals": totals,
+            }
+        reportstream = open(self.reportfile, "w")
+        json.dump(report, reportstream, indent = 1, sort_keys = True)
+        reportstream.close()
+        return self.reportfile
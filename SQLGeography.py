@@ -0,0 +1,329 @@
+# SQLGeography.py
+# Purpose: Geometry handling shared by the National Park Service Arctic and Central Alaska Networks Dall's sheep
+# monitoring program's SQL script generators.  Builds the T-SQL expressions that turn an arcpy geometry into a
+# Sql Server geography in the generated insert queries.
+
+# Geometries can be written either as Well-Known Text, geography::STGeomFromText('POLYGON ((...))', 4326), or as
+# hexadecimal Well-Known Binary, geography::STGeomFromWKB(0x0103000000..., 4326).  WKT writes every coordinate out as
+# decimal text which Sql Server then has to parse back into numbers; WKB writes the coordinates' 8 byte binary values
+# directly, which keeps the full precision, is quicker for Sql Server to read and makes the scripts noticeably smaller
+# for buffer polygons and long tracklog lines.
+
+import binascii
+import re
+import struct
+import sys
+
+# the geometry encodings that can be supplied by the user
+GeometryEncodings = ["WKT", "WKB"]
+
+
+# function GeometryEncoding
+# accepts: encoding, String, the geometry encoding supplied by the user, blank for the default WKT
+# returns: String, "WKT" or "WKB"
+# purpose: Checks the geometry encoding supplied by the user
+def GeometryEncoding(encoding):
+    encoding = encoding.strip().upper()
+    if encoding == "":
+        return "WKT"
+    if encoding not in GeometryEncodings:
+        sys.exit("ERROR: Unknown geometry encoding '" + encoding + "', use WKT or WKB")
+    return encoding
+
+
+# function CoordinatePrecision
+# accepts: precision, String, the number of decimal places supplied by the user, blank to keep full precision
+# returns: Integer, the number of decimal places to round WKT coordinates to, None for full precision
+# purpose: Checks the coordinate precision supplied by the user.  6 decimal places of a degree is about 10 cm on the
+# ground, well within the accuracy of the GPS units used on the surveys.
+def CoordinatePrecision(precision):
+    precision = precision.strip()
+    if precision == "":
+        return None
+    if not precision.isdigit() or int(precision) > 15:
+        sys.exit("ERROR: Coordinate precision '" + precision + "' must be a whole number of decimal places from 0 to 15")
+    return int(precision)
+
+
+# function SimplifyTolerance
+# accepts: tolerance, String, the simplification tolerance in meters supplied by the user, blank not to simplify
+# returns: Float, the tolerance in meters, 0 not to simplify
+def SimplifyTolerance(tolerance):
+    tolerance = tolerance.strip()
+    if tolerance == "":
+        return 0.0
+    try:
+        value = float(tolerance)
+    except ValueError:
+        value = -1.0
+    if not value >= 0: # also catches NaN
+        sys.exit("ERROR: Simplification tolerance '" + tolerance + "' must be a distance in meters of 0 or more")
+    return value
+
+
+# function HexString
+# accepts: data, bytes or bytearray
+# returns: String, the data as hexadecimal digits
+def HexString(data):
+    hexstring = binascii.hexlify(bytes(data))
+    if not isinstance(hexstring, str):
+        hexstring = hexstring.decode("ascii") # Python 3 returns bytes
+    return hexstring
+
+
+# function PointWKB
+# accepts: x, Float, longitude. y, Float, latitude
+# returns: bytes, little endian WKB of a two dimensional point
+# purpose: Points are encoded directly from their coordinates, dropping any Z value the GPS recorded, since
+# Sql Server only accepts two dimensional WKB
+def PointWKB(x, y):
+    return struct.pack("<bIdd", 1, 1, x, y)
+
+
+# function PointWKBHex
+# accepts: x, Float, longitude. y, Float, latitude
+# returns: String, hexadecimal little endian WKB of a two dimensional point, see PointWKB
+def PointWKBHex(x, y):
+    return HexString(PointWKB(x, y))
+
+
+# function PointWKT
+# accepts: x, Float, longitude. y, Float, latitude. z, Float, elevation, None (or NaN) if the point has none
+# returns: String, Well-Known Text of the point
+def PointWKT(x, y, z = None):
+    if z is None or z != z: # NaN is the only value that isn't equal to itself
+        return "POINT (" + repr(x) + " " + repr(y) + ")"
+    return "POINT (" + repr(x) + " " + repr(y) + " " + repr(z) + ")"
+
+
+# function GeographyFromXY
+# accepts: xy, tuple of the point's x and y as returned by the SHAPE@XY cursor token. z, Float, the point's z as returned
+# by the SHAPE@Z token, None if the layer has no z values. epsg, Integer, EPSG code of the spatial reference.
+# encoding, String, "WKT" or "WKB". textFunction, String, the geography function used for WKT
+# returns: String, a T-SQL expression creating the geography
+# purpose: The point fast path.  Reading a point layer's coordinates through the SHAPE@XY and SHAPE@Z tokens saves the
+# cursor building a full arcpy geometry object for every point, which is the slowest part of reading a point layer.
+# The point is written the same way GeographyFromShape writes a point geometry.
+def GeographyFromXY(xy, z, epsg, encoding, textFunction = "STGeomFromText"):
+    return "geography::" + GeographyFunction(encoding, textFunction) + "(" + GeographyLiteralFromXY(xy, z, encoding) + ", " + str(epsg) + ")"
+
+
+# function GeographyColumnFromXY
+# accepts: x, y, NumPy arrays of the points' x and y. z, NumPy array of the points' z, None if the layer has no z values.
+# epsg, encoding, textFunction, as for GeographyFromXY
+# returns: NumPy array of the T-SQL expressions creating the points, the same as GeographyFromXY gives for each point
+# purpose: The columnar mode's version of GeographyFromXY, builds the expressions for a whole layer of points at once
+def GeographyColumnFromXY(x, y, z, epsg, encoding, textFunction = "STGeomFromText"):
+    import numpy # only needed by the columnar mode
+    return numpy.char.add(numpy.char.add("geography::" + GeographyFunction(encoding, textFunction) + "(",
+        GeographyLiteralColumnFromXY(x, y, z, encoding)), ", " + str(epsg) + ")")
+
+
+# function GeographyLiteralColumnFromXY
+# accepts: x, y, z, encoding, as for GeographyColumnFromXY
+# returns: NumPy array of the points' literals, the same as GeographyLiteralFromXY gives for each point
+def GeographyLiteralColumnFromXY(x, y, z, encoding):
+    import numpy # only needed by the columnar mode
+    if encoding == "WKB":
+        points = numpy.empty((len(x), 2), dtype = "<f8")
+        points[:, 0] = x
+        points[:, 1] = y
+        # hex the whole array in one go then cut it into one 32 digit string per point
+        wkb = numpy.frombuffer(HexString(points.tobytes()).encode("ascii"), dtype = "S32")
+        if sys.version_info[0] >= 3:
+            wkb = wkb.astype(str)
+        return numpy.char.add("0x0101000000", wkb)
+    wkt = numpy.char.add(numpy.char.add(numpy.array([repr(value) for value in x.tolist()], dtype = str), " "),
+        numpy.array([repr(value) for value in y.tolist()], dtype = str))
+    if z is not None:
+        zwkt = numpy.char.add(" ", numpy.array([repr(value) for value in z.tolist()], dtype = str))
+        wkt = numpy.char.add(wkt, numpy.where(numpy.isnan(z), "", zwkt))
+    return numpy.char.add(numpy.char.add("'POINT (", wkt), ")'")
+
+
+# function GeographyFromShape
+# accepts: shape, arcpy geometry. epsg, Integer, EPSG code of the spatial reference. encoding, String, "WKT" or "WKB".
+# textFunction, String, the geography function used for WKT, e.g. STPointFromText for point columns
+# returns: String, a T-SQL expression creating the geography
+# reducer, GeometryReducer to round and simplify the geometry with, None to write it in full
+def GeographyFromShape(shape, epsg, encoding, textFunction = "STGeomFromText", reducer = None):
+    return "geography::" + GeographyFunction(encoding, textFunction) + "(" + GeographyLiteral(shape, encoding, reducer) + ", " + \
+        str(epsg) + ")"
+
+
+# Literals ------------------------------------------------------------------------------------------------------------
+# The geography expressions above are a geography function applied to the geometry's WKT, as a quoted string, or its
+# WKB, as a hexadecimal binary literal.  The staged merge scripts stage just the literals and apply the functions to
+# all of the staged records at once.
+
+# function GeographyFunction
+# accepts: encoding, String, "WKT" or "WKB". textFunction, String, the geography function used for WKT
+# returns: String, the geography function that builds a geography from the encoding's literal
+def GeographyFunction(encoding, textFunction = "STGeomFromText"):
+    if encoding == "WKB":
+        return "STGeomFromWKB"
+    return textFunction
+
+
+# function LiteralType
+# accepts: function, String, a geography function given by GeographyFunction
+# returns: String, the Sql Server type of the literals the function takes
+def LiteralType(function):
+    if function == "STGeomFromWKB":
+        return "varbinary(max)"
+    return "nvarchar(max)"
+
+
+# function GeographyLiteral
+# accepts: shape, arcpy geometry. encoding, String, "WKT" or "WKB". reducer, as for GeographyFromShape
+# returns: String, the geometry's WKT as a quoted T-SQL string or its WKB as a T-SQL binary literal
+def GeographyLiteral(shape, encoding, reducer = None):
+    if reducer is not None:
+        return reducer.literal(shape, encoding)
+    if encoding == "WKB":
+        if shape.type == "point":
+            return "0x" + PointWKBHex(shape.firstPoint.X, shape.firstPoint.Y)
+        return "0x" + HexString(shape.WKB)
+    return "'" + str(shape.WKT) + "'"
+
+
+# function GeographyLiteralFromXY
+# accepts: xy, z, encoding, as for GeographyFromXY
+# returns: String, the point's WKT as a quoted T-SQL string or its WKB as a T-SQL binary literal
+def GeographyLiteralFromXY(xy, z, encoding):
+    if encoding == "WKB":
+        return "0x" + PointWKBHex(xy[0], xy[1])
+    return "'" + PointWKT(xy[0], xy[1], z) + "'"
+
+
+# Query parameters ------------------------------------------------------------------------------------------------------------
+# The direct database load binds the geometries to parameterized insert queries instead of writing them into the SQL.
+
+# function GeographyPlaceholder
+# accepts: epsg, Integer, EPSG code of the spatial reference. encoding, String, "WKT" or "WKB". textFunction, String,
+# the geography function used for WKT
+# returns: String, a T-SQL expression creating a geography from a query parameter, bind ShapeParameter or XYParameter to it
+def GeographyPlaceholder(epsg, encoding, textFunction = "STGeomFromText"):
+    if encoding == "WKB":
+        return "geography::STGeomFromWKB(?, " + str(epsg) + ")"
+    return "geography::" + textFunction + "(?, " + str(epsg) + ")"
+
+
+# function ShapeParameter
+# accepts: shape, arcpy geometry. encoding, String, "WKT" or "WKB". reducer, as for GeographyFromShape
+# returns: the geometry's Well-Known Text as a String, or its Well-Known Binary as a bytearray, as GeographyFromShape writes it
+def ShapeParameter(shape, encoding, reducer = None):
+    if reducer is not None:
+        return reducer.parameter(shape, encoding)
+    if encoding == "WKB":
+        if shape.type == "point":
+            return bytearray(PointWKB(shape.firstPoint.X, shape.firstPoint.Y))
+        return bytearray(shape.WKB)
+    return str(shape.WKT)
+
+
+# function XYParameter
+# accepts: xy, z, as for GeographyFromXY. encoding, String, "WKT" or "WKB"
+# returns: the point's Well-Known Text as a String, or its Well-Known Binary as a bytearray, as GeographyFromXY writes it
+def XYParameter(xy, z, encoding):
+    if encoding == "WKB":
+        return bytearray(PointWKB(xy[0], xy[1]))
+    return PointWKT(xy[0], xy[1], z)
+
+
+# Reducing geometries ------------------------------------------------------------------------------------------------------------
+# arcpy writes every coordinate of a geometry's WKT with its full 15 or so significant digits, far beyond the accuracy
+# of the aerial GPS units, and keeps every vertex the GPS or buffering tool recorded.  Rounding the coordinates and
+# simplifying the lines and polygons can make the scripts of the buffer, flat area, unit and tracklog layers much
+# smaller and quicker for Sql Server to parse.
+
+# meters along a degree of latitude, the simplification tolerance is converted to degrees with it.  A degree of
+# longitude is shorter at the survey areas' latitudes so a shape is never moved further than the tolerance.
+MetersPerDegree = 111320.0
+
+# a number in Well-Known Text
+WKTNumber = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?")
+
+
+# function RoundWKT
+# accepts: wkt, String, Well-Known Text. precision, Integer, the number of decimal places to round the coordinates to
+# returns: String, the Well-Known Text with every coordinate rounded, without trailing zeros
+def RoundWKT(wkt, precision):
+    def rounded(match):
+        text = "%.*f" % (precision, float(match.group(0)))
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        if text == "-0":
+            text = "0"
+        return text
+    return WKTNumber.sub(rounded, wkt)
+
+
+# class GeometryReducer
+# accepts: precision, Integer, the number of decimal places to round WKT coordinates to, None for full precision.
+# tolerance, Float, the simplification tolerance in meters, 0 not to simplify
+# purpose: Rounds and simplifies the line and polygon geometries of one layer as they are written and counts how much
+# smaller they get, see counts.  Lines and polygons are simplified with arcpy's generalize, which keeps every vertex
+# that is further than the tolerance from the simplified shape.  The WKB encoding always takes 8 bytes a coordinate
+# so it is only made smaller by simplifying.  Points are written in full.
+class GeometryReducer:
+    def __init__(self, precision, tolerance):
+        self.precision = precision
+        self.tolerance = tolerance
+        self.counts = {"features": 0, "verticesBefore": 0, "verticesAfter": 0, "bytesBefore": 0, "bytesAfter": 0}
+
+    # returns: arcpy geometry, the shape simplified, or the shape itself if it is not to be simplified
+    def simplify(self, shape):
+        if self.tolerance > 0:
+            simplified = shape.generalize(self.tolerance / MetersPerDegree)
+            if simplified is not None and simplified.pointCount > 0:
+                return simplified
+        return shape
+
+    # returns: the reduced geometry's WKT as a String, or its WKB as a bytearray, counting the reduction
+    def reduce(self, shape, encoding, before):
+        reduced = self.simplify(shape)
+        if encoding == "WKB":
+            after = bytearray(reduced.WKB)
+        elif self.precision is None:
+            after = str(reduced.WKT)
+        else:
+            after = RoundWKT(str(reduced.WKT), self.precision)
+        self.counts["features"] = self.counts["features"] + 1
+        self.counts["verticesBefore"] = self.counts["verticesBefore"] + shape.pointCount
+        self.counts["verticesAfter"] = self.counts["verticesAfter"] + reduced.pointCount
+        self.counts["bytesBefore"] = self.counts["bytesBefore"] + len(before)
+        self.counts["bytesAfter"] = self.counts["bytesAfter"] + len(after)
+        return after
+
+    # returns: String, the shape's literal as GeographyLiteral writes it, reduced if it is a line or polygon
+    def literal(self, shape, encoding):
+        if shape.type not in ["polyline", "polygon"]:
+            return GeographyLiteral(shape, encoding)
+        if encoding == "WKB":
+            return "0x" + HexString(self.reduce(shape, encoding, shape.WKB))
+        return "'" + self.reduce(shape, encoding, str(shape.WKT)) + "'"
+
+    # returns: the shape's query parameter as ShapeParameter gives it, reduced if it is a line or polygon
+    def parameter(self, shape, encoding):
+        if shape.type not in ["polyline", "polygon"]:
+            return ShapeParameter(shape, encoding)
+        if encoding == "WKB":
+            return self.reduce(shape, encoding, shape.WKB)
+        return self.reduce(shape, encoding, str(shape.WKT))
+
+    # returns: String, a summary of the vertices and bytes saved, e.g. for arcpy.AddMessage
+    def message(self):
+        return "Geometry reduction: " + ReductionText(self.counts["verticesBefore"], self.counts["verticesAfter"], "vertices") + \
+            ", " + ReductionText(self.counts["bytesBefore"], self.counts["bytesAfter"], "bytes") + " of geometry in " + \
+            str(self.counts["features"]) + " features"
+
+
+# function ReductionText
+# accepts: before, after, Integer, counts. units, String, what was counted
+# returns: String, e.g. "1200 to 300 vertices (75.0% fewer)"
+def ReductionText(before, after, units):
+    text = str(before) + " to " + str(after) + " " + units
+    if before > 0:
+        text = text + " (" + str(round(100.0 * (before - after) / before, 1)) + "% fewer)"
+    return text
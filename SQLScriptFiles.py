@@ -0,0 +1,100 @@
+# SQLScriptFiles.py
+# Purpose: Output file handling shared by the National Park Service Arctic and Central Alaska Networks Dall's sheep
+# monitoring program's SQL script generators (NPSdotGDBtoSQLServer.py, WaypointsToSQL.py, TracklogToSQL.py and
+# OneOffScripts/BuffersToSqlServer.py).
+
+# The generated scripts are very repetitive text and compress extremely well.  The scripts can optionally be written
+# straight to a gzip (.sql.gz) or Zstandard (.sql.zst) compressed file; the text is compressed as it is written so the
+# uncompressed script never touches the disk.  Zstandard output needs the zstandard package (pip install zstandard),
+# gzip only needs the Python standard library.
+
+# Run from the command line this script streams a compressed script back out as plain text to standard output so it
+# can be piped straight into sqlcmd without decompressing it to disk first, e.g. from a Windows Power Shell prompt:
+# python SQLScriptFiles.py "C:\Your Script.sql.gz" | sqlcmd /S SERVER\INSTANCE
+
+import gzip
+import io
+import os
+import sys
+
+# file name suffix for each compression type
+CompressionSuffixes = {"": "", "GZIP": ".gz", "ZSTD": ".zst"}
+
+
+# function ScriptSuffix
+# accepts: compression, String, "" for plain text scripts, "GZIP" or "ZSTD"
+# returns: String, the file name suffix for scripts, e.g. '.sql.gz'
+# purpose: Checks the compression type supplied by the user and gives the suffix to put on the output file names
+def ScriptSuffix(compression):
+    compression = compression.strip().upper()
+    if compression not in CompressionSuffixes:
+        sys.exit("ERROR: Unknown compression '" + compression + "', use GZIP, ZSTD or leave blank for none")
+    return ".sql" + CompressionSuffixes[compression]
+
+
+# class ZstandardTextFile
+# accepts: name, String, path of the file. mode, String, "w" to write a new file or "a" to append to an existing one
+# purpose: A text file that is compressed with Zstandard as it is written.  Appending adds a new Zstandard frame to
+# the end of the file, which decompresses as though the text had been written all at once.
+class ZstandardTextFile:
+    def __init__(self, name, mode):
+        try:
+            import zstandard
+        except ImportError:
+            sys.exit("ERROR: Zstandard compressed output needs the zstandard package, install it with: pip install zstandard")
+        self.name = name
+        self.rawfile = open(name, mode + "b")
+        self.compressor = zstandard.ZstdCompressor().stream_writer(self.rawfile)
+
+    def write(self, text):
+        if not isinstance(text, bytes):
+            text = text.encode("utf-8")
+        self.compressor.write(text)
+
+    def close(self):
+        self.compressor.flush(1) # 1 is zstandard.FLUSH_FRAME, ends the frame
+        self.rawfile.close()
+
+
+# function OpenOutputFile
+# accepts: name, String, path of the file. mode, String, "w" to write a new file or "a" to append to an existing one
+# returns: an open file with a write(text) and close() method
+# purpose: Opens a generated SQL script for writing.  Names ending in .gz or .zst are compressed as they are written.
+def OpenOutputFile(name, mode):
+    if name.endswith(".gz"):
+        if sys.version_info[0] >= 3:
+            return gzip.open(name, mode + "t", encoding = "utf-8")
+        return gzip.open(name, mode + "b")
+    if name.endswith(".zst"):
+        return ZstandardTextFile(name, mode)
+    return open(name, mode)
+
+
+# function StreamToStdout
+# accepts: name, String, path of a .sql, .sql.gz or .sql.zst script
+# purpose: Writes the decompressed script to standard output a block at a time so it can be piped into sqlcmd
+def StreamToStdout(name):
+    if sys.platform == "win32":
+        import msvcrt
+        msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY) # don't let Windows double up the line endings
+    output = getattr(sys.stdout, "buffer", sys.stdout)
+    if name.endswith(".gz"):
+        source = gzip.open(name, "rb")
+    elif name.endswith(".zst"):
+        import zstandard
+        source = zstandard.ZstdDecompressor().stream_reader(open(name, "rb"), read_across_frames = True)
+    else:
+        source = io.open(name, "rb")
+    while True:
+        block = source.read(1024 * 1024)
+        if not block:
+            break
+        output.write(block)
+    source.close()
+    output.flush()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python SQLScriptFiles.py <script.sql.gz or script.sql.zst> | sqlcmd /S SERVER\\INSTANCE")
+    StreamToStdout(sys.argv[1])
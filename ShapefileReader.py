@@ -0,0 +1,562 @@
+# ShapefileReader.py
+# Purpose: Reads ESRI shapefiles without ArcGIS for the National Park Service Arctic and Central Alaska Networks Dall's
+# sheep monitoring program's shapefile tools, WaypointsToSQL.py, TracklogToSQL.py, OneOffScripts/BuffersToSqlServer.py
+# and the OneOffScripts legacy unit importers.
+
+# The tools only read plain .shp/.shx/.dbf files, yet importing arcpy starts a whole ArcGIS session, which takes longer
+# than converting most shapefiles and can't be done at all on the Linux machines batch conversions are run on.  This
+# module stands in for the few parts of arcpy the tools use, the toolbox parameters and messages, ListFields, Describe,
+# SpatialReference and da.SearchCursor, and returns the same rows and geometries arcpy does.  Each tool gets its arcpy
+# from Backend(), which chooses between the two.  Without ArcGIS the toolbox parameters are the script's command line
+# arguments, in order, and the messages are printed.
+
+# The .shp, .shx and .dbf files are memory mapped and each record is decoded straight out of the mapped files as it is
+# read, so a shapefile is never read into memory as a whole and the operating system only pages in the parts that are
+# used.  The .shx index holds the offset of every geometry in the .shp, so any record can be read on its own, see
+# Shapefile.shape and Shapefile.record, and a point's coordinates are read without building a geometry at all.
+
+# What the reader doesn't do that arcpy does:
+# it can't project, the shapefile must be in WGS84, or have no .prj, to be read with a WGS84 spatial reference.
+# it doesn't take where clauses.
+# geometries are 2D, the Z of a point can be read with the SHAPE@Z token but Z values aren't written into the WKT or WKB.
+# the SHAPE@XY of a line or polygon is the centre of its extent rather than its centroid.
+
+import codecs
+import datetime
+import mmap
+import os
+import struct
+import sys
+import RingGeometry
+
+# names of the shape types by the shapefile's shape type code, less the 10 or 20 added for Z and M values
+ShapeTypes = {1: "point", 3: "polyline", 5: "polygon", 8: "multipoint"}
+
+# the text encoding of the .dbf if there is no .cpg saying otherwise, ArcGIS writes the Windows code page
+DefaultEncoding = "cp1252"
+
+
+# function Backend
+# returns: the module the tools use as arcpy, chosen by the SHEEP_SHAPEFILE_READER environment variable: "arcpy" for
+# ESRI's arcpy, "native" for this module, or blank for arcpy if it is installed and this module if it isn't.  An
+# environment variable is used because the choice has to be made before arcpy, which reads the toolbox parameters, is
+# imported.
+def Backend():
+    reader = os.environ.get("SHEEP_SHAPEFILE_READER", "").strip().lower()
+    if reader not in ["", "arcpy", "native"]:
+        sys.exit("ERROR: SHEEP_SHAPEFILE_READER '" + reader + "' must be arcpy, native or blank")
+    if reader != "native":
+        try:
+            import arcpy
+            return arcpy
+        except ImportError:
+            if reader == "arcpy":
+                raise
+    return sys.modules[__name__]
+
+
+# toolbox parameters and messages ------------------------------------------------------------------------------------------
+# function GetParameterAsText
+# accepts: index, Integer, the position of the toolbox parameter
+# returns: String, the script's command line argument in that position, blank if it wasn't given or is #, which is
+# how arcpy's command line leaves an optional parameter out
+def GetParameterAsText(index):
+    if index + 1 < len(sys.argv) and sys.argv[index + 1] != "#":
+        return sys.argv[index + 1]
+    return ""
+
+
+# function GetArgumentCount
+# returns: Integer, the number of command line arguments the script was given, see ToolParameters.py
+def GetArgumentCount():
+    return len(sys.argv) - 1
+
+
+def AddMessage(message):
+    sys.stdout.write(str(message) + "\n")
+
+
+def AddWarning(message):
+    AddMessage("WARNING: " + str(message))
+
+
+def AddError(message):
+    AddMessage("ERROR: " + str(message))
+
+
+# geometry ------------------------------------------------------------------------------------------------------------
+class SpatialReference:
+    def __init__(self, factoryCode):
+        self.factoryCode = factoryCode
+        self.name = "GCS_WGS_1984" if factoryCode == 4326 else ""
+
+
+class Point:
+    def __init__(self, X, Y, Z = None):
+        self.X = X
+        self.Y = Y
+        self.Z = Z
+
+
+# function DouglasPeucker
+# accepts: points, list of (x, y) tuples. tolerance, Float, in the units of the coordinates
+# returns: list of the points that are kept, every point further than the tolerance from the simplified line and the
+# first and last points
+def DouglasPeucker(points, tolerance):
+    kept = [False] * len(points)
+    kept[0] = kept[-1] = True
+    spans = [(0, len(points) - 1)]
+    while spans:
+        first, last = spans.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        length = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+        furthest, distance = None, tolerance
+        for index in range(first + 1, last):
+            x, y = points[index]
+            if length == 0:
+                offset = ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+            else:
+                offset = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+            if offset > distance:
+                furthest, distance = index, offset
+        if furthest is not None:
+            kept[furthest] = True
+            spans.extend([(first, furthest), (furthest, last)])
+    return [point for point, keep in zip(points, kept) if keep]
+
+
+# function CoordinatesWKT
+# accepts: points, list of (x, y) tuples
+# returns: String, the coordinates as Well-Known Text, e.g. "-150.1 67.2, -150.2 67.3"
+def CoordinatesWKT(points):
+    return ", ".join([repr(x) + " " + repr(y) for x, y in points])
+
+
+# function CoordinatesWKB
+# accepts: points, list of (x, y) tuples
+# returns: bytes, the number of points and their coordinates as little endian Well-Known Binary
+def CoordinatesWKB(points):
+    coordinates = [coordinate for point in points for coordinate in point]
+    return struct.pack("<I%dd" % len(coordinates), len(points), *coordinates)
+
+
+# class Geometry
+# accepts: shapeType, String, "point", "multipoint", "polyline" or "polygon". parts, list of the geometry's parts, each
+# a list of (x, y) tuples: the point of a point, the points of a multipoint, the lines of a polyline or the rings of a
+# polygon.  z, Float, the Z of a point, None if it has none
+# purpose: The properties and methods of an arcpy geometry the tools use.  The WKT and WKB are built when they are
+# asked for, as multi geometries like arcpy writes them, with the rings running the way they are stored.  A shapefile
+# polygon is a list of rings, outer rings running clockwise and holes counter-clockwise, which are grouped into the
+# polygons of a MULTIPOLYGON, see polygons().
+class Geometry(object):
+    def __init__(self, shapeType, parts, z = None):
+        self.type = shapeType
+        self.parts = parts
+        self.partCount = len(parts)
+        self.pointCount = sum([len(part) for part in parts])
+        self.firstPoint = Point(parts[0][0][0], parts[0][0][1], z)
+        self.lastPoint = Point(parts[-1][-1][0], parts[-1][-1][1], z)
+
+    # returns: list of the polygon's polygons, each a list of its outer ring followed by its holes.  A hole goes with the
+    # outer ring that contains it, a ring running the wrong way that isn't inside an outer ring is a polygon of its own.
+    def polygons(self):
+        polygons = []
+        for ring in self.parts:
+            if RingGeometry.RingArea(ring) > 0: # counter-clockwise, a hole
+                outer = [polygon for polygon in polygons if RingGeometry.RingsContain([polygon[0]], ring[0][0], ring[0][1])]
+                if len(outer) > 0:
+                    outer[0].append(ring)
+                    continue
+            polygons.append([ring])
+        return polygons
+
+    @property
+    def WKT(self):
+        if self.type == "point":
+            return "POINT (" + CoordinatesWKT(self.parts[0]) + ")"
+        if self.type == "multipoint":
+            return "MULTIPOINT (" + ", ".join(["(" + CoordinatesWKT([point]) + ")" for point in self.parts[0]]) + ")"
+        if self.type == "polyline":
+            return "MULTILINESTRING (" + ", ".join(["(" + CoordinatesWKT(line) + ")" for line in self.parts]) + ")"
+        return "MULTIPOLYGON (" + ", ".join(["(" + ", ".join(["(" + CoordinatesWKT(ring) + ")" for ring in polygon]) + ")"
+            for polygon in self.polygons()]) + ")"
+
+    @property
+    def WKB(self):
+        if self.type == "point":
+            return bytearray(struct.pack("<bIdd", 1, 1, self.firstPoint.X, self.firstPoint.Y))
+        if self.type == "multipoint":
+            members = [struct.pack("<bIdd", 1, 1, x, y) for x, y in self.parts[0]]
+            return bytearray(struct.pack("<bII", 1, 4, len(members)) + b"".join(members))
+        if self.type == "polyline":
+            members = [struct.pack("<bI", 1, 2) + CoordinatesWKB(line) for line in self.parts]
+            return bytearray(struct.pack("<bII", 1, 5, len(members)) + b"".join(members))
+        members = [struct.pack("<bII", 1, 3, len(polygon)) + b"".join([CoordinatesWKB(ring) for ring in polygon])
+            for polygon in self.polygons()]
+        return bytearray(struct.pack("<bII", 1, 6, len(members)) + b"".join(members))
+
+    # the geometry's parts, each a list of its points, as iterating over an arcpy geometry returns them.  A polygon
+    # part is its outer ring followed by its holes, each hole after a None.
+    def __iter__(self):
+        if self.type != "polygon":
+            return iter([[Point(x, y) for x, y in part] for part in self.parts])
+        parts = []
+        for polygon in self.polygons():
+            part = []
+            for ring in polygon:
+                if len(part) > 0:
+                    part.append(None)
+                part.extend([Point(x, y) for x, y in ring])
+            parts.append(part)
+        return iter(parts)
+
+    # Douglas-Peucker simplification of each line and ring, keeping every vertex further than max_offset from the
+    # simplified shape.  A ring that would be left with fewer than 4 vertices is kept as it is.
+    def generalize(self, max_offset):
+        if self.type in ["point", "multipoint"]:
+            return self
+        parts = []
+        for part in self.parts:
+            simplified = DouglasPeucker(part, max_offset)
+            if self.type == "polygon" and len(simplified) < 4:
+                simplified = part
+            parts.append(simplified)
+        return Geometry(self.type, parts)
+
+
+# describing shapefiles ------------------------------------------------------------------------------------------------------------
+class Field:
+    def __init__(self, name, fieldType, length, decimals = 0):
+        self.name = name
+        self.type = fieldType
+        self.length = length
+        self.precision = length
+        self.scale = decimals
+        self.aliasName = name
+
+
+# class Description
+# accepts: shapefile, an open Shapefile
+# purpose: The properties of arcpy.Describe's description of a shapefile the tools use
+class Description:
+    def __init__(self, shapefile):
+        self.dataType = "ShapeFile"
+        self.shapeType = shapefile.shapeType.capitalize().replace("point", "Point")
+        self.hasZ = shapefile.hasZ
+        self.hasM = shapefile.hasM
+        self.fields = shapefile.fields
+        self.spatialReference = SpatialReference(4326 if shapefile.isWGS84() else 0)
+
+
+def Exists(path):
+    return os.path.isfile(os.path.splitext(path)[0] + ".shp")
+
+
+def Describe(path):
+    shapefile = Shapefile(path)
+    try:
+        return Description(shapefile)
+    finally:
+        shapefile.close()
+
+
+def ListFields(path):
+    return Describe(path).fields
+
+
+def AddFieldDelimiters(path, field):
+    return field
+
+
+# reading shapefiles ------------------------------------------------------------------------------------------------------------
+# function MappedFile
+# accepts: path, String, path of a file
+# returns: tuple of the open file and a read only memory map of the whole of it
+def MappedFile(path):
+    mappedfile = open(path, "rb")
+    try:
+        return (mappedfile, mmap.mmap(mappedfile.fileno(), 0, access = mmap.ACCESS_READ))
+    except (ValueError, EnvironmentError):
+        mappedfile.close()
+        raise IOError(path + " is empty or can't be read")
+
+
+# function PartPath
+# accepts: base, String, path of a shapefile without its extension. extension, String, e.g. ".dbf"
+# returns: String, the path of the shapefile's file with the extension, in upper case if that is how it was written
+def PartPath(base, extension):
+    if not os.path.exists(base + extension) and os.path.exists(base + extension.upper()):
+        return base + extension.upper()
+    return base + extension
+
+
+# function CodePage
+# accepts: base, String, path of a shapefile without its extension
+# returns: String, the Python codec of the .dbf's text, from the .cpg, e.g. UTF-8 or 1252, if there is one
+def CodePage(base):
+    path = PartPath(base, ".cpg")
+    if not os.path.exists(path):
+        return DefaultEncoding
+    cpgfile = open(path)
+    text = cpgfile.read().strip()
+    cpgfile.close()
+    for encoding in [text, "cp" + (text.split() or [""])[-1]]:
+        try:
+            codecs.lookup(encoding)
+            return encoding
+        except LookupError:
+            continue
+    return DefaultEncoding
+
+
+# function FieldValue
+# accepts: field, Field of the .dbf. encoding, String, the codec of the .dbf's text
+# returns: function taking a field's bytes from a .dbf record and returning its value as arcpy gives it: text for
+# character fields, an Integer or Float for numbers, a datetime for dates.  A blank number or date is None.
+def FieldValue(field, encoding):
+    if field.type in ["SmallInteger", "Integer", "Double"]:
+        number = int if field.type != "Double" else float
+        def value(data):
+            text = data.strip(b" \x00")
+            if len(text) == 0 or text[:1] == b"*":
+                return None
+            try:
+                return number(text)
+            except ValueError:
+                return number(float(text))
+        return value
+    if field.type == "Date":
+        def value(data):
+            text = data.strip(b" \x00")
+            if len(text) != 8 or text == b"00000000":
+                return None
+            return datetime.datetime(int(text[:4]), int(text[4:6]), int(text[6:]))
+        return value
+    return lambda data: data.rstrip(b" \x00").decode(encoding, "replace")
+
+
+# class Shapefile
+# accepts: path, String, path of the .shp
+# purpose: Reads the records of a shapefile from its memory mapped .shp, .shx and .dbf, see the notes at the top.
+# Records are numbered from 0, as the FID of a shapefile is.  close() the shapefile once it has been read.
+class Shapefile:
+    def __init__(self, path):
+        self.path = path
+        base = os.path.splitext(path)[0]
+        if not os.path.isfile(PartPath(base, ".shp")):
+            raise IOError("ERROR 000732: Dataset " + str(path) + " does not exist or is not supported")
+        self.base = base
+        self.files = []
+        self.open()
+
+        # the .shp header, big endian file code and length then little endian shape type
+        code = struct.unpack_from("<i", self.shp, 32)[0]
+        if code % 10 not in [0] + list(ShapeTypes.keys()) or code > 30:
+            self.close()
+            raise IOError(path + " has shape type " + str(code) + ", which can't be read without arcpy")
+        self.shapeType = ShapeTypes.get(code % 10, "null")
+        self.hasZ = 10 < code < 20
+        self.hasM = code > 10
+
+        # the .dbf header and field descriptors, which end at a carriage return
+        self.count, self.headerLength, self.recordLength = struct.unpack_from("<IHH", self.dbf, 4)
+        self.count = min(self.count, (len(self.shx) - 100) // 8)
+        encoding = CodePage(base)
+        self.fields = [Field("FID", "OID", 4), Field("Shape", "Geometry", 0)]
+        self.columns = {} # field name in upper case: (position in the record, see recordData, function reading its value)
+        layout = "<c" # the deleted flag then each field's text
+        descriptor = 32
+        while descriptor < self.headerLength - 1 and self.dbf[descriptor:descriptor + 1] != b"\r":
+            name = self.dbf[descriptor:descriptor + 11].split(b"\x00")[0].decode("ascii", "replace")
+            dbftype = self.dbf[descriptor + 11:descriptor + 12].decode("ascii", "replace").upper()
+            length, decimals = struct.unpack_from("<BB", self.dbf, descriptor + 16)
+            if dbftype == "N" and decimals == 0 and length <= 4:
+                fieldType = "SmallInteger"
+            elif dbftype == "N" and decimals == 0 and length <= 9:
+                fieldType = "Integer"
+            elif dbftype in ["N", "F"]:
+                fieldType = "Double"
+            elif dbftype == "D":
+                fieldType = "Date"
+            else:
+                fieldType = "String"
+            field = Field(name, fieldType, length, decimals)
+            self.fields.append(field)
+            self.columns[name.upper()] = (len(self.fields) - 2, FieldValue(field, encoding))
+            layout = layout + str(length) + "s"
+            descriptor = descriptor + 32
+        self.recordStruct = struct.Struct(layout)
+
+    # maps the .shp, .shx and .dbf, again if the shapefile has been closed
+    def open(self):
+        if len(self.files) > 0:
+            return
+        for extension in [".shp", ".shx", ".dbf"]:
+            mappedfile, mapped = MappedFile(PartPath(self.base, extension))
+            self.files.append((mappedfile, mapped))
+            setattr(self, extension[1:], mapped)
+
+    def close(self):
+        for mappedfile, mapped in self.files:
+            mapped.close()
+            mappedfile.close()
+        self.files = []
+
+    # returns: Boolean, whether the shapefile's .prj is WGS84 longitudes and latitudes, or it has no .prj
+    def isWGS84(self):
+        path = PartPath(self.base, ".prj")
+        if not os.path.exists(path):
+            return True
+        prjfile = open(path)
+        prj = prjfile.read().upper()
+        prjfile.close()
+        return prj.startswith("GEOGCS") and ("WGS_1984" in prj or "WGS 84" in prj or "WGS84" in prj)
+
+    # returns: tuple of bytes, the record's deleted flag, which is * if it was deleted, followed by the text of each of
+    # its .dbf fields, split straight out of the mapped .dbf.  A deleted record is left out of a search.
+    def recordData(self, index):
+        return self.recordStruct.unpack_from(self.dbf, self.headerLength + index * self.recordLength)
+
+    # returns: Integer, where the record's geometry starts in the .shp, taken from the .shx
+    def offset(self, index):
+        return struct.unpack_from(">i", self.shx, 100 + 8 * index)[0] * 2 + 8 # the offset is in 16 bit words
+
+    # returns: the value of the record's field, see FieldValue
+    def value(self, index, name):
+        position, value = self.reader(name)
+        if position is None:
+            return value(index)
+        return value(self.recordData(index)[position])
+
+    # returns: list of the values of the record's fields, in the order of the .dbf
+    def record(self, index):
+        data = self.recordData(index)
+        return [self.columns[field.name.upper()][1](data[position]) for position, field in enumerate(self.fields[2:], 1)]
+
+    # returns: tuple (x, y) of a point, or of the centre of the extent of any other geometry, (None, None) if it is null
+    def xy(self, index):
+        offset = self.offset(index)
+        code = struct.unpack_from("<i", self.shp, offset)[0]
+        if code % 10 == 1:
+            return struct.unpack_from("<dd", self.shp, offset + 4)
+        if code == 0:
+            return (None, None)
+        west, south, east, north = struct.unpack_from("<4d", self.shp, offset + 4)
+        return ((west + east) / 2.0, (south + north) / 2.0)
+
+    # returns: Float, the Z of a point, None if the shapefile has no Z values or the point is null
+    def z(self, index):
+        offset = self.offset(index)
+        code = struct.unpack_from("<i", self.shp, offset)[0]
+        if code == 11:
+            return struct.unpack_from("<d", self.shp, offset + 20)[0]
+        return None
+
+    # returns: Geometry of the record, None if it is null
+    def shape(self, index):
+        offset = self.offset(index)
+        code = struct.unpack_from("<i", self.shp, offset)[0]
+        if code == 0:
+            return None
+        if code % 10 == 1:
+            return Geometry("point", [[struct.unpack_from("<dd", self.shp, offset + 4)]], self.z(index))
+        if code % 10 == 8:
+            count = struct.unpack_from("<i", self.shp, offset + 36)[0]
+            if count == 0:
+                return None
+            coordinates = struct.unpack_from("<%dd" % (2 * count), self.shp, offset + 40)
+            return Geometry("multipoint", [list(zip(coordinates[0::2], coordinates[1::2]))])
+        partCount, pointCount = struct.unpack_from("<ii", self.shp, offset + 36)
+        if pointCount == 0:
+            return None
+        starts = struct.unpack_from("<%di" % partCount, self.shp, offset + 44) + (pointCount,)
+        coordinates = struct.unpack_from("<%dd" % (2 * pointCount), self.shp, offset + 44 + 4 * partCount)
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        return Geometry(ShapeTypes[code % 10], [points[starts[part]:starts[part + 1]] for part in range(partCount)])
+
+    # the record's shape as Well-Known Text or Binary, attribute is "WKT" or "WKB", None for a null shape.  The shape
+    # is only decoded once.
+    def encodedShape(self, index, attribute):
+        shape = self.shape(index)
+        return None if shape is None else getattr(shape, attribute)
+
+    # returns: tuple of where the value arcpy's cursor gives for the field or token comes from and a function reading it.
+    # For a .dbf field the position of its text in the record's recordData, which is read once for all of a row's
+    # fields, and a function taking the text, see FieldValue.  For the geometry and the FID None and a function taking
+    # the record number.
+    def reader(self, field):
+        token = field.upper()
+        if token in ["SHAPE@XY", "SHAPE"]: # like arcpy, the shape field itself gives the centroid
+            return (None, self.xy)
+        if token == "SHAPE@":
+            return (None, self.shape)
+        if token in ["SHAPE@X", "SHAPE@Y"]:
+            axis = ["SHAPE@X", "SHAPE@Y"].index(token)
+            return (None, lambda index: self.xy(index)[axis])
+        if token == "SHAPE@Z":
+            return (None, self.z)
+        if token in ["SHAPE@WKT", "SHAPE@WKB"]:
+            attribute = token[6:]
+            return (None, lambda index: self.encodedShape(index, attribute))
+        if token in ["OID@", "FID"]:
+            return (None, lambda index: index)
+        if token not in self.columns:
+            raise RuntimeError("Cannot find field '" + field + "'")
+        return self.columns[token]
+
+
+# class SearchCursor
+# purpose: arcpy.da.SearchCursor over a shapefile.  Only the requested columns are returned, as tuples, in the
+# requested order, and deleted records are skipped.  The shapefile is closed when the cursor has been read to the end
+# or is left, like an arcpy cursor, in a with statement.
+class SearchCursor:
+    def __init__(self, in_table, field_names, where_clause = None, spatial_reference = None, explode_to_points = False,
+            sql_clause = (None, None)):
+        if where_clause:
+            raise RuntimeError("The shapefile reader can't apply the where clause " + where_clause + " to " + in_table + \
+                ", read it with arcpy")
+        self.shapefile = Shapefile(in_table)
+        if spatial_reference is not None and (spatial_reference.factoryCode != 4326 or not self.shapefile.isWGS84()):
+            self.shapefile.close()
+            raise RuntimeError(in_table + " can't be projected by the shapefile reader, it must be in WGS84 or be read with arcpy")
+        if field_names == "*":
+            field_names = [field.name for field in self.shapefile.fields]
+        elif isinstance(field_names, str):
+            field_names = [field_names]
+        self.fields = tuple(field_names)
+        self.readers = [self.shapefile.reader(field) for field in field_names]
+        self.reset()
+
+    def reset(self):
+        self.shapefile.open()
+        self.position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self.position < self.shapefile.count:
+            index = self.position
+            self.position = self.position + 1
+            data = self.shapefile.recordData(index)
+            if data[0] != b"*":
+                return tuple([value(index) if position is None else value(data[position]) for position, value in self.readers])
+        self.shapefile.close()
+        raise StopIteration
+
+    next = __next__ # Python 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.shapefile.close()
+        return False
+
+
+# arcpy.da
+class DataAccess:
+    pass
+
+da = DataAccess()
+da.SearchCursor = SearchCursor
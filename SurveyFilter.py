@@ -0,0 +1,186 @@
+# SurveyFilter.py
+# Purpose: Drops the features recorded outside a survey, e.g. on ferry flights to and from the survey area or while
+# testing the equipment, before they are exported.  Shared by the National Park Service Arctic and Central Alaska
+# Networks Dall's sheep monitoring program's SQL script generators.
+
+# A feature can be checked against the survey's area, either its buffer polygons (Buffer_Final), a bounding box, or
+# both, and against the dates the survey was flown.  A point is in the survey's area if it is inside one of the buffer
+# polygons and a line if any of its vertices is.  The buffer polygons are put into a grid index when the filter is
+# made: each grid cell lists the polygons whose extent overlaps it, so a point is only checked against the few polygons
+# in its own cell instead of every polygon of the survey, and a point in an empty cell is dropped straight away.
+# Features without a geometry or a readable date are not dropped by this filter, the generators deal with them.
+
+import datetime
+import sys
+import RingGeometry
+
+# the formats the survey dates supplied by the user and the layers' DATE_ columns have been seen in
+DateFormats = ["%m/%d/%Y", "%Y-%m-%d", "%Y/%m/%d"]
+
+
+# function SurveyExtent
+# accepts: extent, String, the survey's bounding box supplied by the user as the decimal degrees
+# "west south east north", blank not to filter by a bounding box
+# returns: tuple (west, south, east, north) of Floats, None not to filter by a bounding box
+def SurveyExtent(extent):
+    extent = extent.replace(",", " ").split()
+    if len(extent) == 0:
+        return None
+    try:
+        west, south, east, north = [float(value) for value in extent]
+    except ValueError:
+        west = south = east = north = None
+    if west is None or not (west <= east and south <= north):
+        sys.exit("ERROR: Survey extent '" + " ".join(extent) + "' must be four decimal degrees, west south east north")
+    return (west, south, east, north)
+
+
+# function SurveyDates
+# accepts: dates, String, the first and last days of the survey supplied by the user, e.g. "6/1/2014 6/30/2014", blank
+# not to filter by date
+# returns: tuple of the first and last datetime.date, None not to filter by date
+def SurveyDates(dates):
+    dates = dates.replace(",", " ").split()
+    if len(dates) == 0:
+        return None
+    if len(dates) == 2:
+        first, last = FeatureDate(dates[0]), FeatureDate(dates[1])
+    else:
+        first = last = None
+    if first is None or last is None or last < first:
+        sys.exit("ERROR: Survey dates '" + " ".join(dates) + "' must be the first and last days of the survey, e.g. 6/1/2014 6/30/2014")
+    return (first, last)
+
+
+# function FeatureDate
+# accepts: value, the DATE_ of a feature, text or a date
+# returns: datetime.date, None if the date can't be read
+def FeatureDate(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = str(value).strip().split(" ")[0] # some layers have the time of day after the date
+    for dateformat in DateFormats:
+        try:
+            return datetime.datetime.strptime(value, dateformat).date()
+        except ValueError:
+            continue
+    return None
+
+
+# function PolygonRings
+# accepts: shape, arcpy polygon geometry
+# returns: list of rings, each a list of (x, y) tuples.  The holes of the polygon are rings too, a point is inside the
+# polygon if it is inside an odd number of its rings.
+def PolygonRings(shape):
+    rings = []
+    for part in shape:
+        ring = []
+        for point in part:
+            if point is None: # the start of a hole
+                rings.append(ring)
+                ring = []
+            else:
+                ring.append((point.X, point.Y))
+        rings.append(ring)
+    return [ring for ring in rings if len(ring) > 2]
+
+
+# function LineVertices
+# accepts: shape, arcpy polyline geometry
+# returns: generator of the (x, y) of the line's vertices, read as they are needed
+def LineVertices(shape):
+    for part in shape:
+        for point in part:
+            if point is not None:
+                yield (point.X, point.Y)
+
+
+# class PolygonIndex
+# accepts: polygons, list of polygons, each a list of rings, see PolygonRings
+# purpose: Finds whether a point is inside any of the polygons without checking them all, see the notes at the top.
+# The grid cells are the size of a typical polygon's extent so each polygon is listed in only a few cells.
+class PolygonIndex:
+    def __init__(self, polygons):
+        self.polygons = []
+        for rings in polygons:
+            xs = [x for ring in rings for x, y in ring]
+            ys = [y for ring in rings for x, y in ring]
+            if len(xs) > 0:
+                self.polygons.append(((min(xs), min(ys), max(xs), max(ys)), rings))
+        sizes = sorted([max(east - west, north - south) for (west, south, east, north), rings in self.polygons])
+        self.cellSize = 1.0 # degrees
+        if len(sizes) > 0 and sizes[len(sizes) // 2] > 0:
+            self.cellSize = sizes[len(sizes) // 2]
+        self.cells = {} # (column, row): list of the polygons overlapping the cell
+        for polygon in self.polygons:
+            west, south, east, north = polygon[0]
+            for column in range(self.cell(west), self.cell(east) + 1):
+                for row in range(self.cell(south), self.cell(north) + 1):
+                    self.cells.setdefault((column, row), []).append(polygon)
+
+    def cell(self, coordinate):
+        return int(coordinate // self.cellSize)
+
+    # returns: Boolean, whether the point is inside any of the polygons
+    def contains(self, x, y):
+        for (west, south, east, north), rings in self.cells.get((self.cell(x), self.cell(y)), []):
+            if west <= x <= east and south <= y <= north and RingGeometry.RingsContain(rings, x, y):
+                return True
+        return False
+
+
+# class FeatureFilter
+# accepts: index, PolygonIndex of the survey's buffer polygons. extent, tuple, see SurveyExtent. dates, tuple, see
+# SurveyDates.  None for any of them not to filter that way
+# purpose: Filters a layer's features as they are read, see filter(), and counts how many were kept and dropped.
+class FeatureFilter:
+    def __init__(self, index, extent, dates):
+        self.index = index
+        self.extent = extent
+        self.dates = dates
+        self.counts = {"read": 0, "kept": 0, "outsideArea": 0, "outsideDates": 0}
+
+    # accepts: rows, iterable of the layer's records, e.g. a cursor. location, function taking a record and returning
+    # its (points, date), points a list of the (x, y) of a point or of a line's vertices, None if the record has no
+    # geometry, and date its DATE_, None if the layer has no dates. setAside, function called with each record dropped,
+    # None to just drop them
+    # returns: generator of the records that are kept, in the order they were read
+    def filter(self, rows, location, setAside = None):
+        for row in rows:
+            self.counts["read"] = self.counts["read"] + 1
+            points, date = location(row)
+            reason = None
+            if self.dates is not None:
+                date = FeatureDate(date)
+                if date is not None and not self.dates[0] <= date <= self.dates[1]:
+                    reason = "outsideDates"
+            if reason is None and points is not None and not self.inArea(points):
+                reason = "outsideArea"
+            if reason is None:
+                self.counts["kept"] = self.counts["kept"] + 1
+                yield row
+                continue
+            self.counts[reason] = self.counts[reason] + 1
+            if setAside is not None:
+                setAside(row)
+
+    # returns: Boolean, whether any of the points is in the survey's area
+    def inArea(self, points):
+        for x, y in points:
+            if x is None or y is None:
+                continue
+            if self.extent is not None and not (self.extent[0] <= x <= self.extent[2] and self.extent[1] <= y <= self.extent[3]):
+                continue
+            if self.index is None or self.index.contains(x, y):
+                return True
+        return False
+
+    # returns: String, a summary of the features kept and dropped, e.g. for arcpy.AddMessage
+    def message(self):
+        counts = self.counts
+        return "Survey filter: " + str(counts["kept"]) + " of " + str(counts["read"]) + " features kept, dropped " + \
+            str(counts["outsideArea"]) + " outside the survey area and " + str(counts["outsideDates"]) + " outside the survey dates"
@@ -0,0 +1,18 @@
+# ToolParameters.py
+# Purpose: Reads the optional parameters of the National Park Service Arctic and Central Alaska Networks Dall's sheep
+# monitoring program's toolbox scripts.
+
+# The tools in ARCN Sheep Data Management Tools.tbx declare only the parameters the scripts were first written with.
+# The optional parameters added since are read after them, in the order listed in README.md, and can be set either by
+# adding them to the tool in ArcCatalog (right click the tool, Properties, Parameters, as Optional parameters in that
+# order), or by running the script from the command line with the parameters in order, # for any left blank.  A tool
+# only hands its script the parameters it declares, so a parameter the tool doesn't have yet is read as blank, which
+# keeps the script's behaviour from before that parameter was added.
+
+# function OptionalParameter
+# accepts: arcpy, the arcpy module the script uses. index, Integer, the position of the parameter
+# returns: String, the parameter's text, blank if the tool or command line doesn't supply that many parameters
+def OptionalParameter(arcpy, index):
+    if index >= arcpy.GetArgumentCount():
+        return ""
+    return arcpy.GetParameterAsText(index)
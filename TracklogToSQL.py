@@ -11,6 +11,11 @@
 # This script does not interact with the ARCN_Sheep database in any way; it just exports .sql scripts, so there is
 # no danger of database corruption to test-running the script.
 # The script is designed to be run via an ArcGIS toolbox tool.
+# The script can also be run without ArcGIS, e.g. on a Linux batch node, with the toolbox parameters in order on the
+# command line, e.g. python TracklogToSQL.py Tracklog.shp <SurveyID> <PilotName> <TailNo> "Pilot GPS" <SOPNumber> <SOPVersion>
+# The shapefile must then be in WGS84 and is read with ShapefileReader.py, see there for what else it can't do.
+# A season's worth of tracklogs can be converted in one run by supplying a directory instead of a shapefile, see
+# GPSFileBatch.py and the notes in WaypointsToSQL.py.
 # Ensure the column mappings in the script match the destination database table.
 # Python requires forward slashes for directory delimiters contrary to Windows.  Replace '\' with '/' in any paths.
 # IMPORTANT NOTE: The SQL insert queries are wrapped in unclosed transaction statements (the transaction is started,
@@ -21,8 +26,14 @@
 # Written by Scott D. Miller, Data Manager, Arctic and Central Alaska Inventory and Monitoring Networks, October, 2015
 
 # import libraries
-import arcpy
 import os
+import sys
+import ShapefileReader
+arcpy = ShapefileReader.Backend() # ESRI's arcpy, or the shapefile reader where ArcGIS isn't installed, see ShapefileReader.py
+import SQLScriptFiles
+import RunTelemetry
+import GPSFileBatch
+import ToolParameters
 
 # USER MUST SUPPLY THE VARIABLES BELOW --------------------------------------------
 TracklogFile = arcpy.GetParameterAsText(0)# Supply a path to the tracklog shapefile #
@@ -35,10 +46,24 @@ TailNo = arcpy.GetParameterAsText(3)# Aircraft tail number
 TracklogSource = arcpy.GetParameterAsText(4)# Source of the GPS tracklog, usually 'Pilot GPS'
 SOPNumber  = arcpy.GetParameterAsText(5)# Number of the SOP that guided the data collection
 SOPVersion  = arcpy.GetParameterAsText(6)# Version of the SOP that guided the data collection
+# the optional parameters below are blank unless the tool has them, see ToolParameters.py and README.md
+ScriptCompression = ToolParameters.OptionalParameter(arcpy, 7)# Optional, GZIP or ZSTD to compress the sql script as it is written, blank for none
+BatchFilePattern = ToolParameters.OptionalParameter(arcpy, 8)# Optional, in batch mode the shapefiles to convert, e.g. *_Track.shp, blank for every shapefile
+BatchOutput = GPSFileBatch.BatchOutput(ToolParameters.OptionalParameter(arcpy, 9))# Optional, in batch mode COMBINED to write one script, blank for a script per shapefile
 # -----------------------------------------------------------------------------
 
+# a directory of shapefiles instead of a shapefile converts them all, see the notes at the top
+BatchMode = os.path.isdir(TracklogFile)
+if BatchMode:
+    TracklogFile = os.path.normpath(TracklogFile) # the combined script, report and summary are named after the directory
 
-OutputFile = TracklogFile + '.sql'# SQL script file that will be written
+
+OutputFile = TracklogFile + SQLScriptFiles.ScriptSuffix(ScriptCompression)# SQL script file that will be written
+
+# the run report, written next to the output script, records how long the export took and how much it wrote, see RunTelemetry.py
+Telemetry = RunTelemetry.RunReport("TracklogToSQL", TracklogFile + ".report.json",
+    {"input": TracklogFile, "SurveyID": SurveyID, "output": OutputFile, "BatchFilePattern": BatchFilePattern,
+    "BatchOutput": BatchOutput})
 
 # echo the parameters
 arcpy.AddMessage("Input file: " + TracklogFile + "\n")
@@ -59,27 +84,43 @@ executiontime = time.strftime("%c")
 import getpass
 user = getpass.getuser()
 
-# routine to process the input shapefile and convert the data to SQL insert queries and write them to the output file
-def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
-    arcpy.AddMessage('Processing ' + str(Shapefile) + "\n")
-
-    # EXPORT THE WAYPOINTS ------------------------------------------------------------------------------------------------------------
-    fc = TracklogFile
-    file = open(OutputFile, "w")
+# the settings above that the worker processes need in batch mode.  The worker processes are not run by the toolbox
+# so they cannot read the toolbox parameters themselves.
+WorkerSettings = ["SurveyID", "TracklogSource", "SOPNumber", "SOPVersion", "executiontime", "user"]
 
-    # write some metadata to the sql script
+# write the metadata at the top of the sql script
+def WriteScriptHeader(file):
     file.write("-- Insert queries to transfer pilot tracklog to ARCN_Sheep database\n")
     file.write("-- File generated " + executiontime + " by " + user + "\n")
     file.write("USE ARCN_Sheep \n")
     file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
     file.write("SET QUOTED_IDENTIFIER ON\n\n")
-    file.write("\n-- insert the generated transects from " + fc + " -----------------------------------------------------------\n")
+
+# declare the variables the insert queries use, once per sql script
+def WriteDeclarations(file):
     file.write("DECLARE @SurveyID nvarchar(50) -- SurveyID of the record in the Surveys table to which the transects below will be related\n")
     file.write("DECLARE @PilotName nvarchar(30) -- Pilot's name \n")
     file.write("DECLARE @TailNo nvarchar(20) -- Aircraft tail number\n")
     file.write("DECLARE @TracklogSource nvarchar(20) -- Source of the tracklog, usually pilot's GPS\n")
     file.write("DECLARE @SOPNumber int -- Standard operating procedure number\n")
     file.write("DECLARE @SOPVersion int -- Standard operating procedure version\n")
+
+# routine to process the input shapefile and convert the data to SQL insert queries and write them to the output file.
+# A part of a combined script (combined True) leaves out the metadata and declarations, the combined script has them once.
+def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo,outputfile,combined = False):
+    arcpy.AddMessage('Processing ' + str(Shapefile) + "\n")
+
+    # EXPORT THE WAYPOINTS ------------------------------------------------------------------------------------------------------------
+    fc = Shapefile
+    telemetry = Telemetry.startLayer(fc) # timings and counts for the run report
+    file = telemetry.timedFile(SQLScriptFiles.OpenOutputFile(outputfile, "w"))
+
+    # write some metadata to the sql script
+    if not combined:
+        WriteScriptHeader(file)
+    file.write("\n-- insert the generated transects from " + fc + " -----------------------------------------------------------\n")
+    if not combined:
+        WriteDeclarations(file)
     file.write("SET @SurveyID = '" + SurveyID + "'\n")
     file.write("SET @PilotName = '" + PilotName + "'\n")
     file.write("SET @TailNo = '" + TailNo + "'\n")
@@ -103,30 +144,15 @@ def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
         else:
             fields.append(field.name)
 
-    # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
-    # loop through the cursor and save fields as variables to be used later in insert queries
-    LineString = "LINESTRING("
-    cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-    for row in cursor:
-        Shape = row[1]
-        comment = row[9]
-        altitude = row[14] #
-        altitude = float(altitude) * 0.3048 # assume silly units, convert to meters
-        model = row[18] #
-        ltime = row[20]
-        Lat = row[5]
-        Lon = row[6]
-        PointString = 'POINT(' + str(Lon) + ' ' + str(Lat) + '\n'
-        LineString = LineString  + ' ' + str(Lon) + ' ' + str(Lat) + ',\n'
-
-    LineString = LineString.rstrip()
-    LineString = LineString[:-1] + ")" #trim trailing comma
-    LineGeog = "geography::STGeomFromText('" + LineString + "', 4326)"
-    LineGeogSql = "DECLARE @g geography\nSET @g = " + LineGeog + "\n" # send this to SSMS to troubleshoot geog problems
-
-    # # generate an insert query
-    insertquery = "INSERT INTO [PilotTracklogs](" + \
-        "[PilotName]" + \
+    # the tracklog is written as a single insert query with the track points joined into one LINESTRING.  Tracklogs
+    # can have tens of thousands of points so rather than building the LINESTRING up in memory we start the insert
+    # query, write each point's coordinates straight to the output file as the cursor reads it, then finish the query.
+    # The Tracklog column comes first in the column list so its coordinates can be written before the remaining values,
+    # which are taken from the last point in the tracklog, are known.  The query is only started once the first point
+    # is read, a shapefile without any points has no tracklog to insert.
+    insertstart = "INSERT INTO [PilotTracklogs](" + \
+        "[Tracklog]" + \
+        ",[PilotName]" + \
         ",[TailNo]" + \
         ",[CaptureDate]" + \
         ",[Altitude]" + \
@@ -136,32 +162,159 @@ def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
         ",[SOPNumber]" + \
         ",[SOPVersion]" + \
         ",[Comments]" + \
-        ",[Tracklog]" + \
         ",[SurveyID]" + \
         ") VALUES(" + \
-        "@PilotName" + \
+        "geography::STGeomFromText('LINESTRING("
+
+    # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
+    # loop through the cursor and save fields as variables to be used later in insert queries
+    separator = "" # goes between the points of the LINESTRING, blank before the first point
+    lastrow = None # the last point read, None until the first point is read
+    cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
+    for row in telemetry.timedRows(cursor):
+        if lastrow is None:
+            file.write(insertstart) # start the insert query
+        Lat = row[5]
+        Lon = row[6]
+        file.write(separator + ' ' + str(Lon) + ' ' + str(Lat)) # write the point to the LINESTRING
+        separator = ",\n"
+        lastrow = row
+
+    if lastrow is None:
+        arcpy.AddMessage("WARNING: " + str(fc) + " has no track points, no tracklog is inserted\n")
+        file.write("-- " + str(fc) + " has no track points, no tracklog is inserted\n")
+        file.close()
+        telemetry.finish()
+        arcpy.AddMessage('Done\n')
+        return
+
+    # the remaining values come from the last point in the tracklog
+    comment = lastrow[9]
+    altitude = lastrow[14] #
+    altitude = float(altitude) * 0.3048 # assume silly units, convert to meters
+    model = lastrow[18] #
+    ltime = lastrow[20]
+
+    # finish the LINESTRING and the insert query
+    insertquery = ")', 4326)" + \
+        ",@PilotName" + \
         ",@TailNo" + \
         ",'" + str(ltime) + "'" + \
         "," + str(altitude) + "" + \
         ",'" + str(model) + "'" + \
-        ",'" + str(os.path.basename(TracklogFile)) + "'" + \
+        ",'" + str(os.path.basename(Shapefile)) + "'" + \
         ",@TracklogSource" + \
         ",@SOPNumber" + \
         ",@SOPVersion" + \
         ",'" + str(comment) + "'" + \
-        "," + LineGeog + \
         ",@SurveyID);\n"
 
-    file.write(insertquery) # write the query to the output file
+    file.write(insertquery) # write the end of the query to the output file
 
 
     # close the output file
     file.close()
+    telemetry.finish()
     arcpy.AddMessage('Done\n')
 
-# process the tracklog shapefile using the GenerateSQLScript routine
-GenerateSQLScript(TracklogFile,SurveyID,PilotName,TailNo)
+# function BatchFileWorker
+# accepts: Shapefile, PilotName, TailNo, String. outputfile, String, the script to write. combined, Boolean, whether
+# the script is a part of a combined script. settings, dictionary of the WorkerSettings values from the parent process
+# returns: tuple of (Shapefile, Boolean whether the conversion succeeded, list of the messages it produced, list of
+# the run report summaries of the shapefiles it converted)
+# purpose: Converts one shapefile of a batch in a worker process, see NPSdotGDBtoSQLServer.ExportLayerWorker.
+def BatchFileWorker(Shapefile, PilotName, TailNo, outputfile, combined, settings):
+    globals().update(settings)
+    messages = []
+    arcpy.AddMessage = messages.append # this is the worker's own copy of arcpy, the parent's is untouched
+    firstLayer = len(Telemetry.layers) # the pool reuses its workers, only hand back the shapefiles converted this time
+    try:
+        GenerateSQLScript(Shapefile, SurveyID, PilotName, TailNo, outputfile, combined)
+        succeeded = True
+    except BaseException:
+        import traceback
+        messages.append(traceback.format_exc())
+        Telemetry.fail(sys.exc_info()[1])
+        succeeded = False
+    return (Shapefile, succeeded, messages, [telemetry.summary() for telemetry in Telemetry.layers[firstLayer:]])
+
+# function GenerateBatchSQLScripts
+# accepts: directory, String, the directory of tracklog shapefiles
+# returns: list of the shapefiles that failed to convert
+# purpose: Converts the shapefiles in the directory at the same time in a pool of worker processes, combines their
+# scripts if asked to and writes the batch summary, see GPSFileBatch.py.
+def GenerateBatchSQLScripts(directory):
+    files, skipped = GPSFileBatch.BatchFiles(directory, BatchFilePattern, PilotName, TailNo)
+    for Shapefile in skipped:
+        arcpy.AddMessage("WARNING: Skipped " + Shapefile + ", its PilotName and TailNo can't be taken from its name\n")
+    if len(files) == 0:
+        sys.exit("ERROR: No shapefiles matching " + (BatchFilePattern.strip() or "*.shp") + " to convert in " + directory)
+    arcpy.AddMessage("Converting " + str(len(files)) + " shapefiles\n")
+    combined = BatchOutput == "COMBINED"
+    settings = {}
+    for name in WorkerSettings:
+        settings[name] = globals()[name]
+    jobs = []
+    for Shapefile, BatchPilotName, BatchTailNo in files:
+        if combined:
+            outputfile = Shapefile + ".part" + SQLScriptFiles.ScriptSuffix(ScriptCompression)
+        else:
+            outputfile = Shapefile + SQLScriptFiles.ScriptSuffix(ScriptCompression)
+        jobs.append((Shapefile, BatchPilotName, BatchTailNo, outputfile, combined, settings))
+
+    rows = [] # the batch summary, see GPSFileBatch.WriteSummary
+    parts = []
+    failures = []
+    for job, result in zip(jobs, GPSFileBatch.RunBatch(BatchFileWorker, jobs)):
+        Shapefile, succeeded, messages, summaries = result
+        Telemetry.addSummaries(summaries)
+        for message in messages:
+            arcpy.AddMessage(message)
+        records = sum([summary["rowsRead"] for summary in summaries])
+        if succeeded:
+            arcpy.AddMessage(Shapefile + " succeeded\n")
+            parts.append(job[3])
+            rows.append(("succeeded", Shapefile, job[1], job[2], records, OutputFile if combined else job[3]))
+        else:
+            arcpy.AddMessage("ERROR: " + Shapefile + " failed\n")
+            failures.append(Shapefile)
+            rows.append(("failed", Shapefile, job[1], job[2], records, ""))
+            if combined and os.path.exists(job[3]):
+                os.remove(job[3]) # a part left unfinished would break the combined script
+
+    # the combined script has the metadata and declarations once, followed by each shapefile's insert
+    if combined:
+        file = SQLScriptFiles.OpenOutputFile(OutputFile, "w")
+        WriteScriptHeader(file)
+        WriteDeclarations(file)
+        file.close()
+        GPSFileBatch.CombineScripts(OutputFile, parts)
+    arcpy.AddMessage("Batch summary: " + GPSFileBatch.WriteSummary(TracklogFile + ".summary.txt",
+        "TracklogToSQL batch of " + TracklogFile, rows) + "\n")
+    return failures
+
+# process the tracklog shapefile using the GenerateSQLScript routine, the run report is written whether or not it succeeds
+# the worker processes of a batch import this script too, everything below only runs in the toolbox's own process
+if __name__ == "__main__":
+    failures = []
+    try:
+        if BatchMode:
+            failures = GenerateBatchSQLScripts(TracklogFile)
+        else:
+            PilotName, TailNo = GPSFileBatch.ShapefilePilotAndTail(TracklogFile, PilotName, TailNo)
+            GenerateSQLScript(TracklogFile,SurveyID,PilotName,TailNo,OutputFile)
+    except BaseException as ex:
+        Telemetry.fail(ex)
+        raise
+    finally:
+        arcpy.AddMessage('Run report: ' + Telemetry.write())
 
-#inform user that we're done
-arcpy.AddMessage('TracklogToSQL finished successfully\n')
-arcpy.AddMessage( 'Output file available at ' + OutputFile)
+    #inform user that we're done
+    if len(failures) > 0:
+        arcpy.AddMessage("ERROR: " + str(len(failures)) + " shapefiles failed to convert: " + ", ".join(failures))
+    else:
+        arcpy.AddMessage('TracklogToSQL finished successfully\n')
+    if BatchMode and BatchOutput != "COMBINED":
+        arcpy.AddMessage('Output files available beside the shapefiles in ' + TracklogFile)
+    else:
+        arcpy.AddMessage( 'Output file available at ' + OutputFile)
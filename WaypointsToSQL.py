@@ -11,6 +11,15 @@
 # This script does not interact with the ARCN_Sheep database in any way; it just exports .sql scripts, so there is
 # no danger of database corruption to test-running the script.
 # The script is designed to be run via an ArcGIS toolbox tool.
+# The script can also be run without ArcGIS, e.g. on a Linux batch node, with the toolbox parameters in order on the
+# command line, e.g. python WaypointsToSQL.py Waypoints.shp <SurveyID> <PilotName> <TailNo> "Pilot GPS" <SOPNumber> <SOPVersion>
+# The shapefile must then be in WGS84 and is read with ShapefileReader.py, see there for what else it can't do.
+# A season's worth of waypoints can be converted in one run by supplying a directory instead of a shapefile, see
+# GPSFileBatch.py.  Each shapefile's PilotName and TailNo are then taken from the name GPSFilesRenamer.py gave it, the
+# PilotName and TailNo supplied are only used for shapefiles that haven't been renamed.  The shapefiles are converted
+# at the same time, one per processor, into a script beside each shapefile, or with a batch output of COMBINED into
+# one script named after the directory.  A summary of the shapefiles converted is written beside the directory.
+# PilotName and TailNo can be left blank for a single renamed shapefile too, they are then taken from its name.
 # Ensure the column mappings in the script match the destination database table.
 # Python requires forward slashes for directory delimiters contrary to Windows.  Replace '\' with '/' in any paths.
 # IMPORTANT NOTE: The SQL insert queries are wrapped in unclosed transaction statements (the transaction is started,
@@ -21,8 +30,15 @@
 # Written by Scott D. Miller, Data Manager, Arctic and Central Alaska Inventory and Monitoring Networks, October, 2015
 
 # import libraries
-import arcpy
 import os
+import sys
+import ShapefileReader
+arcpy = ShapefileReader.Backend() # ESRI's arcpy, or the shapefile reader where ArcGIS isn't installed, see ShapefileReader.py
+import SQLScriptFiles
+import SQLGeography
+import RunTelemetry
+import GPSFileBatch
+import ToolParameters
 
 # USER MUST SUPPLY THE VARIABLES BELOW --------------------------------------------
 WaypointsFile = arcpy.GetParameterAsText(0)# Supply a path to the waypoints shapefile
@@ -35,10 +51,25 @@ TailNo = arcpy.GetParameterAsText(3)# Aircraft tail number
 WaypointsSource = arcpy.GetParameterAsText(4)# Source of the GPS waypoints, usually 'Pilot GPS'
 SOPNumber  = arcpy.GetParameterAsText(5)# Number of the SOP that guided the data collection
 SOPVersion  = arcpy.GetParameterAsText(6)# Version of the SOP that guided the data collection
+# the optional parameters below are blank unless the tool has them, see ToolParameters.py and README.md
+ScriptCompression = ToolParameters.OptionalParameter(arcpy, 7)# Optional, GZIP or ZSTD to compress the sql script as it is written, blank for none
+GeometryEncoding = SQLGeography.GeometryEncoding(ToolParameters.OptionalParameter(arcpy, 8))# Optional, WKB to write the waypoints as Well-Known Binary, blank for Well-Known Text
+BatchFilePattern = ToolParameters.OptionalParameter(arcpy, 9)# Optional, in batch mode the shapefiles to convert, e.g. *_Waypoints.shp, blank for every shapefile
+BatchOutput = GPSFileBatch.BatchOutput(ToolParameters.OptionalParameter(arcpy, 10))# Optional, in batch mode COMBINED to write one script, blank for a script per shapefile
 # -----------------------------------------------------------------------------
 
+# a directory of shapefiles instead of a shapefile converts them all, see the notes at the top
+BatchMode = os.path.isdir(WaypointsFile)
+if BatchMode:
+    WaypointsFile = os.path.normpath(WaypointsFile) # the combined script, report and summary are named after the directory
+
 # Output SQL script file
-OutputFile = WaypointsFile + '.sql'
+OutputFile = WaypointsFile + SQLScriptFiles.ScriptSuffix(ScriptCompression)
+
+# the run report, written next to the output script, records how long the export took and how much it wrote, see RunTelemetry.py
+Telemetry = RunTelemetry.RunReport("WaypointsToSQL", WaypointsFile + ".report.json",
+    {"input": WaypointsFile, "SurveyID": SurveyID, "output": OutputFile, "GeometryEncoding": GeometryEncoding,
+    "BatchFilePattern": BatchFilePattern, "BatchOutput": BatchOutput})
 
 # echo the parameters
 arcpy.AddMessage("Input file: " + WaypointsFile + "\n")
@@ -59,27 +90,43 @@ executiontime = time.strftime("%c")
 import getpass
 user = getpass.getuser()
 
-# routine to process the input shapefile and convert the data to SQL insert queries and write them to the output file
-def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
-    arcpy.AddMessage('Processing ' + str(Shapefile) + "\n")
-
-    # EXPORT THE WAYPOINTS ------------------------------------------------------------------------------------------------------------
-    fc = WaypointsFile
-    file = open(OutputFile, "w")
+# the settings above that the worker processes need in batch mode.  The worker processes are not run by the toolbox
+# so they cannot read the toolbox parameters themselves.
+WorkerSettings = ["SurveyID", "WaypointsSource", "SOPNumber", "SOPVersion", "GeometryEncoding", "executiontime", "user"]
 
-    # write some metadata to the sql script
+# write the metadata at the top of the sql script
+def WriteScriptHeader(file):
     file.write("-- Insert queries to transfer pilot waypoints to ARCN_Sheep database\n")
     file.write("-- File generated " + executiontime + " by " + user + "\n")
     file.write("USE ARCN_Sheep \n")
     file.write("BEGIN TRANSACTION -- Do not forget to COMMIT or ROLLBACK the changes after executing or the database will be in a locked state \n")
     file.write("SET QUOTED_IDENTIFIER ON\n\n")
-    file.write("\n-- insert the generated transects from " + fc + " -----------------------------------------------------------\n")
+
+# declare the variables the insert queries use, once per sql script
+def WriteDeclarations(file):
     file.write("DECLARE @SurveyID nvarchar(50) -- SurveyID of the record in the Surveys table to which the transects below will be related\n")
     file.write("DECLARE @PilotName nvarchar(30) -- Pilot's name \n")
     file.write("DECLARE @TailNo nvarchar(20) -- Aircraft tail number\n")
     file.write("DECLARE @WaypointsSource nvarchar(20) -- Source of the waypoints, usually pilot's GPS\n")
     file.write("DECLARE @SOPNumber int -- Standard operating procedure number\n")
     file.write("DECLARE @SOPVersion int -- Standard operating procedure version\n")
+
+# routine to process the input shapefile and convert the data to SQL insert queries and write them to the output file.
+# A part of a combined script (combined True) leaves out the metadata and declarations, the combined script has them once.
+def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo,outputfile,combined = False):
+    arcpy.AddMessage('Processing ' + str(Shapefile) + "\n")
+
+    # EXPORT THE WAYPOINTS ------------------------------------------------------------------------------------------------------------
+    fc = Shapefile
+    telemetry = Telemetry.startLayer(fc) # timings and counts for the run report
+    file = telemetry.timedFile(SQLScriptFiles.OpenOutputFile(outputfile, "w"))
+
+    # write some metadata to the sql script
+    if not combined:
+        WriteScriptHeader(file)
+    file.write("\n-- insert the generated transects from " + fc + " -----------------------------------------------------------\n")
+    if not combined:
+        WriteDeclarations(file)
     file.write("SET @SurveyID = '" + SurveyID + "'\n")
     file.write("SET @PilotName = '" + PilotName + "'\n")
     file.write("SET @TailNo = '" + TailNo + "'\n")
@@ -88,26 +135,34 @@ def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
     file.write("SET @SOPVersion = " + SOPVersion + "\n")
 
     # we'll need to create a searchcursor a little further on to access the records in the layer.  the cursor has a fields parameter
-    # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. Shape@;
+    # we could just submit a * to gather all columns except that we need the Shape column returned as a token, e.g. SHAPE@XY;
     # see ArcGIS documentation.  We also can't predict the case of the shape column,
-    # so we have to submit all the columns as a list with Shape changed to the Shape@ token that will allow us to get at geometry info.
+    # so we have to submit all the columns as a list with Shape changed to the SHAPE@XY token, which returns just the
+    # waypoint's coordinates and is much quicker than building a geometry object for every waypoint.
     # The easiest way to do this is to loop through the column names and load them into a list making our edits as needed
     fieldsList = arcpy.ListFields(fc) #get the fields
     fields = [] # create an empty list
     #  loop through the fields and change the Shape column (containing geometry) into a token, add columns to the list
     for field in fieldsList:
-        if field.name == "Shape":
-            fields.append("Shape@")
-        elif field.name == "SHAPE":
-            fields.append("SHAPE@")
+        if field.name == "Shape" or field.name == "SHAPE":
+            fields.append("SHAPE@XY")
         else:
             fields.append(field.name)
+    # the waypoints' elevations are added to the end of the list if the shapefile has them
+    hasZ = arcpy.Describe(fc).hasZ
+    if hasZ:
+        fields.append("SHAPE@Z")
 
     # get the data into a cursor so we can translate it into sql to insert into the sheep sql server database
     # loop through the cursor and save fields as variables to be used later in insert queries
     cursor = arcpy.da.SearchCursor(fc,fields,"",sr)
-    for row in cursor:
-        Shape = row[1]
+    for row in telemetry.timedRows(cursor):
+        XY = row[1]
+        if hasZ:
+            Z = row[-1]
+        else:
+            Z = None
+        geog = SQLGeography.GeographyFromXY(XY, Z, epsg, GeometryEncoding)
         ident = row[3] #
         comment = row[8]
         altitude = row[15] #
@@ -137,12 +192,12 @@ def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
                ",'" + str(ltime) + "'" + \
                "," + str(altitude) + "" + \
                ",'" + str(model) + "'" + \
-               ",'" + str(os.path.basename(WaypointsFile)) + "'" + \
+               ",'" + str(os.path.basename(Shapefile)) + "'" + \
                ",@WaypointsSource" + \
                ",'" + str(comment) + "'" + \
                ",@SOPNumber" + \
                ",@SOPVersion" + \
-               ",geography::STGeomFromText('" + Shape.WKT.replace(" Z", "") + "', " + str(epsg) + ")" + \
+               "," + geog + \
                ",@SurveyID);\n"
 
         file.write(insertquery) # write the query to the output file
@@ -150,11 +205,107 @@ def GenerateSQLScript(Shapefile,SurveyID,PilotName,TailNo):
 
     # close the output file
     file.close()
+    telemetry.finish()
     arcpy.AddMessage('Done\n')
 
-# process the waypoints shapefile using the GenerateSQLScript routine
-GenerateSQLScript(WaypointsFile,SurveyID,PilotName,TailNo)
+# function BatchFileWorker
+# accepts: Shapefile, PilotName, TailNo, String. outputfile, String, the script to write. combined, Boolean, whether
+# the script is a part of a combined script. settings, dictionary of the WorkerSettings values from the parent process
+# returns: tuple of (Shapefile, Boolean whether the conversion succeeded, list of the messages it produced, list of
+# the run report summaries of the shapefiles it converted)
+# purpose: Converts one shapefile of a batch in a worker process, see NPSdotGDBtoSQLServer.ExportLayerWorker.
+def BatchFileWorker(Shapefile, PilotName, TailNo, outputfile, combined, settings):
+    globals().update(settings)
+    messages = []
+    arcpy.AddMessage = messages.append # this is the worker's own copy of arcpy, the parent's is untouched
+    firstLayer = len(Telemetry.layers) # the pool reuses its workers, only hand back the shapefiles converted this time
+    try:
+        GenerateSQLScript(Shapefile, SurveyID, PilotName, TailNo, outputfile, combined)
+        succeeded = True
+    except BaseException:
+        import traceback
+        messages.append(traceback.format_exc())
+        Telemetry.fail(sys.exc_info()[1])
+        succeeded = False
+    return (Shapefile, succeeded, messages, [telemetry.summary() for telemetry in Telemetry.layers[firstLayer:]])
+
+# function GenerateBatchSQLScripts
+# accepts: directory, String, the directory of waypoints shapefiles
+# returns: list of the shapefiles that failed to convert
+# purpose: Converts the shapefiles in the directory at the same time in a pool of worker processes, combines their
+# scripts if asked to and writes the batch summary, see GPSFileBatch.py.
+def GenerateBatchSQLScripts(directory):
+    files, skipped = GPSFileBatch.BatchFiles(directory, BatchFilePattern, PilotName, TailNo)
+    for Shapefile in skipped:
+        arcpy.AddMessage("WARNING: Skipped " + Shapefile + ", its PilotName and TailNo can't be taken from its name\n")
+    if len(files) == 0:
+        sys.exit("ERROR: No shapefiles matching " + (BatchFilePattern.strip() or "*.shp") + " to convert in " + directory)
+    arcpy.AddMessage("Converting " + str(len(files)) + " shapefiles\n")
+    combined = BatchOutput == "COMBINED"
+    settings = {}
+    for name in WorkerSettings:
+        settings[name] = globals()[name]
+    jobs = []
+    for Shapefile, BatchPilotName, BatchTailNo in files:
+        if combined:
+            outputfile = Shapefile + ".part" + SQLScriptFiles.ScriptSuffix(ScriptCompression)
+        else:
+            outputfile = Shapefile + SQLScriptFiles.ScriptSuffix(ScriptCompression)
+        jobs.append((Shapefile, BatchPilotName, BatchTailNo, outputfile, combined, settings))
+
+    rows = [] # the batch summary, see GPSFileBatch.WriteSummary
+    parts = []
+    failures = []
+    for job, result in zip(jobs, GPSFileBatch.RunBatch(BatchFileWorker, jobs)):
+        Shapefile, succeeded, messages, summaries = result
+        Telemetry.addSummaries(summaries)
+        for message in messages:
+            arcpy.AddMessage(message)
+        records = sum([summary["rowsRead"] for summary in summaries])
+        if succeeded:
+            arcpy.AddMessage(Shapefile + " succeeded\n")
+            parts.append(job[3])
+            rows.append(("succeeded", Shapefile, job[1], job[2], records, OutputFile if combined else job[3]))
+        else:
+            arcpy.AddMessage("ERROR: " + Shapefile + " failed\n")
+            failures.append(Shapefile)
+            rows.append(("failed", Shapefile, job[1], job[2], records, ""))
+            if combined and os.path.exists(job[3]):
+                os.remove(job[3]) # a part left unfinished would break the combined script
+
+    # the combined script has the metadata and declarations once, followed by each shapefile's inserts
+    if combined:
+        file = SQLScriptFiles.OpenOutputFile(OutputFile, "w")
+        WriteScriptHeader(file)
+        WriteDeclarations(file)
+        file.close()
+        GPSFileBatch.CombineScripts(OutputFile, parts)
+    arcpy.AddMessage("Batch summary: " + GPSFileBatch.WriteSummary(WaypointsFile + ".summary.txt",
+        "WaypointsToSQL batch of " + WaypointsFile, rows) + "\n")
+    return failures
+
+# process the waypoints shapefile using the GenerateSQLScript routine, the run report is written whether or not it succeeds
+# the worker processes of a batch import this script too, everything below only runs in the toolbox's own process
+if __name__ == "__main__":
+    failures = []
+    try:
+        if BatchMode:
+            failures = GenerateBatchSQLScripts(WaypointsFile)
+        else:
+            PilotName, TailNo = GPSFileBatch.ShapefilePilotAndTail(WaypointsFile, PilotName, TailNo)
+            GenerateSQLScript(WaypointsFile,SurveyID,PilotName,TailNo,OutputFile)
+    except BaseException as ex:
+        Telemetry.fail(ex)
+        raise
+    finally:
+        arcpy.AddMessage('Run report: ' + Telemetry.write())
 
-#inform user that we're done
-arcpy.AddMessage('WaypointsToSQL finished successfully\n')
-arcpy.AddMessage( 'Output file available at ' + OutputFile)
+    #inform user that we're done
+    if len(failures) > 0:
+        arcpy.AddMessage("ERROR: " + str(len(failures)) + " shapefiles failed to convert: " + ", ".join(failures))
+    else:
+        arcpy.AddMessage('WaypointsToSQL finished successfully\n')
+    if BatchMode and BatchOutput != "COMBINED":
+        arcpy.AddMessage('Output files available beside the shapefiles in ' + WaypointsFile)
+    else:
+        arcpy.AddMessage( 'Output file available at ' + OutputFile)